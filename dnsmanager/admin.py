@@ -2,11 +2,16 @@ from django.contrib import admin
 import reversion
 
 import settings
+from dispatch import batched
 from signals import zone_fully_saved_signal
 
 
+from recipes import apply_recipe
 from models import AddressRecord, CanonicalNameRecord, MailExchangeRecord, \
-    NameServerRecord, TextRecord, ServiceRecord, Zone
+    NameServerRecord, TextRecord, ServiceRecord, Zone, ZoneWarning, RecordSet, SharedRecord, ZoneRevision
+
+# Full django-reversion snapshots, dnsmanager.history records compact revisions instead
+ZoneAdminBase = reversion.VersionAdmin if settings.DNS_MANAGER_REVERSION else admin.ModelAdmin
 
 
 class AddressRecordInline(admin.TabularInline):
@@ -39,15 +44,47 @@ class ServiceRecordInline(admin.TabularInline):
     extra = 0
 
 
+class ZoneWarningInline(admin.TabularInline):
+    model = ZoneWarning
+    extra = 0
+    max_num = 0
+    can_delete = False
+    readonly_fields = ('record', 'message', 'created')
+
+
+class ZoneRevisionInline(admin.TabularInline):
+    model = ZoneRevision
+    extra = 0
+    max_num = 0
+    can_delete = False
+    fields = ('serial', 'checkpoint', 'created')
+    readonly_fields = ('serial', 'checkpoint', 'created')
+
+
+class SharedRecordInline(admin.TabularInline):
+    model = SharedRecord
+    extra = 0
+
+
+@admin.register(RecordSet)
+class RecordSetAdmin(admin.ModelAdmin):
+    inlines = [SharedRecordInline]
+    search_fields = ['name', 'records__rdata']
+
+
 @admin.register(Zone)
-class ZoneAdmin(reversion.VersionAdmin):
+class ZoneAdmin(ZoneAdminBase):
     inlines = [AddressRecordInline,
                CanonicalNameRecordInline,
                MailExchangeRecordInline,
                NameServerRecordInline,
                TextRecordInline,
-               ServiceRecordInline]
+               ServiceRecordInline,
+               ZoneWarningInline]
+    if settings.DNS_MANAGER_HISTORY:
+        inlines.append(ZoneRevisionInline)
     list_display = ('__unicode__', 'is_valid', 'is_delegated')
+    filter_horizontal = ('record_sets', )
     list_filter = settings.DNS_MANAGER_ZONE_ADMIN_FILTER
     search_fields = ['domain__name',
                      'addressrecords__data',
@@ -66,13 +103,14 @@ class ZoneAdmin(reversion.VersionAdmin):
 
     def run_recipe(self, recipe):
         """ Execute the given recipe from the recipe model """
-        @reversion.create_revision()
-        def apply_recipe(modeladmin, request, queryset):
-            for zone in queryset.all():
-                r = recipe(zone)
-                r.save()
-                zone_fully_saved_signal.send(sender=self.__class__, instance=zone, created=False)
-        return apply_recipe
+        def recipe_action(modeladmin, request, queryset):
+            with batched():
+                for zone in queryset.all():
+                    apply_recipe(zone, recipe)
+                    zone_fully_saved_signal.send(sender=self.__class__, instance=zone, created=False)
+        if settings.DNS_MANAGER_REVERSION:
+            recipe_action = reversion.create_revision()(recipe_action)
+        return recipe_action
 
     def get_actions(self, request):
         """ Set our custom recipe actions """
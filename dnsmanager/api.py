@@ -0,0 +1,264 @@
+"""
+Bulk record operations across many zones, applied in one transaction.
+
+Each operation is a dict with an "op" of create, update or delete and a record "type" (A, CNAME, MX, NS, TXT
+or SRV). Creates name their zone by id or domain name in "zone", updates and deletes name the record by "id".
+Any other keys are record fields, eg:
+
+    {"op": "create", "zone": "example.com", "type": "A", "data": "www", "ip": "192.0.2.1", "ttl": 300}
+    {"op": "update", "type": "MX", "id": 12, "priority": 20}
+    {"op": "delete", "type": "TXT", "id": 7}
+"""
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction, IntegrityError
+from django.db.models import Case, F, Max, Value, When
+from django.utils import timezone
+
+from .dispatch import batched
+from .models import Zone, RECORD_MODELS, sync_resource_records, record_revision_changes, revision_changes
+from .signals import zone_fully_saved_signal
+
+MODELS = dict(RECORD_MODELS)
+OPERATIONS = ('create', 'update', 'delete')
+PROTECTED_FIELDS = ('id', 'zone', 'created', 'updated', 'version')
+BATCH_SIZE = 500
+
+
+class BulkError(Exception):
+    """ Raised when any operation fails, nothing has been written """
+
+    def __init__(self, results):
+        super(BulkError, self).__init__('Bulk record operations failed')
+        self.results = results
+
+
+def record_fields(model):
+    return dict((f.name, f) for f in model._meta.concrete_fields if f.name not in PROTECTED_FIELDS)
+
+
+def object_id(value):
+    """ :return: value as a primary key, None unless it is an int or a string of digits """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, long)):
+        return value
+    if isinstance(value, basestring) and value.isdigit():
+        return int(value)
+    return None
+
+
+def zone_reference(value):
+    """ :return: Zone id or domain name given as the zone of a create, None if it is neither """
+    if isinstance(value, basestring):
+        return value
+    return object_id(value)
+
+
+def find_zones(operations):
+    """ :return: dict of zone reference to Zone, loaded with at most two queries """
+    references = set(zone_reference(op.get('zone')) for op in operations if isinstance(op, dict))
+    pks = set(ref for ref in references if isinstance(ref, (int, long)))
+    names = set(ref for ref in references if isinstance(ref, basestring))
+    zones = {}
+    if pks:
+        zones.update((z.pk, z) for z in Zone.objects.filter(pk__in=pks).select_related('domain'))
+    if names:
+        zones.update((z.domain_name, z) for z in Zone.objects.filter(domain__name__in=names).select_related('domain'))
+    return zones
+
+
+def find_records(operations):
+    """ :return: dict of (type, id) to record, loaded with one query per record type """
+    ids = defaultdict(set)
+    for op in operations:
+        if isinstance(op, dict) and op.get('op') in ('update', 'delete') and op.get('type') in MODELS:
+            pk = object_id(op.get('id'))
+            if pk is not None:
+                ids[op['type']].add(pk)
+    records = {}
+    for rtype, pks in ids.items():
+        for record in MODELS[rtype].objects.filter(pk__in=pks).select_related('zone__domain'):
+            records[(rtype, record.pk)] = record
+    return records
+
+
+def check_record(record):
+    """ Field and syntax checks only, uniqueness is left to the database """
+    try:
+        record.clean_fields(exclude=['zone'])
+    except ValidationError as e:
+        return ['%s: %s' % (field, '; '.join(messages)) for field, messages in e.message_dict.items()]
+    return record.syntax_errors()
+
+
+def prepare(operations):
+    """
+    Check every operation and build the records to write.
+    :return: (results, creates, updates, deletes), results hold per operation errors
+    """
+    zones = find_zones(operations)
+    records = find_records(operations)
+    results, creates, updates, deletes = [], defaultdict(list), [], defaultdict(list)
+
+    for index, op in enumerate(operations):
+        result = {'index': index, 'errors': []}
+        results.append(result)
+        if not isinstance(op, dict) or op.get('op') not in OPERATIONS:
+            result['errors'].append('op must be one of %s' % ', '.join(OPERATIONS))
+            continue
+        if op.get('type') not in MODELS:
+            result['errors'].append('type must be one of %s' % ', '.join(MODELS))
+            continue
+        model = MODELS[op['type']]
+        fields = record_fields(model)
+        values = dict((k, v) for k, v in op.items() if k not in ('op', 'type', 'zone', 'id'))
+        unknown = sorted(set(values) - set(fields))
+        if unknown:
+            result['errors'].append('unknown fields: %s' % ', '.join(unknown))
+            continue
+
+        if op['op'] == 'create':
+            reference = zone_reference(op.get('zone'))
+            if reference is None:
+                result['errors'].append('zone must be an id or a domain name')
+                continue
+            zone = zones.get(reference)
+            if zone is None:
+                result['errors'].append('zone not found')
+                continue
+            record = model(zone=zone, **values)
+        else:
+            pk = object_id(op.get('id'))
+            if pk is None:
+                result['errors'].append('id must be an integer')
+                continue
+            record = records.get((op['type'], pk))
+            if record is None:
+                result['errors'].append('record not found')
+                continue
+            if op['op'] == 'delete':
+                deletes[model].append(record)
+                continue
+            for name, value in values.items():
+                setattr(record, name, value)
+
+        result['errors'].extend(check_record(record))
+        if op['op'] == 'create':
+            creates[model].append((result, record))
+        else:
+            updates.append((result, record))
+
+    return results, creates, updates, deletes
+
+
+def apply_operations(operations):
+    """
+    Apply all operations in one transaction, then bump the serial of each touched zone once.
+    :return: list of per operation results
+    :raises BulkError: if any operation fails, with the per operation results
+    """
+    results, creates, updates, deletes = prepare(operations)
+    if any(result['errors'] for result in results):
+        raise BulkError(results)
+
+    try:
+        with transaction.atomic():
+            touched = write(creates, updates, deletes)
+            for zone in touched.values():
+                zone.save()
+    except IntegrityError as e:
+        for result in results:
+            result['errors'].append('integrity error: %s' % e)
+        raise BulkError(results)
+
+    with batched():
+        for zone in touched.values():
+            zone_fully_saved_signal.send(sender=Zone, instance=zone, created=False)
+
+    for result, op in zip(results, operations):
+        result['status'] = op['op'] + 'd'
+        result['id'] = op.get('id')
+    for items in creates.values():
+        for result, record in items:
+            result['id'] = record.pk
+    return results
+
+
+def write(creates, updates, deletes):
+    """
+    Write the records returned by prepare, without touching zone serials. Call within a transaction.
+    Deletes go first and creates last, so a record can be replaced by one with the same unique fields.
+    :return: dict of zone id to Zone of the zones written to, loaded under a row lock so they can be saved
+    """
+    written = [record for items in creates.values() for result, record in items] + \
+        [record for result, record in updates] + \
+        [record for records in deletes.values() for record in records]
+    touched = {}
+    for record in written:
+        touched[record.zone_id] = record.zone
+    # Bulk writers to the same zones queue here, so each sees only its own new rows in match_created. The zones
+    # are reloaded under the lock, saving those loaded by prepare would undo edits made since.
+    for zone in Zone.objects.select_for_update().filter(pk__in=touched).order_by('pk'):
+        zone.domain = touched[zone.pk].domain
+        touched[zone.pk] = zone
+
+    for model, records in deletes.items():
+        model.objects.filter(pk__in=[record.pk for record in records]).delete()
+    updated = defaultdict(list)
+    for result, record in updates:
+        updated[type(record)].append(record)
+    for model, records in updated.items():
+        stored = model.objects.filter(pk__in=[record.pk for record in records])
+        record_revision_changes(revision_changes(model.rtype, stored, False),
+                                revision_changes(model.rtype, records, True))
+        update_records(model, records)
+    for model, items in creates.items():
+        created = [record for result, record in items]
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        model.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        match_created(model, created, last_pk)
+        record_revision_changes(revision_changes(model.rtype, created, True))
+
+    sync_resource_records(touched.values())  # bulk writes skip the record signals
+    return touched
+
+
+def update_records(model, records):
+    """ Save changed records with one UPDATE per batch, each field set by a CASE on the primary key """
+    fields = record_fields(model).values()
+    now = timezone.now()
+    for i in range(0, len(records), BATCH_SIZE):
+        batch = records[i:i + BATCH_SIZE]
+        values = dict((field.attname, Case(*[When(pk=record.pk, then=Value(getattr(record, field.attname),
+                                                                           output_field=field))
+                                             for record in batch], output_field=field))
+                      for field in fields)
+        model.objects.filter(pk__in=[record.pk for record in batch]) \
+            .update(version=F('version') + 1, updated=now, **values)
+    for record in records:
+        record.version += 1
+        record.updated = now
+
+
+def match_created(model, records, last_pk):
+    """
+    bulk_create does not return primary keys, so read back the new rows of the locked zones and match them to
+    the records by their field values.
+    :raises IntegrityError: if the new rows are not exactly the records, eg when another writer added rows
+    """
+    names = [f.attname for f in model._meta.concrete_fields if f.name not in ('id', 'created', 'updated')]
+    pending = defaultdict(list)
+    for record in records:
+        pending[tuple(getattr(record, name) for name in names)].append(record)
+    rows = model.objects.filter(pk__gt=last_pk, zone__in=set(r.zone_id for r in records)).order_by('pk')
+    matched = 0
+    for row in rows.values_list('pk', *names):
+        key = tuple(row[1:])
+        if not pending.get(key):
+            raise IntegrityError('%s rows were added by another writer' % model._meta.object_name)
+        pending[key].pop(0).pk = row[0]
+        matched += 1
+    if matched != len(records):
+        raise IntegrityError('%s rows could not be matched to created records' % model._meta.object_name)
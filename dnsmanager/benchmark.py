@@ -0,0 +1,54 @@
+"""
+Helpers for timing dnsmanager operations, used by the dnsbench management command.
+"""
+import gc
+import resource
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+
+def peak_memory():
+    """ :return: Peak resident set size of the process in KiB """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(name, func, repeat=1, **labels):
+    """
+    Time func over repeat runs after one warm up run, which is also used to count queries.
+    :return: dict of results, including any labels
+    """
+    gc.collect()
+    if tracemalloc is not None:
+        tracemalloc.start()
+    # The query log is bounded, once it is full captured query counts read as zero
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    if tracemalloc is not None:
+        memory = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    else:
+        memory = peak_memory()
+
+    start = time.time()
+    for i in range(repeat):
+        func()
+    elapsed = time.time() - start
+
+    result = {
+        'name': name,
+        'repeat': repeat,
+        'seconds': elapsed / repeat if repeat else 0.0,
+        'ops_per_second': repeat / elapsed if elapsed else None,
+        'queries': len(queries.captured_queries),
+        'peak_memory_kb': memory,
+    }
+    result.update(labels)
+    return result
@@ -0,0 +1,86 @@
+"""
+Build dns.zone.Zone objects directly from zone records.
+
+This produces the same zone as parsing the rendered zone_detail.txt template with dns.zone.from_text, without
+rendering and tokenizing the whole zone. Each record's rdata is still parsed by dnspython, so malformed data
+fails the same way.
+"""
+import dns.name
+import dns.rdata
+import dns.rdataclass
+import dns.rdatatype
+import dns.zone
+
+
+# (owner, rdata text) of each record type, as written by the zone_detail.txt template
+RECORD_ROWS = (
+    ('NS', lambda r: (r.origin, r.data)),
+    ('A', lambda r: (r.data, r.ip)),
+    ('CNAME', lambda r: (r.data, r.target)),
+    ('MX', lambda r: (r.origin, '%s %s' % (r.priority, r.data))),
+    ('TXT', lambda r: (r.data, r.text)),
+    ('SRV', lambda r: (r.data, '%s %s %s %s' % (r.priority, r.weight, r.port, r.target))),
+)
+RECORD_ROW = dict(RECORD_ROWS)
+
+
+def record_row(rtype, record):
+    """ :return: (owner, rdata text) of a typed record """
+    return RECORD_ROW[rtype](record)
+
+
+def zone_rows(zone):
+    """
+    :return: Iterable of (owner, ttl, rdtype, rdata text) tuples for the records of the zone,
+             owners relative to the zone origin
+    """
+    managers = {
+        'NS': zone.nameserverrecords,
+        'A': zone.addressrecords,
+        'CNAME': zone.canonicalnamerecords,
+        'MX': zone.mailexchangerecords,
+        'TXT': zone.textrecords,
+        'SRV': zone.servicerecords,
+    }
+    for rtype, row in RECORD_ROWS:
+        for r in managers[rtype].all():
+            owner, text = row(r)
+            yield owner, r.ttlx, rtype, text
+    for r in zone.shared_records():
+        yield r.owner, r.ttlx, r.rtype, r.rdata
+
+
+def soa_text(zone, mname):
+    """ :return: SOA rdata text, names relative to the root as in the zone template """
+    return '%s %s %d %d %d %d %d' % (mname, zone.rname, zone.serial, zone.refresh, zone.retry,
+                                     zone.expire, zone.minimum)
+
+
+def build_zone(zone, rows=None):
+    """
+    :param zone: dnsmanager Zone
+    :param rows: Optional (owner, ttl, rdtype, rdata text) tuples, defaults to zone_rows(zone)
+    :return: dns.zone.Zone, relativized to the zone origin
+    """
+    origin = dns.name.from_text(zone.domain_name)
+    result = dns.zone.Zone(origin, dns.rdataclass.IN, relativize=True)
+
+    def add(owner, ttl, rdtype, text, current_origin=origin):
+        name = dns.name.from_text(str(owner), current_origin)
+        if not name.is_subdomain(origin):
+            return  # out of zone data is ignored, as by dns.zone.from_text
+        rdtype = dns.rdatatype.from_text(rdtype)
+        rd = dns.rdata.from_text(dns.rdataclass.IN, rdtype, str(text), current_origin, False)
+        rd.choose_relativity(origin, True)
+        result.find_rdataset(name.relativize(origin), rdtype, create=True).add(rd, ttl)
+
+    rows = list(zone_rows(zone) if rows is None else rows)
+    # The SOA names the first name server, in record order
+    mname = next((text for owner, ttl, rdtype, text in rows if rdtype == 'NS'), None)
+    if mname is None:
+        raise dns.zone.NoNS('Zone has no name servers for the SOA record')
+    add(zone.domain_name, zone.ttl, 'SOA', soa_text(zone, mname), current_origin=dns.name.root)
+    for owner, ttl, rdtype, text in rows:
+        add(owner, ttl, rdtype, text)
+    result.check_origin()
+    return result
@@ -0,0 +1,41 @@
+"""
+RFC 9432 catalog zone of the valid zones.
+
+Secondaries configured with the catalog zone pick up zones being added and removed through a transfer of the
+catalog, instead of a regenerated zone list and a reconfig. Each member is a PTR record under zones.<catalog>
+whose label is a hash of the member name, so labels stay the same across renders, database restores and other
+managers rendering the same zones.
+
+Members are kept in CatalogMember rows as zones are saved, validated and deleted, and the serial moves only
+when they change, so secondaries transfer the catalog again only then. Rendering just reads them.
+"""
+import hashlib
+
+import dns.name
+from django.template.loader import render_to_string
+
+from .models import Catalog, CatalogMember
+from .settings import ZONE_DEFAULTS, DNS_MANAGER_CATALOG_ZONE
+
+VERSION = 2
+
+
+def member_label(domain):
+    """ :return: Unique label of a member zone, the SHA-1 of its name in wire format """
+    return hashlib.sha1(dns.name.from_text(domain).to_digestable()).hexdigest()
+
+
+def members():
+    """ :return: Sorted list of the names of zones in the catalog, those not known to be invalid """
+    return list(CatalogMember.objects.order_by('domain').values_list('domain', flat=True))
+
+
+def render_catalog(name=DNS_MANAGER_CATALOG_ZONE):
+    """ :return: Bind zone text of the catalog """
+    catalog = Catalog.objects.filter(name=name).first() or Catalog(name=name)
+    return render_to_string('dnsmanager/catalog.txt', {
+        'catalog': catalog,
+        'defaults': ZONE_DEFAULTS,
+        'version': VERSION,
+        'members': [(member_label(domain), domain) for domain in members()],
+    })
@@ -0,0 +1,83 @@
+"""
+Feed of zone changes for secondaries and other downstream consumers.
+
+With DNS_MANAGER_CHANGES set, every zone serial change adds a ZoneChange row. Its id is a sequence across all
+zones, so a consumer remembers the last id it has seen and asks for the changes since then instead of polling
+every zone. A long-poll holds the request until a change arrives or the wait expires, checking the indexed
+sequence every DNS_MANAGER_CHANGES_POLL_INTERVAL seconds.
+
+Ids are assigned when a change is inserted, not when it commits, so a later id can be visible before an earlier
+one. The feed stops before a gap in the sequence until the change after the gap is DNS_MANAGER_CHANGES_COMMIT_GRACE
+seconds old, after which the gap is taken to be a rolled back or pruned change. A consumer therefore never moves
+past a change that is still to be committed, unless its transaction stays open longer than the grace period.
+"""
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import ZoneChange
+from .settings import DNS_MANAGER_CHANGES_MAX_WAIT, DNS_MANAGER_CHANGES_POLL_INTERVAL, \
+    DNS_MANAGER_CHANGES_COMMIT_GRACE
+
+LIMIT = 1000
+
+
+def settled(changes, since):
+    """
+    :return: The changes up to the first gap in the sequence after since that may still be committed. Reading
+             from 0 starts at the oldest change, wherever the sequence begins.
+    """
+    settled_before = timezone.now() - timedelta(seconds=DNS_MANAGER_CHANGES_COMMIT_GRACE)
+    previous = since or None
+    for i, change in enumerate(changes):
+        if previous is not None and change.id != previous + 1 and change.created > settled_before:
+            return changes[:i]
+        previous = change.id
+    return changes
+
+
+def changes_since(since=0, limit=LIMIT):
+    """ :return: List of change dicts after the sequence number since, oldest first """
+    return [{
+        'seq': change.id,
+        'zone': change.zone_id,
+        'domain': change.domain,
+        'serial': change.serial,
+        'action': change.action,
+        'time': change.created.isoformat(),
+    } for change in settled(list(ZoneChange.objects.filter(id__gt=since).order_by('id')[:limit]), since)]
+
+
+def wait_for_changes(since=0, wait=0, limit=LIMIT):
+    """
+    Long-poll: like changes_since, but wait up to wait seconds (at most DNS_MANAGER_CHANGES_MAX_WAIT) for a change
+    :return: List of change dicts, empty if nothing changed in time
+    """
+    deadline = time.time() + (wait if wait < DNS_MANAGER_CHANGES_MAX_WAIT else DNS_MANAGER_CHANGES_MAX_WAIT)
+    while True:
+        changes = changes_since(since, limit)
+        if changes or time.time() >= deadline:
+            return changes
+        time.sleep(max(0, min(DNS_MANAGER_CHANGES_POLL_INTERVAL, deadline - time.time())))
+
+
+def oldest_sequence():
+    """ :return: Sequence number of the oldest change kept, 0 if there are none """
+    return ZoneChange.objects.order_by('id').values_list('id', flat=True).first() or 0
+
+
+def latest_sequence():
+    """ :return: Sequence number of the latest change, 0 if there are none """
+    return ZoneChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def prune(before):
+    """
+    Drop changes created before the given datetime, always keeping the latest so the sequence carries on
+    :return: Number of changes deleted
+    """
+    old = ZoneChange.objects.filter(created__lt=before, id__lt=latest_sequence())
+    deleted = old.count()
+    old.delete()
+    return deleted
@@ -0,0 +1,106 @@
+"""
+Clone a template zone into many domains with a handful of bulk_create statements.
+
+Each target zone gets the SOA settings, records and shared record sets of the source zone. In every record field
+the source domain name is replaced by the target domain name, then any per domain substitutions are applied. Only
+whole names and words are replaced, so example.com is replaced in ns1.example.com. but not in sample.com or
+example.com.au, eg:
+
+    clone_zone(template, ['a.example', 'b.example'], substitutions={'a.example': {'192.0.2.1': '198.51.100.7'}})
+"""
+import re
+import time
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import transaction, IntegrityError
+
+from .api import check_record
+from .dispatch import batched
+from .models import Zone, RECORD_MODELS, sync_resource_records, record_zone_changes, update_catalog_members
+from .signals import zone_fully_saved_signal
+from .synthetic import get_domain_model
+
+# Zone fields copied from the source zone
+ZONE_FIELDS = ('soa_email', 'refresh', 'retry', 'expire', 'minimum', 'ttl')
+
+
+def substitute(value, replacements):
+    """ Replace whole names, those not part of a longer label or followed by further labels """
+    for old, new in replacements:
+        value = re.sub(r'(?<![\w-])%s(?![\w-]|\.[\w-])' % re.escape(old), lambda match: new, value)
+    return value
+
+
+def clone_records(source, zones, substitutions):
+    """
+    :return: dict of record model to list of unsaved copies of the source records for each zone
+    """
+    copies = {}
+    for rtype, model in RECORD_MODELS:
+        fields = [f.attname for f in model._meta.concrete_fields
+                  if f.name not in ('id', 'zone', 'created', 'updated')]
+        records = list(model.objects.filter(zone=source).order_by().values(*fields))
+        copies[model] = []
+        for zone in zones:
+            replacements = [(source.domain_name, zone.domain_name)] + \
+                sorted(substitutions.get(zone.domain_name, {}).items())
+            for values in records:
+                values = dict((name, substitute(value, replacements) if isinstance(value, basestring) else value)
+                              for name, value in values.items())
+                copies[model].append(model(zone=zone, **values))
+    return copies
+
+
+def clone_zone(source, names, substitutions=None):
+    """
+    Create zones for the named domains as copies of the source zone, in one transaction.
+    :param source: Zone to copy
+    :param names: Domain names, the domains must exist and have no zone yet
+    :param substitutions: Optional dict of domain name to {old text: new text} replacements for its records
+    :return: list of created Zone objects
+    :raises ValidationError: if a domain is missing or taken, or a substituted record is invalid
+    """
+    names = list(names)
+    substitutions = substitutions or {}
+    domains = dict((d.name, d) for d in get_domain_model().objects.filter(name__in=names))
+    errors = ['%s: listed more than once' % name for name, count in sorted(Counter(names).items()) if count > 1]
+    errors += ['%s: domain not found' % name for name in names if name not in domains]
+    taken = Zone.objects.filter(domain__name__in=names).values_list('domain__name', flat=True)
+    errors += ['%s: zone already exists' % name for name in taken]
+    if errors:
+        raise ValidationError(errors)
+
+    serial = int(time.strftime('%Y%m%d00'))
+    values = dict((field, getattr(source, field)) for field in ZONE_FIELDS)
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                Zone.objects.bulk_create([Zone(domain=domains[name], serial=serial, **values) for name in names],
+                                         batch_size=500)
+        except IntegrityError:
+            # A zone created for one of the domains since the check above
+            raise ValidationError('A zone already exists for one of %s' % ', '.join(names))
+        zones = list(Zone.objects.filter(domain__name__in=names).select_related('domain'))
+
+        copies = clone_records(source, zones, substitutions)
+        errors = ['%s: %s' % (record.zone.domain_name, error)
+                  for records in copies.values() for record in records for error in check_record(record)]
+        if errors:
+            raise ValidationError(errors)
+        for model, records in copies.items():
+            model.objects.bulk_create(records, batch_size=500)
+
+        record_sets = list(source.record_sets.values_list('pk', flat=True))
+        if record_sets:
+            through = Zone.record_sets.through
+            through.objects.bulk_create([through(zone_id=zone.pk, recordset_id=pk)
+                                         for zone in zones for pk in record_sets], batch_size=500)
+        sync_resource_records(zones)
+        record_zone_changes(Zone.objects.filter(pk__in=[zone.pk for zone in zones]), 'created')
+        update_catalog_members((zone.pk, zone.domain_name, zone.valid) for zone in zones)
+
+    with batched():
+        for zone in zones:
+            zone_fully_saved_signal.send(sender=Zone, instance=zone, created=True)
+    return zones
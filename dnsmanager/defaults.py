@@ -16,4 +16,39 @@ DNS_MANAGER_RECIPES_DEFAULT = (
     ('dnsmanager.recipes.ReValidate', 'Force Revalidation')
 )
 
-DNS_MANAGER_NAMESERVERS_DEFAULT = ('ns1.example.com.', 'ns2.example.com.')
\ No newline at end of file
+DNS_MANAGER_NAMESERVERS_DEFAULT = ('ns1.example.com.', 'ns2.example.com.')
+DNS_MANAGER_CACHE_PREFIX_DEFAULT = 'dnsmanager'
+DNS_MANAGER_CACHE_TIMEOUT_DEFAULT = 604800  # 1 week, lets superseded generations expire
+
+DNS_MANAGER_INSTRUMENTATION_SINKS_DEFAULT = ()  # eg ('dnsmanager.instrumentation.log_sink', )
+
+DNS_MANAGER_DOMAIN_FACTORY_DEFAULT = None  # dotted path of a callable creating a domain by name
+
+DNS_MANAGER_METRICS_TIMEOUT_DEFAULT = 60  # seconds zone / record counts are cached for
+
+DNS_MANAGER_DEFER_NETWORK_CHECKS_DEFAULT = False
+DNS_MANAGER_VERIFIER_THREADS_DEFAULT = 10
+
+DNS_MANAGER_ZONE_CACHE_RECORDS_DEFAULT = 100000  # records held in the per process zone cache, 0 disables it
+DNS_MANAGER_ZONE_CACHE_BYTES_DEFAULT = None
+
+DNS_MANAGER_UNIFIED_RECORDS_DEFAULT = False
+
+DNS_MANAGER_HISTORY_DEFAULT = False
+DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL_DEFAULT = 20  # revisions between full checkpoints
+DNS_MANAGER_REVERSION_DEFAULT = True
+
+DNS_MANAGER_CHANGES_DEFAULT = False
+DNS_MANAGER_CHANGES_MAX_WAIT_DEFAULT = 60  # seconds a long-poll of the changes feed may be held
+DNS_MANAGER_CHANGES_POLL_INTERVAL_DEFAULT = 1  # seconds between checks while a long-poll is held
+DNS_MANAGER_CHANGES_COMMIT_GRACE_DEFAULT = 30  # seconds a gap in the changes sequence is waited on to be committed
+
+DNS_MANAGER_CATALOG_ZONE_DEFAULT = 'catalog.invalid'
+
+DNS_MANAGER_DYNUPDATE_KEYS_DEFAULT = {}  # eg {'acme-key.': 'base64 secret'}
+DNS_MANAGER_DYNUPDATE_WINDOW_DEFAULT = 0.2  # seconds of updates applied together with one serial bump per zone
+
+DNS_MANAGER_ZONES_SAVED_THREADS_DEFAULT = 0  # send zones_saved_signal in the saving thread
+
+DNS_MANAGER_READ_REPLICAS_DEFAULT = ()  # database aliases, eg ('replica1', 'replica2')
+DNS_MANAGER_REPLICA_PIN_SECONDS_DEFAULT = 30  # seconds a saved zone is read from the default database
@@ -0,0 +1,94 @@
+"""
+RRset level differences between two zone states.
+
+Each side is reduced to a dict keyed by (owner, type) holding the TTL and the sorted rdata texts of the RRset, so
+comparing zones is one pass over each side plus a sort of the changed keys. Sides can be the zone as stored, Bind
+zone text (eg before update_from_text) or a past serial recorded by dnsmanager.history.
+"""
+import dns.exception
+import dns.rdatatype
+import dns.zone
+
+from .history import zone_at
+
+
+class DiffError(Exception):
+    """ Raised when a side of a diff cannot be loaded """
+
+
+def rrsets(zone):
+    """ :return: dict of (owner, type) to (ttl, sorted rdata texts) of a dns.zone.Zone """
+    result = {}
+    for name, rdataset in zone.iterate_rdatasets():
+        key = (name.to_text(), dns.rdatatype.to_text(rdataset.rdtype))
+        result[key] = (rdataset.ttl, sorted(rd.to_text() for rd in rdataset))
+    return result
+
+
+def diff(old, new):
+    """
+    :param old: dns.zone.Zone
+    :param new: dns.zone.Zone
+    :return: List of change dicts sorted by owner and type, each with name, type, action (added, removed or
+             changed) and the old / new ttl and records
+    """
+    old, new = rrsets(old), rrsets(new)
+    changes = []
+    for key, (ttl, records) in new.items():
+        before = old.get(key)
+        if before is None:
+            changes.append((key, 'added', None, (ttl, records)))
+        elif before != (ttl, records):
+            changes.append((key, 'changed', before, (ttl, records)))
+    for key, before in old.items():
+        if key not in new:
+            changes.append((key, 'removed', before, None))
+    changes.sort()
+    return [{
+        'name': name,
+        'type': rtype,
+        'action': action,
+        'old': {'ttl': before[0], 'records': before[1]} if before else None,
+        'new': {'ttl': after[0], 'records': after[1]} if after else None,
+    } for (name, rtype), action, before, after in changes]
+
+
+def zone_from_text(zone, text):
+    """ :return: dns.zone.Zone parsed from Bind text the way update_from_text reads it """
+    try:
+        return dns.zone.from_text(str(text.replace('\r\n', '\n')), origin=zone.domain_name, check_origin=False,
+                                  relativize=True)
+    except Exception as e:
+        raise DiffError('Failed to parse zone text: %s' % e)
+
+
+def stored_zone(zone):
+    """ :return: dns.zone.Zone of the zone as stored """
+    try:
+        return zone.get_zone()
+    except (dns.exception.DNSException, UnicodeError) as e:
+        raise DiffError('Failed to build the stored zone: %s' % e)
+
+
+def zone_at_serial(zone, serial):
+    """ :return: dns.zone.Zone at the given serial, the stored zone if serial is None """
+    if serial is None or int(serial) == zone.serial:
+        return stored_zone(zone)
+    try:
+        past = zone_at(zone, int(serial))
+    except (dns.exception.DNSException, UnicodeError) as e:
+        raise DiffError('Failed to build serial %s: %s' % (serial, e))
+    if past is None:
+        raise DiffError('No history for serial %s' % serial)
+    return past
+
+
+def format_changes(changes):
+    """ :return: Unified diff style lines for a list of changes """
+    lines = []
+    for change in changes:
+        for sign, side in (('-', change['old']), ('+', change['new'])):
+            if side:
+                lines.extend('%s%s %s IN %s %s' % (sign, change['name'], side['ttl'], change['type'], rdata)
+                             for rdata in side['records'])
+    return lines
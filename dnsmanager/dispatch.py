@@ -0,0 +1,140 @@
+"""
+Batched dispatch of saved zones.
+
+Every zone_fully_saved_signal is collected here and passed on as a zones_saved_signal carrying a dict of zone id to
+Zone and the set of created zone ids. Outside a batch each zone is sent on its own straight away. Within
+batched(), or a request handled by BatchedZonesSavedMiddleware, zones are collected and sent once when the
+outermost batch closes, so a receiver publishing zones runs once for an admin action on many zones instead of once
+per zone.
+
+Django 1.8 has no on_commit hook, so open batches outside transaction.atomic() blocks (the middleware runs outside
+ATOMIC_REQUESTS) to send after the commit. A batch whose block raised is dropped, as is that of a request answered
+with a server error, since their transactions were rolled back. With DNS_MANAGER_ZONES_SAVED_THREADS set,
+zones_saved_signal is sent from a thread pool and the request does not wait for its receivers.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+
+from django.db import connection
+
+from .settings import DNS_MANAGER_ZONES_SAVED_THREADS
+from .signals import zones_saved_signal
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class ZoneBatch(object):
+
+    def __init__(self):
+        self.zones = OrderedDict()
+        self.created = set()
+        self.discarded = False
+
+    def add(self, zone, created):
+        self.zones[zone.pk] = zone
+        if created:
+            self.created.add(zone.pk)
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(DNS_MANAGER_ZONES_SAVED_THREADS)
+    return _pool
+
+
+def send(batch, background=False):
+    try:
+        zones_saved_signal.send(sender=type(next(iter(batch.zones.values()))), zones=batch.zones,
+                                created=batch.created)
+    except Exception:
+        if not background:
+            raise
+        logger.exception('zones_saved_signal receiver failed')
+    finally:
+        if background:
+            connection.close()  # each pool thread has its own connection
+
+
+def dispatch(batch):
+    if not batch.zones:
+        return
+    if DNS_MANAGER_ZONES_SAVED_THREADS:
+        get_pool().apply_async(send, (batch, True))
+    else:
+        send(batch)
+
+
+def begin():
+    depth = getattr(_local, 'depth', 0)
+    if not depth:
+        _local.batch = ZoneBatch()
+    _local.depth = depth + 1
+
+
+def end(discard=False):
+    """ Close a batch, discard drops the zones of the outermost batch instead of sending them """
+    _local.depth -= 1
+    if discard:
+        _local.batch.discarded = True
+    if not _local.depth:
+        batch, _local.batch = _local.batch, None
+        if not batch.discarded:
+            dispatch(batch)
+
+
+@contextmanager
+def batched():
+    """
+    Collect the zones saved within the block and send them in one zones_saved_signal at the end, unless the block
+    or a batch nested in it raised
+    """
+    begin()
+    try:
+        yield
+    except BaseException:
+        end(discard=True)
+        raise
+    end()
+
+
+def collect_saved_zone(sender, instance, created=False, **kwargs):
+    """ zone_fully_saved_signal receiver """
+    batch = getattr(_local, 'batch', None)
+    if batch is None:
+        batch = ZoneBatch()
+        batch.add(instance, created)
+        dispatch(batch)
+    else:
+        batch.add(instance, created)
+
+
+class BatchedZonesSavedMiddleware(object):
+    """
+    Send the zones saved while handling a request in one zones_saved_signal after the response, none if the
+    request failed
+    """
+
+    def process_request(self, request):
+        begin()
+        request._dnsmanager_batch = True
+
+    def process_exception(self, request, exception):
+        self.end(request, discard=True)
+
+    def process_response(self, request, response):
+        self.end(request, discard=response.status_code >= 500)
+        return response
+
+    def end(self, request, discard):
+        if getattr(request, '_dnsmanager_batch', False):
+            request._dnsmanager_batch = False
+            end(discard)
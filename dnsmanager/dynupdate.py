@@ -0,0 +1,323 @@
+"""
+RFC 2136 dynamic updates applied to the record models.
+
+UPDATE messages are checked against the stored records of their zone and turned into dnsmanager.api record
+operations, so they get the same field and syntax checks as the bulk API. UpdateProcessor applies messages in
+batches: every message runs in its own savepoint, so a failing message changes nothing, and the zones touched by
+the whole batch get one serial bump each once the batch is written. A batch collects the messages arriving within
+DNS_MANAGER_DYNUPDATE_WINDOW seconds of the first, so a burst of updates (eg an ACME client setting several
+challenges) publishes a single new serial.
+
+Only the record types of the models can be added. Shared records and the apex NS records are left alone by
+deletions, SOA changes are refused. Names are stored as relative owners and absolute targets.
+"""
+import logging
+import Queue
+import struct
+import threading
+import time
+
+import dns.exception
+import dns.flags
+import dns.message
+import dns.name
+import dns.opcode
+import dns.rcode
+import dns.rdata
+import dns.rdataclass
+import dns.rdatatype
+import dns.tsig
+import dns.tsigkeyring
+from django.db import transaction
+
+from .api import prepare, write
+from .builder import record_row
+from .dispatch import batched
+from .models import Zone, RECORD_MODELS
+from .settings import DNS_MANAGER_DYNUPDATE_KEYS, DNS_MANAGER_DYNUPDATE_WINDOW
+from .signals import zone_fully_saved_signal
+
+logger = logging.getLogger(__name__)
+
+IN = dns.rdataclass.IN
+ANY = dns.rdataclass.ANY
+NONE = dns.rdataclass.NONE
+
+# Record model fields of an added record, by type
+RECORD_FIELDS = {
+    'A': lambda owner, rd: {'data': owner, 'ip': rd.address},
+    'CNAME': lambda owner, rd: {'data': owner, 'target': rd.target.to_text()},
+    'MX': lambda owner, rd: {'origin': owner, 'priority': rd.preference, 'data': rd.exchange.to_text()},
+    'NS': lambda owner, rd: {'origin': owner, 'data': rd.target.to_text()},
+    'TXT': lambda owner, rd: {'data': owner, 'text': rd.to_text()},
+    'SRV': lambda owner, rd: {'data': owner, 'priority': rd.priority, 'weight': rd.weight, 'port': rd.port,
+                              'target': rd.target.to_text()},
+}
+
+
+class UpdateError(Exception):
+    """ Raised to answer an UPDATE message with an error rcode, nothing of the message has been written """
+
+    def __init__(self, rcode, message=''):
+        super(UpdateError, self).__init__(message or dns.rcode.to_text(rcode))
+        self.rcode = rcode
+
+
+class Entry(object):
+    """ A record of the zone being updated, stored (record), added by the update (op) or shared (neither) """
+
+    def __init__(self, name, rdtype, rdata, record=None, op=None):
+        self.name = name
+        self.rdtype = rdtype
+        self.rdata = rdata
+        self.record = record
+        self.op = op
+
+
+def zone_entries(zone, origin):
+    """ :return: List of Entry for the stored and shared records of the zone """
+    entries = []
+    for rtype, model in RECORD_MODELS:
+        rdtype = dns.rdatatype.from_text(rtype)
+        for record in model.objects.filter(zone=zone).order_by():
+            owner, text = record_row(rtype, record)
+            entries.append(Entry(dns.name.from_text(owner, origin), rdtype,
+                                 dns.rdata.from_text(IN, rdtype, str(text), origin, relativize=False), record))
+    for record in zone.shared_records():
+        rdtype = dns.rdatatype.from_text(record.rtype)
+        entries.append(Entry(dns.name.from_text(record.owner, origin), rdtype,
+                             dns.rdata.from_text(IN, rdtype, str(record.rdata), origin, relativize=False)))
+    return entries
+
+
+class ZoneUpdate(object):
+    """ Checks the prerequisites of an UPDATE message and turns its updates into record operations """
+
+    def __init__(self, zone, origin):
+        self.zone = zone
+        self.origin = origin
+        self.entries = zone_entries(zone, origin)
+        self.deleted = []
+
+    def rdatas(self, name, rdtype):
+        return set(e.rdata for e in self.entries if e.name == name and e.rdtype == rdtype)
+
+    def exists(self, name, rdtype):
+        if rdtype == dns.rdatatype.SOA:
+            return name == self.origin
+        return any(e.name == name and e.rdtype == rdtype for e in self.entries)
+
+    def in_use(self, name):
+        return name == self.origin or any(e.name == name for e in self.entries)
+
+    def check_prerequisites(self, rrsets):
+        """ RFC 2136 section 3.2, :raises UpdateError: when a prerequisite is not met """
+        required = {}
+        for rrset in rrsets:
+            if rrset.ttl != 0:
+                raise UpdateError(dns.rcode.FORMERR, 'prerequisite TTL must be 0')
+            if not rrset.name.is_subdomain(self.origin):
+                raise UpdateError(dns.rcode.NOTZONE, '%s is outside the zone' % rrset.name)
+            if rrset.deleting == ANY:
+                if rrset.rdtype == dns.rdatatype.ANY:
+                    if not self.in_use(rrset.name):
+                        raise UpdateError(dns.rcode.NXDOMAIN, '%s is not in use' % rrset.name)
+                elif not self.exists(rrset.name, rrset.rdtype):
+                    raise UpdateError(dns.rcode.NXRRSET, '%s %s does not exist' % (
+                        rrset.name, dns.rdatatype.to_text(rrset.rdtype)))
+            elif rrset.deleting == NONE:
+                if rrset.rdtype == dns.rdatatype.ANY:
+                    if self.in_use(rrset.name):
+                        raise UpdateError(dns.rcode.YXDOMAIN, '%s is in use' % rrset.name)
+                elif self.exists(rrset.name, rrset.rdtype):
+                    raise UpdateError(dns.rcode.YXRRSET, '%s %s exists' % (
+                        rrset.name, dns.rdatatype.to_text(rrset.rdtype)))
+            else:
+                required.setdefault((rrset.name, rrset.rdtype), set()).update(rrset)
+        for (name, rdtype), rdatas in required.items():
+            if self.rdatas(name, rdtype) != rdatas:
+                raise UpdateError(dns.rcode.NXRRSET, '%s %s differs' % (name, dns.rdatatype.to_text(rdtype)))
+
+    def check_updates(self, rrsets):
+        """ RFC 2136 section 3.4.1 prescan, :raises UpdateError: for updates that cannot be applied """
+        for rrset in rrsets:
+            if not rrset.name.is_subdomain(self.origin):
+                raise UpdateError(dns.rcode.NOTZONE, '%s is outside the zone' % rrset.name)
+            rtype = dns.rdatatype.to_text(rrset.rdtype)
+            if rrset.deleting is None:
+                if dns.rdatatype.is_metatype(rrset.rdtype):
+                    raise UpdateError(dns.rcode.FORMERR, 'cannot add %s records' % rtype)
+                if rtype not in RECORD_FIELDS:
+                    raise UpdateError(dns.rcode.REFUSED, '%s records are not supported' % rtype)
+            elif rrset.ttl != 0 or (rrset.deleting == ANY and len(rrset)):
+                raise UpdateError(dns.rcode.FORMERR, 'malformed delete of %s %s' % (rrset.name, rtype))
+
+    def add(self, name, rdtype, rdata, ttl):
+        if rdata in self.rdatas(name, rdtype):
+            return
+        here = [e for e in self.entries if e.name == name]
+        if rdtype == dns.rdatatype.CNAME:
+            if any(e.rdtype != rdtype for e in here):
+                return  # CNAME and other data at one name, ignored as in RFC 2136 3.4.2.2
+            self.remove(lambda e: e.name == name and e.rdtype == rdtype)
+        elif any(e.rdtype == dns.rdatatype.CNAME for e in here):
+            return
+        rtype = dns.rdatatype.to_text(rdtype)
+        op = {'op': 'create', 'zone': self.zone.pk, 'type': rtype, 'ttl': ttl}
+        op.update(RECORD_FIELDS[rtype](name.relativize(self.origin).to_text(), rdata))
+        self.entries.append(Entry(name, rdtype, rdata, op=op))
+
+    def remove(self, match):
+        for e in [e for e in self.entries if match(e)]:
+            if e.record is None and e.op is None:
+                continue  # shared records are changed through their record set
+            if e.name == self.origin and e.rdtype == dns.rdatatype.NS and len(self.rdatas(e.name, e.rdtype)) == 1:
+                continue  # keep the last apex name server
+            self.entries.remove(e)
+            if e.record is not None:
+                self.deleted.append(e)
+
+    def operations(self, rrsets):
+        """ :return: dnsmanager.api operations applying the updates in order """
+        self.check_updates(rrsets)
+        for rrset in rrsets:
+            name, rdtype = rrset.name, rrset.rdtype
+            if rrset.deleting is None:
+                for rdata in rrset:
+                    self.add(name, rdtype, rdata, rrset.ttl)
+            elif rrset.deleting == ANY:
+                if name == self.origin and rdtype == dns.rdatatype.NS:
+                    continue  # apex name servers are only deleted one by one
+                elif rdtype == dns.rdatatype.ANY:
+                    self.remove(lambda e: e.name == name and not (name == self.origin and
+                                                                  e.rdtype == dns.rdatatype.NS))
+                else:
+                    self.remove(lambda e: e.name == name and e.rdtype == rdtype)
+            else:
+                for rdata in rrset:
+                    self.remove(lambda e: e.name == name and e.rdtype == rdtype and e.rdata == rdata)
+        return [e.op for e in self.entries if e.op is not None] + \
+            [{'op': 'delete', 'type': dns.rdatatype.to_text(e.rdtype), 'id': e.record.pk} for e in self.deleted]
+
+
+def apply_message(message):
+    """
+    Apply one parsed UPDATE message, call within a transaction.
+    :return: dict of zone id to Zone of the zones written to
+    :raises UpdateError: when the message is refused
+    """
+    if message.opcode() != dns.opcode.UPDATE:
+        raise UpdateError(dns.rcode.NOTIMP)
+    if len(message.question) != 1 or message.question[0].rdtype != dns.rdatatype.SOA:
+        raise UpdateError(dns.rcode.FORMERR, 'the zone section must hold one SOA')
+    origin = message.question[0].name
+    zone = Zone.objects.select_related('domain').filter(
+        domain__name__iexact=origin.to_text(omit_final_dot=True)).first()
+    if zone is None:
+        raise UpdateError(dns.rcode.NOTAUTH, '%s is not a zone here' % origin)
+
+    update = ZoneUpdate(zone, origin)
+    update.check_prerequisites(message.answer)
+    operations = update.operations(message.authority)
+    if not operations:
+        return {}
+    results, creates, updates, deletes = prepare(operations)
+    errors = [error for result in results for error in result['errors']]
+    if errors:
+        raise UpdateError(dns.rcode.REFUSED, '; '.join(errors))
+    return write(creates, updates, deletes)
+
+
+def error_response(wire, rcode):
+    """ :return: Response to a message that could not be parsed, None if not even the header could """
+    if len(wire) < 12:
+        return None
+    response = dns.message.Message(id=struct.unpack('!H', wire[:2])[0])
+    response.flags = dns.flags.QR
+    response.set_opcode(dns.opcode.UPDATE)
+    response.set_rcode(rcode)
+    return response
+
+
+class UpdateProcessor(object):
+    """
+    Applies UPDATE messages in batches, see the module docstring. submit() may be called from many threads
+    while run() works through the queue in one.
+    """
+
+    def __init__(self, keys=DNS_MANAGER_DYNUPDATE_KEYS, window=DNS_MANAGER_DYNUPDATE_WINDOW):
+        self.keyring = dns.tsigkeyring.from_text(keys) if keys else None
+        self.window = window
+        self.queue = Queue.Queue()
+
+    def submit(self, wire):
+        """ Queue a message and wait for it to be applied :return: Response wire data or None """
+        item = [wire, None, threading.Event()]
+        self.queue.put(item)
+        item[2].wait()
+        return item[1]
+
+    def run(self):
+        while True:
+            self.run_batch(timeout=1)  # wake up now and then, Python 2 queue waits ignore KeyboardInterrupt
+
+    def run_batch(self, timeout=None):
+        """ Wait for a message, apply it with any others arriving within the window and answer them """
+        try:
+            items = [self.queue.get(timeout=timeout)]
+        except Queue.Empty:
+            return
+        deadline = time.time() + self.window
+        while time.time() < deadline:
+            try:
+                items.append(self.queue.get(timeout=max(0, deadline - time.time())))
+            except Queue.Empty:
+                break
+        try:
+            responses = self.process([item[0] for item in items])
+        except Exception:
+            logger.exception('Failed to apply dynamic updates')
+            responses = [None] * len(items)
+        for item, response in zip(items, responses):
+            item[1] = response
+            item[2].set()
+
+    def process(self, wires):
+        """
+        Apply a batch of messages, then bump the serial of each zone written to once
+        :return: List of response wire data, None for messages not answered
+        """
+        touched = {}
+        with transaction.atomic():
+            responses = [self.respond(wire, touched) for wire in wires]
+            for zone in touched.values():
+                zone.save()
+        with batched():
+            for zone in touched.values():
+                zone_fully_saved_signal.send(sender=Zone, instance=zone, created=False)
+        return [response.to_wire() if response is not None else None for response in responses]
+
+    def respond(self, wire, touched):
+        try:
+            message = dns.message.from_wire(wire, keyring=self.keyring)
+        except (dns.message.UnknownTSIGKey, dns.tsig.BadSignature, dns.tsig.BadTime) as e:
+            logger.warning('Update with bad TSIG: %s', e)
+            return error_response(wire, dns.rcode.NOTAUTH)
+        except dns.exception.DNSException:
+            return error_response(wire, dns.rcode.FORMERR)
+
+        response = dns.message.make_response(message)
+        if self.keyring is not None and not message.had_tsig:
+            response.set_rcode(dns.rcode.REFUSED)
+            return response
+        try:
+            with transaction.atomic():
+                touched.update(apply_message(message))
+        except UpdateError as e:
+            logger.info('Update refused: %s', e)
+            response.set_rcode(e.rcode)
+        except Exception:
+            # Eg a constraint violation or a stored record that does not parse, only this message is rolled back
+            logger.exception('Failed to apply update')
+            response.set_rcode(dns.rcode.SERVFAIL)
+        return response
@@ -0,0 +1,70 @@
+"""
+Stream many rendered zones in one response, for secondaries syncing all or recently changed zones.
+
+Zones are loaded in batches with their records prefetched, so each batch costs a fixed number of queries
+however many records it holds, and each zone is rendered only when the stream reaches it. Two formats are
+supported:
+
+    tar     an uncompressed tar archive with one "<domain>.zone" member per zone
+    stream  for each zone a "<domain> <serial> <length>\\n" header line followed by length bytes of zone text
+"""
+import tarfile
+import time
+
+from django.template.loader import get_template
+
+from .models import Zone
+
+FORMATS = ('tar', 'stream')
+BATCH_SIZE = 200
+RECORD_RELATIONS = ('nameserverrecords', 'addressrecords', 'canonicalnamerecords', 'mailexchangerecords',
+                    'textrecords', 'servicerecords', 'record_sets__records')
+
+
+def select_zones(ids=None, since=None, serial=None):
+    """
+    :param ids: Only these zone ids
+    :param since: Only zones saved after this datetime
+    :param serial: Only zones with a serial above this one
+    :return: Zone queryset
+    """
+    queryset = Zone.objects.all()
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    if since is not None:
+        queryset = queryset.filter(updated__gt=since)
+    if serial is not None:
+        queryset = queryset.filter(serial__gt=serial)
+    return queryset
+
+
+def rendered_zones(queryset, batch_size=BATCH_SIZE):
+    """ Yield (zone, zone text) for the zones of the queryset, loaded in prefetched batches """
+    template = get_template('dnsmanager/zone_detail.txt')
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(pks), batch_size):
+        batch = Zone.objects.filter(pk__in=pks[i:i + batch_size]).order_by('pk') \
+            .select_related('domain').prefetch_related(*RECORD_RELATIONS)
+        for zone in batch:
+            yield zone, template.render({'object': zone}).encode('utf-8')
+
+
+def tar_stream(zones):
+    """ Yield an uncompressed tar archive of (zone, zone text) pairs, one member at a time """
+    for zone, text in zones:
+        info = tarfile.TarInfo('%s.zone' % zone.domain_name)
+        info.size = len(text)
+        info.mtime = time.mktime(zone.updated.timetuple())
+        # USTAR headers hold names of up to 100 bytes, PAX adds an extended header for longer domain names
+        yield info.tobuf(format=tarfile.PAX_FORMAT)
+        yield text
+        if len(text) % tarfile.BLOCKSIZE:
+            yield tarfile.NUL * (tarfile.BLOCKSIZE - len(text) % tarfile.BLOCKSIZE)
+    yield tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+
+
+def length_prefixed_stream(zones):
+    """ Yield each zone as a "<domain> <serial> <length>" header line and the zone text """
+    for zone, text in zones:
+        yield '%s %d %d\n' % (zone.domain_name, zone.serial, len(text))
+        yield text
@@ -0,0 +1,178 @@
+"""
+Compact zone history.
+
+Each zone save and serial bump records a ZoneRevision, see models.record_zone_revisions. Record writes note the
+rows they add and remove as ZoneRevisionChange rows, and a revision is built from those, so recording it does not
+read the whole zone. Record changes made without a zone save keep the serial and are recorded with the next save.
+Record writes after a save, as in the admin and update_from_text, are merged into the revision of that serial, so
+each serial has one revision. Zones created with bulk inserts (clonezone, loadzones, synthetic zones) have no
+history until saved.
+
+Most revisions hold only the SOA values and the records added and removed since the previous revision. Every
+DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL revisions a full checkpoint is read from the records instead, so any past
+serial is rebuilt from one checkpoint and a bounded number of deltas.
+
+Records are stored as [type, owner, ttl, rdata text] rows, with a null ttl for records using the zone default.
+"""
+import copy
+import json
+
+from django.db import transaction, DEFAULT_DB_ALIAS
+
+from .builder import build_zone, record_row
+from .models import ZoneRevision, ZoneRevisionChange, SharedRecord, RECORD_MODELS
+from .settings import DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL
+
+SOA_FIELDS = ('soa_email', 'serial', 'refresh', 'retry', 'expire', 'minimum', 'ttl')
+
+
+def current_state(zone):
+    """ :return: (SOA dict, set of record row tuples) of the zone as stored now """
+    rows = set()
+    for rtype, model in RECORD_MODELS:
+        for record in model.objects.filter(zone=zone).order_by():
+            owner, rdata = record_row(rtype, record)
+            rows.add((rtype, owner, record.ttl, rdata))
+    for record in SharedRecord.objects.filter(record_set__zones=zone):
+        rows.add((record.rtype, record.owner, record.ttl, record.rdata))
+    return dict((field, getattr(zone, field)) for field in SOA_FIELDS), rows
+
+
+def state_at(revision):
+    """
+    :return: (SOA dict, set of record row tuples, number of deltas applied) at the given revision
+    """
+    revisions = ZoneRevision.objects.filter(zone=revision.zone_id, id__lte=revision.id)
+    checkpoint = revision if revision.checkpoint else revisions.filter(checkpoint=True).latest('id')
+    data = json.loads(checkpoint.data)
+    rows = set(tuple(row) for row in data['rows'])
+    soa = data['soa']
+    deltas = 0
+    for delta in revisions.filter(id__gt=checkpoint.id).order_by('id').values_list('data', flat=True):
+        data = json.loads(delta)
+        rows.difference_update(tuple(row) for row in data['removed'])
+        rows.update(tuple(row) for row in data['added'])
+        soa = data['soa']
+        deltas += 1
+    return soa, rows, deltas
+
+
+def checkpoint_data(soa, rows):
+    return json.dumps({'soa': soa, 'rows': sorted(rows)}, separators=(',', ':'))
+
+
+def delta_data(soa, added, removed):
+    return json.dumps({'soa': soa, 'added': sorted(added), 'removed': sorted(removed)}, separators=(',', ':'))
+
+
+def merge(added, removed, later_added, later_removed):
+    """ :return: (added, removed) row sets of two consecutive changes taken as one """
+    return (added - later_removed) | (later_added - removed), (removed - later_added) | (later_removed - added)
+
+
+def noted_changes(zone):
+    """
+    Take the ZoneRevisionChange rows of the zone, deleting them.
+    :return: (added, removed) record row sets since the latest revision
+    """
+    changes = ZoneRevisionChange.objects.using(DEFAULT_DB_ALIAS).filter(zone_id=zone.pk).order_by('id')
+    added, removed = set(), set()
+    last_id = None
+    for last_id, is_added, rtype, owner, ttl, rdata in changes.values_list('id', 'added', 'rtype', 'owner', 'ttl',
+                                                                             'rdata'):
+        row = (rtype, owner, ttl, rdata)
+        if is_added:
+            added, removed = merge(added, removed, {row}, set())
+        else:
+            added, removed = merge(added, removed, set(), {row})
+    if last_id is not None:
+        changes.filter(id__lte=last_id).delete()
+    return added, removed
+
+
+def record_revision(zone, full=False):
+    """
+    Store a revision of the zone as it is now, from the changes noted since the latest revision. A revision at the
+    serial of the latest one is merged into it.
+    :param full: Compare every record with the latest revision instead, for changes not noted
+    :return: the new or updated ZoneRevision
+    """
+    soa = dict((field, getattr(zone, field)) for field in SOA_FIELDS)
+    added, removed = noted_changes(zone)
+    last = zone.revisions.order_by('-id').first()
+    if last is None:
+        return ZoneRevision.objects.create(zone=zone, serial=zone.serial, checkpoint=True,
+                                           data=checkpoint_data(*current_state(zone)))
+    if full:
+        last_soa, last_rows, deltas = state_at(last)
+        soa, rows = current_state(zone)
+        added, removed = rows - last_rows, last_rows - rows
+
+    if last.serial == zone.serial:
+        data = json.loads(last.data)
+        if data['soa'] == soa and not added and not removed:
+            return last  # recorded already, eg by the save before zone_fully_saved_signal
+        if last.checkpoint:
+            rows = set(tuple(row) for row in data['rows'])
+            last.data = checkpoint_data(soa, (rows - removed) | added)
+        else:
+            last.data = delta_data(soa, *merge(set(tuple(row) for row in data['added']),
+                                               set(tuple(row) for row in data['removed']), added, removed))
+        last.save(update_fields=['data'])
+        return last
+    if not full:
+        deltas = 0
+        if not last.checkpoint:
+            checkpoint = zone.revisions.filter(checkpoint=True).order_by('-id').values_list('id', flat=True)[0]
+            deltas = zone.revisions.filter(id__gt=checkpoint).count()
+    if deltas + 1 < DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL:
+        return ZoneRevision.objects.create(zone=zone, serial=zone.serial, data=delta_data(soa, added, removed))
+    return ZoneRevision.objects.create(zone=zone, serial=zone.serial, checkpoint=True,
+                                       data=checkpoint_data(*current_state(zone)))
+
+
+def revision_at(zone, serial):
+    """ :return: The latest ZoneRevision of the zone at or before serial, or None """
+    return zone.revisions.filter(serial__lte=serial).order_by('-id').first()
+
+
+def zone_at(zone, serial):
+    """
+    :return: dns.zone.Zone of the zone as it was at the given serial, or None if no revision is that old
+    """
+    revision = revision_at(zone, serial)
+    if revision is None:
+        return None
+    soa, rows, deltas = state_at(revision)
+    past = copy.copy(zone)
+    for field, value in soa.items():
+        setattr(past, field, value)
+    # Name servers first, in the order of nameserverrecords, as the SOA names the first
+    rows = sorted(rows, key=lambda row: (row[0] != 'NS', row[3] if row[0] == 'NS' else ''))
+    return build_zone(past, [(owner, ttl if ttl is not None else past.ttl, rtype, rdata)
+                             for rtype, owner, ttl, rdata in rows])
+
+
+def compact(zone, keep_after=None, keep=None):
+    """
+    Drop old revisions of the zone, keeping those created after keep_after and at least the latest keep
+    revisions (one by default). The oldest kept revision is rewritten as a checkpoint so it can still be rebuilt.
+    :return: Number of revisions deleted
+    """
+    revisions = zone.revisions.order_by('-id')
+    kept = list(revisions.values_list('id', flat=True)[:keep or 1])
+    if keep_after is not None:
+        kept.extend(revisions.filter(created__gt=keep_after).values_list('id', flat=True))
+    if not kept:
+        return 0
+    oldest = ZoneRevision.objects.get(pk=min(kept))
+    with transaction.atomic():
+        if not oldest.checkpoint:
+            soa, rows, deltas = state_at(oldest)
+            oldest.checkpoint = True
+            oldest.data = checkpoint_data(soa, rows)
+            oldest.save()
+        old = zone.revisions.filter(id__lt=oldest.id)
+        deleted = old.count()
+        old.delete()
+    return deleted
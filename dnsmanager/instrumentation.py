@@ -0,0 +1,152 @@
+"""
+Lightweight instrumentation of dnsmanager hot paths.
+
+Instrumented calls record wall time, SQL query count / time and cache hits / misses, and pass the resulting
+Measurement to every configured sink. Sinks are callables taking a Measurement, configured with the
+DNS_MANAGER_INSTRUMENTATION_SINKS setting (dotted paths) or added at runtime with add_sink(). With no sinks
+an instrumented call costs one global lookup.
+"""
+import logging
+import threading
+import time
+from functools import wraps
+
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from .settings import DNS_MANAGER_INSTRUMENTATION_SINKS
+from .signals import operation_measured_signal
+
+logger = logging.getLogger(__name__)
+
+_sinks = [import_string(path) for path in DNS_MANAGER_INSTRUMENTATION_SINKS]
+_local = threading.local()
+
+
+class Measurement(object):
+    """ Result of one instrumented call """
+
+    def __init__(self, operation, zone=None, detail=None):
+        self.operation = operation
+        self.zone = zone
+        self.detail = detail
+        self.wall_time = 0.0
+        self.query_count = 0
+        self.query_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.failed = False
+
+    def __repr__(self):
+        return '<Measurement %s>' % self.as_text()
+
+    def as_text(self):
+        return '%s%s%s wall=%.4fs queries=%d sql=%.4fs cache=%d/%d%s' % (
+            self.operation,
+            ' zone=%s' % self.zone if self.zone is not None else '',
+            ' detail=%s' % self.detail if self.detail is not None else '',
+            self.wall_time, self.query_count, self.query_time,
+            self.cache_hits, self.cache_hits + self.cache_misses,
+            ' failed' if self.failed else '')
+
+
+def add_sink(sink):
+    if sink not in _sinks:
+        _sinks.append(sink)
+
+
+def remove_sink(sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+def enabled():
+    return bool(_sinks)
+
+
+def log_sink(measurement):
+    """ Sink writing measurements to the dnsmanager.instrumentation logger """
+    logger.info(measurement.as_text())
+
+
+def signal_sink(measurement):
+    """ Sink sending measurements as operation_measured_signal """
+    operation_measured_signal.send(sender=Measurement, measurement=measurement)
+
+
+def record_cache(hit):
+    """ Count a cache hit or miss against every measurement in progress on this thread """
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        for measurement in stack:
+            if hit:
+                measurement.cache_hits += 1
+            else:
+                measurement.cache_misses += 1
+
+
+def _zone_name(args):
+    if args and hasattr(args[0], 'domain_name'):
+        return args[0].domain_name
+    return None
+
+
+def _queries_since(log, last):
+    """ :return: Queries logged after the entry last, all of them when last is None or has left the bounded log """
+    queries = []
+    for query in reversed(log):
+        if query is last:
+            break
+        queries.append(query)
+    return queries
+
+
+def _measure(operation, detail, func, args, kwargs):
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    measurement = Measurement(operation, _zone_name(args), detail(*args, **kwargs) if detail else None)
+
+    cursors = []
+    for connection in connections.all():
+        # The query log is shared with eg assertNumQueries and bounded, so remember its last entry rather than a
+        # length that stops growing once the log is full
+        log = connection.queries_log
+        cursors.append((connection, connection.force_debug_cursor, log[-1] if log else None))
+        connection.force_debug_cursor = True
+
+    stack.append(measurement)
+    start = time.time()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        measurement.failed = True
+        raise
+    finally:
+        measurement.wall_time = time.time() - start
+        stack.pop()
+        for connection, force_debug_cursor, last in cursors:
+            connection.force_debug_cursor = force_debug_cursor
+            queries = _queries_since(connection.queries_log, last)
+            measurement.query_count += len(queries)
+            measurement.query_time += sum(float(q['time']) for q in queries)
+        for sink in list(_sinks):
+            try:
+                sink(measurement)
+            except Exception:
+                logger.exception('Instrumentation sink %r failed', sink)
+
+
+def instrumented(operation, detail=None):
+    """
+    Decorator measuring each call of the decorated function as the named operation.
+    The zone is taken from the first argument, detail is an optional callable returning extra context.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _sinks:
+                return func(*args, **kwargs)
+            return _measure(operation, detail, func, args, kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,163 @@
+"""
+Concurrent HTTP load tests of the zone views, used by the dnsloadtest management command.
+
+The project's WSGI application is served by a threaded wsgiref server on localhost and client threads work through
+a shared queue of URLs, timing each response. Database queries are totalled on the server side by turning on the
+query log of each request thread's connection, so they include everything the views and middleware run. The query
+log of a connection holds at most 9000 queries per request.
+"""
+import httplib
+import math
+import Queue
+import SocketServer
+import threading
+import time
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingWSGIServer(SocketServer.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class CountedResponse(object):
+    """ Wraps a WSGI response to count queries once it is closed, after any streaming """
+
+    def __init__(self, response, done):
+        self.response = response
+        self.done = done
+
+    def __iter__(self):
+        return iter(self.response)
+
+    def close(self):
+        try:
+            if hasattr(self.response, 'close'):
+                self.response.close()
+        finally:
+            self.done()
+
+
+class QueryCounter(object):
+    """ WSGI middleware totalling the database queries of all requests """
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.total = 0
+
+    def __call__(self, environ, start_response):
+        connection.force_debug_cursor = True
+        connection.queries_log.clear()
+        return CountedResponse(self.app(environ, start_response), self.count)
+
+    def count(self):
+        with self.lock:
+            self.total += len(connection.queries_log)
+
+    def reset(self):
+        """ :return: Queries counted since the last reset """
+        with self.lock:
+            total, self.total = self.total, 0
+        return total
+
+
+class LoadServer(object):
+    """ Threaded WSGI server on a free localhost port, serving in a background thread """
+
+    def __init__(self, app=None):
+        self.counter = QueryCounter(app or get_wsgi_application())
+        self.httpd = make_server('127.0.0.1', 0, self.counter, server_class=ThreadingWSGIServer,
+                                 handler_class=QuietHandler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def request(port, path, headers):
+    """ :return: (seconds, HTTP status), status 0 if the request failed """
+    start = time.time()
+    try:
+        conn = httplib.HTTPConnection('127.0.0.1', port, timeout=300)
+        conn.request('GET', path, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        status = response.status
+    except (IOError, httplib.HTTPException):
+        status = 0
+    return time.time() - start, status
+
+
+def run_load(port, paths, concurrency, headers=None):
+    """
+    Request every path once, from concurrency client threads.
+    :return: (list of response seconds, number of non 200 responses, elapsed seconds)
+    """
+    queue = Queue.Queue()
+    for path in paths:
+        queue.put(path)
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            try:
+                path = queue.get_nowait()
+            except Queue.Empty:
+                return
+            seconds, status = request(port, path, headers or {})
+            with lock:
+                latencies.append(seconds)
+                if status != 200:
+                    errors[0] += 1
+
+    start = time.time()
+    threads = [threading.Thread(target=client) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.time() - start
+
+
+def percentile(values, p):
+    """ :return: The p-th percentile of values, nearest rank """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, int(math.ceil(p / 100.0 * len(values))) - 1)]
+
+
+def summarize(name, latencies, errors, elapsed, queries, **labels):
+    """ :return: dict of results, including any labels """
+    result = {
+        'name': name,
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed else None,
+        'p50_ms': percentile(latencies, 50) * 1000 if latencies else None,
+        'p95_ms': percentile(latencies, 95) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 99) * 1000 if latencies else None,
+        'queries': queries,
+        'queries_per_request': float(queries) / len(latencies) if latencies else None,
+    }
+    result.update(labels)
+    return result
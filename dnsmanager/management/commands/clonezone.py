@@ -0,0 +1,43 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from dnsmanager.cloning import clone_zone
+from dnsmanager.models import Zone
+
+
+class Command(BaseCommand):
+    help = 'Create zones for existing domains as copies of a template zone'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Domain name of the template zone')
+        parser.add_argument('domains', nargs='*', help='Domain names to create zones for')
+        parser.add_argument('--file', help='Read further domain names from this file, one per line')
+        parser.add_argument('--substitutions',
+                            help='JSON file of {"domain": {"old text": "new text"}} record substitutions')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Zones created per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            source = Zone.objects.select_related('domain').get(domain__name=options['source'])
+        except Zone.DoesNotExist:
+            raise CommandError('No zone for %s' % options['source'])
+
+        names = list(options['domains'])
+        if options['file']:
+            with open(options['file']) as f:
+                names.extend(line.strip() for line in f if line.strip())
+        substitutions = {}
+        if options['substitutions']:
+            with open(options['substitutions']) as f:
+                substitutions = json.load(f)
+
+        batch_size = options['batch_size']
+        created = 0
+        for i in range(0, len(names), batch_size):
+            try:
+                created += len(clone_zone(source, names[i:i + batch_size], substitutions))
+            except ValidationError as e:
+                raise CommandError('Created %d zones, then failed: %s' % (created, '; '.join(e.messages)))
+        self.stdout.write('Created %d zones from %s' % (created, source.domain_name))
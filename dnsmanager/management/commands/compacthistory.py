@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dnsmanager.history import compact
+from dnsmanager.models import Zone, ZoneRevision
+
+
+class Command(BaseCommand):
+    help = 'Drop old zone revisions, keeping every kept revision reconstructable'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Keep revisions created in the last DAYS days')
+        parser.add_argument('--keep', type=int, default=10, help='Always keep the latest KEEP revisions of a zone')
+        parser.add_argument('--purge-reversion', action='store_true',
+                            help='Also delete django-reversion versions of dnsmanager models')
+
+    def handle(self, *args, **options):
+        keep_after = timezone.now() - timedelta(days=options['days'])
+        old = ZoneRevision.objects.filter(created__lte=keep_after).values_list('zone', flat=True).distinct()
+        deleted = 0
+        for zone in Zone.objects.filter(pk__in=list(old)):
+            deleted += compact(zone, keep_after=keep_after, keep=options['keep'])
+        self.stdout.write('Deleted %d zone revisions' % deleted)
+
+        if options['purge_reversion']:
+            from reversion.models import Version
+            versions = Version.objects.filter(content_type__app_label='dnsmanager')
+            count = versions.count()
+            versions.delete()
+            self.stdout.write('Deleted %d reversion versions' % count)
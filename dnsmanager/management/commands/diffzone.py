@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dnsmanager.diff import diff, format_changes, stored_zone, zone_at_serial, zone_from_text, DiffError
+from dnsmanager.models import Zone
+
+
+class Command(BaseCommand):
+    help = 'Show RRset changes between two serials of a zone, or between the zone and a Bind zone file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('domain', help='Domain name of the zone')
+        parser.add_argument('--from', dest='from_serial', help='Serial to compare from, default the current serial')
+        parser.add_argument('--to', dest='to_serial', help='Serial to compare to, default the current serial')
+        parser.add_argument('--file', help='Compare the current zone to this Bind zone file')
+        parser.add_argument('--json', action='store_true', help='Output the changes as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            zone = Zone.objects.select_related('domain').get(domain__name=options['domain'])
+        except Zone.DoesNotExist:
+            raise CommandError('No zone for %s' % options['domain'])
+        try:
+            if options['file']:
+                with open(options['file']) as f:
+                    changes = diff(stored_zone(zone), zone_from_text(zone, f.read()))
+            else:
+                changes = diff(zone_at_serial(zone, options['from_serial']),
+                               zone_at_serial(zone, options['to_serial']))
+        except (DiffError, ValueError) as e:
+            raise CommandError(str(e))
+        if options['json']:
+            self.stdout.write(json.dumps(changes, indent=2))
+        else:
+            for line in format_changes(changes):
+                self.stdout.write(line)
@@ -0,0 +1,98 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from dnsmanager.benchmark import measure
+from dnsmanager.recipes import apply_recipe
+from dnsmanager.settings import DNS_MANAGER_RECIPES, DNS_MANAGER_CACHE_PREFIX
+from dnsmanager.synthetic import make_zones
+from dnsmanager.views import ZoneListView
+
+
+def int_list(value):
+    return [int(x) for x in value.split(',') if x.strip()]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark render, import, validation, recipes and zone listing against synthetic zones. ' \
+           'Everything runs in a transaction that is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', default='10,1000,100000',
+                            help='Comma separated record counts for single zone benchmarks')
+        parser.add_argument('--zones', default='10,10000',
+                            help='Comma separated zone counts for zone list benchmarks')
+        parser.add_argument('--cache-fill', default='0,10000,100000',
+                            help='Comma separated numbers of unrelated cache keys for zone save benchmarks')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark')
+        parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        results = []
+
+        with transaction.atomic():
+            for records in int_list(options['records']):
+                results.extend(self.bench_zone(records, repeat))
+            for zones in int_list(options['zones']):
+                results.extend(self.bench_list(zones, repeat))
+            for fill in int_list(options['cache_fill']):
+                results.extend(self.bench_save(fill, repeat))
+            transaction.set_rollback(True)
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+    def bench_zone(self, records, repeat):
+        zone = make_zones(1, records)[0]
+        text = zone.render()
+        results = [
+            measure('render', zone.render, repeat, records=records),
+            measure('get_zone', zone.get_zone, repeat, records=records),
+            measure('validate', zone.validate, repeat, records=records),
+            measure('update_from_text', lambda: zone.update_from_text(text), repeat, records=records),
+        ]
+        for path, description in DNS_MANAGER_RECIPES:
+            package, name = path.rsplit('.', 1)
+            recipe = getattr(__import__(package, fromlist=[name]), name)
+            results.append(measure('recipe', lambda: apply_recipe(zone, recipe), repeat, records=records, recipe=name))
+        zone.clear_cache()
+        return results
+
+    def bench_list(self, count, repeat):
+        zones = make_zones(count, 10)
+        request = RequestFactory().get('/')
+        view = ZoneListView.as_view()
+
+        def zone_list():
+            view(request).render()
+
+        def zone_list_cold():
+            for zone in zones:
+                zone.clear_cache()
+            zone_list()
+
+        results = [
+            measure('zone_list', zone_list, repeat, zones=count),
+            measure('zone_list_cold', zone_list_cold, repeat, zones=count),
+        ]
+        for zone in zones:
+            zone.clear_cache()
+        return results
+
+    def bench_save(self, fill, repeat):
+        zone = make_zones(1, 10)[0]
+        keys = ['%s:bench:fill:%d' % (DNS_MANAGER_CACHE_PREFIX, i) for i in range(fill)]
+        for i in range(0, fill, 1000):
+            cache.set_many(dict((key, i) for key in keys[i:i + 1000]), 60)
+        result = measure('save', zone.save, repeat, cache_keys=fill)
+        cache.delete_many(keys)
+        zone.clear_cache()
+        return [result]
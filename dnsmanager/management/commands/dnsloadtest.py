@@ -0,0 +1,116 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.core.management.base import BaseCommand
+from django.core.urlresolvers import reverse, NoReverseMatch
+from django.db import connection
+from django.test.utils import override_settings
+
+from dnsmanager.loadtest import LoadServer, run_load, summarize
+from dnsmanager.models import Zone
+from dnsmanager.synthetic import make_zones
+
+
+def int_list(value):
+    return [int(x) for x in value.split(',') if x.strip()]
+
+
+def session_cookie(user):
+    """ :return: Cookie header value of a new logged in session for user """
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = user.pk
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return '%s=%s' % (settings.SESSION_COOKIE_NAME, session.session_key)
+
+
+class Command(BaseCommand):
+    help = 'Load test the zone list, zone detail and zone admin changelist over HTTP with concurrent clients, ' \
+           'against a throwaway test database seeded with synthetic zones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zones', default='100,1000',
+                            help='Comma separated zone counts, the database is grown to each in turn')
+        parser.add_argument('--records', type=int, default=10, help='Records per synthetic zone')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per view and zone count')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the zones picked for detail requests')
+        parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        old_test_name = test_settings.get('NAME')
+        directory = None
+        if connection.vendor == 'sqlite' and old_test_name in (None, '', ':memory:'):
+            # Server threads open their own connections, which can't see another connection's memory database
+            directory = tempfile.mkdtemp()
+            test_settings['NAME'] = os.path.join(directory, 'dnsloadtest.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Requests come from the test clients on localhost
+            with override_settings(ALLOWED_HOSTS=['*']):
+                results = self.load(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = old_test_name
+            if directory:
+                shutil.rmtree(directory)
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+    def views(self):
+        """ :return: List of (name, function of zone id to path), leaving out views not in the URLconf """
+        views = [
+            ('zone_list', lambda pk: reverse('zone_list')),
+            ('zone_detail', lambda pk: reverse('zone_detail', kwargs={'pk': pk})),
+            ('admin_changelist', lambda pk: reverse('admin:dnsmanager_zone_changelist')),
+        ]
+        available = []
+        for name, path in views:
+            try:
+                path(1)
+            except NoReverseMatch:
+                self.stderr.write('Skipping %s, it is not in the URLconf' % name)
+            else:
+                available.append((name, path))
+        return available
+
+    def load(self, options):
+        user = get_user_model().objects.create_superuser('dnsloadtest', 'dnsloadtest@example.com', None)
+        headers = {'Cookie': session_cookie(user)}
+        rng = random.Random(options['seed'])
+        views = self.views()
+        server = LoadServer()
+        results = []
+        try:
+            seeded = Zone.objects.count()
+            for count in int_list(options['zones']):
+                if count > seeded:
+                    make_zones(count - seeded, options['records'], prefix='load')
+                    seeded = count
+                pks = list(Zone.objects.values_list('pk', flat=True))
+                for name, path in views:
+                    run_load(server.port, [path(pks[0])], 1, headers)  # warm up, untimed
+                    server.counter.reset()
+                    paths = [path(rng.choice(pks)) for i in range(options['requests'])]
+                    latencies, errors, elapsed = run_load(server.port, paths, options['concurrency'], headers)
+                    results.append(summarize(name, latencies, errors, elapsed, server.counter.reset(),
+                                             zones=seeded, records=options['records'],
+                                             concurrency=options['concurrency']))
+        finally:
+            server.shutdown()
+        return results
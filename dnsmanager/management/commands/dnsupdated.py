@@ -0,0 +1,71 @@
+import SocketServer
+import struct
+import threading
+
+from django.core.management.base import BaseCommand
+
+from dnsmanager.dynupdate import UpdateProcessor
+from dnsmanager.settings import DNS_MANAGER_DYNUPDATE_WINDOW
+
+
+class UDPHandler(SocketServer.BaseRequestHandler):
+
+    def handle(self):
+        data, sock = self.request
+        response = self.server.processor.submit(data)
+        if response is not None:
+            sock.sendto(response, self.client_address)
+
+
+class TCPHandler(SocketServer.BaseRequestHandler):
+
+    def read(self, size):
+        data = ''
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def handle(self):
+        while True:
+            length = self.read(2)
+            data = length and self.read(struct.unpack('!H', length)[0])
+            if not data:
+                return
+            response = self.server.processor.submit(data)
+            if response is not None:
+                self.request.sendall(struct.pack('!H', len(response)) + response)
+
+
+class UDPServer(SocketServer.ThreadingMixIn, SocketServer.UDPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class TCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Command(BaseCommand):
+    help = 'Listen for RFC 2136 dynamic updates over UDP and TCP and apply them to the zones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default='127.0.0.1', help='Address to listen on')
+        parser.add_argument('--port', type=int, default=53, help='Port to listen on')
+        parser.add_argument('--window', type=float, default=DNS_MANAGER_DYNUPDATE_WINDOW,
+                            help='Seconds of updates applied with one serial bump per zone')
+
+    def handle(self, *args, **options):
+        processor = UpdateProcessor(window=options['window'])
+        address = (options['address'], options['port'])
+        for server_class, handler in ((UDPServer, UDPHandler), (TCPServer, TCPHandler)):
+            server = server_class(address, handler)
+            server.processor = processor
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+        self.stdout.write('Listening for updates on %s port %d' % address)
+        processor.run()
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dnsmanager.snapshot import dump, open_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Write a compressed snapshot of all zones, records and shared record sets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Snapshot file to write, eg zones.jsonl.gz')
+
+    def handle(self, *args, **options):
+        start = time.time()
+        with open_snapshot(options['path'], 'wb') as f:
+            counts = dump(f)
+        elapsed = time.time() - start
+        records = sum(count for kind, count in counts.items() if kind not in ('zones', 'record sets'))
+        self.stdout.write('Wrote %d zones, %d records in %.2fs, %.0f records/s' % (
+            counts['zones'], records, elapsed, records / elapsed if elapsed else 0))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from dnsmanager.snapshot import load, open_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Restore zones from a dumpzones snapshot with bulk inserts, matching zones to domains by name'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Snapshot file written by dumpzones')
+        parser.add_argument('--replace', action='store_true',
+                            help='Delete existing zones of the domains in the snapshot before loading')
+
+    def handle(self, *args, **options):
+        verbose = int(options.get('verbosity', 1)) > 1
+        start = time.time()
+        try:
+            with open_snapshot(options['path']) as f:
+                counts, skipped = load(f, replace=options['replace'])
+        except (IntegrityError, ValueError) as e:
+            raise CommandError('Nothing loaded: %s' % e)
+        elapsed = time.time() - start
+        records = sum(count for kind, count in counts.items() if kind != 'zones')
+        self.stdout.write('Loaded %d zones, %d records in %.2fs, %.0f records/s, skipped %d zones' % (
+            counts.get('zones', 0), records, elapsed, records / elapsed if elapsed else 0, len(skipped)))
+        if verbose:
+            for name in skipped:
+                self.stdout.write('Skipped %s, no such domain' % name)
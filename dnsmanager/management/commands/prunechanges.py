@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dnsmanager.changes import prune
+
+
+class Command(BaseCommand):
+    help = 'Drop old entries of the zone changes feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Keep changes made in the last DAYS days')
+
+    def handle(self, *args, **options):
+        deleted = prune(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write('Deleted %d zone changes' % deleted)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dnsmanager.models import Zone, sync_resource_records
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the unified ResourceRecord table from the typed record tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Zones rewritten per transaction')
+
+    def handle(self, *args, **options):
+        pks = list(Zone.objects.order_by('pk').values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        for i in range(0, len(pks), batch_size):
+            with transaction.atomic():
+                sync_resource_records(Zone.objects.filter(pk__in=pks[i:i + batch_size]), force=True)
+        self.stdout.write('Synced records of %d zones' % len(pks))
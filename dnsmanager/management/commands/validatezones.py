@@ -0,0 +1,99 @@
+import multiprocessing
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from dnsmanager.models import Zone, update_catalog_members
+from dnsmanager.routers import replica_reads, fresh_zones
+from dnsmanager.settings import DNS_MANAGER_CACHE_TIMEOUT
+
+
+def close_connections():
+    # Forked workers must not share the parent's database connections
+    for connection in connections.all():
+        connection.close()
+
+
+def validate_zones(pks):
+    """
+    Validate the given zones, priming the validation cache.
+    :return: list of (pk, valid, error) tuples
+    """
+    results = []
+    with replica_reads():
+        for zone in fresh_zones(list(Zone.objects.filter(pk__in=pks).select_related('domain'))):
+            # Take the key first, so a save during validation leaves the result in a superseded generation
+            key = zone.cache_key('validation')
+            try:
+                zone.validate()
+            except ValidationError as e:
+                results.append((zone.pk, False, '; '.join(e.messages)))
+            else:
+                results.append((zone.pk, True, None))
+            cache.set(key, results[-1][1], DNS_MANAGER_CACHE_TIMEOUT)
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Validate zones across a process pool and store the results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--changed', action='store_true',
+                            help='Only validate zones saved since they were last validated')
+        parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count(),
+                            help='Number of worker processes, 1 validates in this process')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Zones per worker task')
+
+    def handle(self, *args, **options):
+        verbose = int(options.get('verbosity', 1)) > 1
+        started = timezone.now()
+
+        queryset = Zone.objects.all()
+        if options['changed']:
+            queryset = queryset.filter(Q(valid__isnull=True) | Q(validated__isnull=True) |
+                                       Q(updated__gt=F('validated')))
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        chunks = [pks[i:i + chunk_size] for i in range(0, len(pks), chunk_size)]
+
+        start = time.time()
+        if options['processes'] > 1 and len(chunks) > 1:
+            close_connections()
+            pool = multiprocessing.Pool(options['processes'], initializer=close_connections)
+            try:
+                results = pool.imap_unordered(validate_zones, chunks)
+                counts = self.store(results, started, verbose)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            counts = self.store((validate_zones(chunk) for chunk in chunks), started, verbose)
+        elapsed = time.time() - start
+
+        self.stdout.write('Validated %d zones (%d invalid) in %.2fs, %.1f zones/s' % (
+            counts[True] + counts[False], counts[False], elapsed,
+            (counts[True] + counts[False]) / elapsed if elapsed else 0))
+
+    def store(self, results, started, verbose):
+        """ Write each chunk of results with one UPDATE per outcome """
+        counts = {True: 0, False: 0}
+        for chunk in results:
+            now = timezone.now()
+            for valid in (True, False):
+                pks = [pk for pk, ok, error in chunk if ok is valid]
+                if pks:
+                    # Zones saved after the run started keep their pending state
+                    zones = Zone.objects.filter(pk__in=pks, updated__lte=started)
+                    zones.update(valid=valid, validated=now)
+                    update_catalog_members(zones.values_list('pk', 'domain__name', 'valid'))
+                    counts[valid] += len(pks)
+            if verbose:
+                for pk, ok, error in chunk:
+                    if not ok:
+                        self.stdout.write('Zone %s is invalid: %s' % (pk, error))
+        return counts
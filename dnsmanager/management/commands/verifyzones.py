@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from dnsmanager.models import Zone
+from dnsmanager.verifier import verify_zones
+
+
+class Command(BaseCommand):
+    help = 'Check record hostnames resolve and store warnings on the zones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--changed', action='store_true',
+                            help='Only verify zones saved since they were last verified')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running, verifying changed zones every INTERVAL seconds')
+        parser.add_argument('--batch-size', type=int, default=500, help='Zones verified together')
+
+    def handle(self, *args, **options):
+        if options['interval']:
+            while True:
+                self.verify(changed=True, batch_size=options['batch_size'])
+                time.sleep(options['interval'])
+        else:
+            self.verify(changed=options['changed'], batch_size=options['batch_size'])
+
+    def verify(self, changed, batch_size):
+        queryset = Zone.objects.order_by('pk')
+        if changed:
+            queryset = queryset.filter(Q(verified__isnull=True) | Q(updated__gt=F('verified')))
+        pks = list(queryset.values_list('pk', flat=True))
+        warnings = 0
+        for i in range(0, len(pks), batch_size):
+            warnings += len(verify_zones(Zone.objects.filter(pk__in=pks[i:i + batch_size])))
+        if pks or not changed:
+            self.stdout.write('Verified %d zones, %d warnings' % (len(pks), warnings))
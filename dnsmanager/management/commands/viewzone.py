@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.template.loader import render_to_string
 
 from dnsmanager.models import Zone
+from dnsmanager.routers import replica_reads, fresh_zones
 
 
 class Command(BaseCommand):
@@ -9,12 +10,15 @@ class Command(BaseCommand):
     help = 'View a the specified Bind zone or bind zone list'
 
     def handle(self, *args, **options):
+        with replica_reads():
+            self.view(*args)
 
+    def view(self, *args):
         if len(args) == 0:
-            zone_list = Zone.objects.all()
+            zone_list = fresh_zones(list(Zone.objects.all()))
             rendered = render_to_string('dnsmanager/zone_list.txt', {'object_list': zone_list})
             self.stdout.write('%s' % rendered)
         else:
             for zone_id in args:
-                zone = Zone.objects.get(pk=zone_id)
+                zone = fresh_zones([Zone.objects.get(pk=zone_id)])[0]
                 self.stdout.write('%s' % zone.render())
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Operational metrics in Prometheus text exposition format.
+
+Latency histograms and cache hit counters are accumulated in the Django cache by the collect() instrumentation
+sink, so add 'dnsmanager.metrics.collect' to DNS_MANAGER_INSTRUMENTATION_SINKS to populate them. Zone and record
+counts are aggregated with a handful of COUNT queries, cached for DNS_MANAGER_METRICS_TIMEOUT seconds. Zone cache
+statistics are those of the process serving the request.
+"""
+from django.core.cache import cache
+
+from .models import Zone, RECORD_MODELS
+from .settings import DNS_MANAGER_CACHE_PREFIX, DNS_MANAGER_METRICS_TIMEOUT
+from .zonecache import zone_cache
+
+# Operations with latency histograms, render is export and update_from_text is import
+LATENCY_OPERATIONS = ('render', 'update_from_text', 'get_zone', 'validate')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CACHE_OPERATIONS = {
+    'is_valid': 'validation',
+    'is_delegated': 'delegation',
+}
+
+
+def metric_key(*parts):
+    return '%s:metrics:%s' % (DNS_MANAGER_CACHE_PREFIX, ':'.join(str(p) for p in parts))
+
+
+def incr(key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def collect(measurement):
+    """ Instrumentation sink accumulating latency histograms and cache hit counters """
+    if measurement.operation in LATENCY_OPERATIONS:
+        bucket = '+Inf'
+        for le in LATENCY_BUCKETS:
+            if measurement.wall_time <= le:
+                bucket = le
+                break
+        incr(metric_key(measurement.operation, 'bucket', bucket))
+        incr(metric_key(measurement.operation, 'count'))
+        incr(metric_key(measurement.operation, 'sum_us'), int(measurement.wall_time * 1000000))
+    if measurement.operation in CACHE_OPERATIONS:
+        result = 'hit' if measurement.cache_hits else 'miss'
+        incr(metric_key('cache', CACHE_OPERATIONS[measurement.operation], result))
+
+
+def aggregates():
+    """
+    :return: dict of zone and record counts, cached for DNS_MANAGER_METRICS_TIMEOUT
+    """
+    key = metric_key('aggregates')
+    data = cache.get(key)
+    if data is None:
+        data = {
+            'zones': Zone.objects.count(),
+            'invalid': Zone.objects.filter(valid=False).count(),
+            'undelegated': Zone.objects.filter(delegated=False).count(),
+            'pending': Zone.objects.filter(valid__isnull=True).count(),
+            'records': [(rtype, model.objects.count()) for rtype, model in RECORD_MODELS],
+        }
+        cache.set(key, data, DNS_MANAGER_METRICS_TIMEOUT)
+    return data
+
+
+def exposition():
+    """ :return: All metrics in Prometheus text exposition format """
+    data = aggregates()
+    lines = [
+        '# HELP dnsmanager_zones Number of zones.',
+        '# TYPE dnsmanager_zones gauge',
+        'dnsmanager_zones %d' % data['zones'],
+        '# HELP dnsmanager_zones_invalid Number of zones that failed validation.',
+        '# TYPE dnsmanager_zones_invalid gauge',
+        'dnsmanager_zones_invalid %d' % data['invalid'],
+        '# HELP dnsmanager_zones_undelegated Number of zones that failed the delegation check.',
+        '# TYPE dnsmanager_zones_undelegated gauge',
+        'dnsmanager_zones_undelegated %d' % data['undelegated'],
+        '# HELP dnsmanager_zones_pending Zones saved but not yet validated for publishing.',
+        '# TYPE dnsmanager_zones_pending gauge',
+        'dnsmanager_zones_pending %d' % data['pending'],
+        '# HELP dnsmanager_records Number of records by type.',
+        '# TYPE dnsmanager_records gauge',
+    ]
+    for rtype, count in data['records']:
+        lines.append('dnsmanager_records{type="%s"} %d' % (rtype, count))
+
+    keys = []
+    for operation in LATENCY_OPERATIONS:
+        keys.extend(metric_key(operation, 'bucket', le) for le in LATENCY_BUCKETS + ('+Inf', ))
+        keys.extend([metric_key(operation, 'count'), metric_key(operation, 'sum_us')])
+    for name in CACHE_OPERATIONS.values():
+        keys.extend([metric_key('cache', name, 'hit'), metric_key('cache', name, 'miss')])
+    counters = cache.get_many(keys)
+
+    lines.extend([
+        '# HELP dnsmanager_operation_seconds Latency of instrumented zone operations.',
+        '# TYPE dnsmanager_operation_seconds histogram',
+    ])
+    for operation in LATENCY_OPERATIONS:
+        cumulative = 0
+        for le in LATENCY_BUCKETS + ('+Inf', ):
+            cumulative += counters.get(metric_key(operation, 'bucket', le), 0)
+            lines.append('dnsmanager_operation_seconds_bucket{operation="%s",le="%s"} %d' % (operation, le, cumulative))
+        lines.append('dnsmanager_operation_seconds_sum{operation="%s"} %f' % (
+            operation, counters.get(metric_key(operation, 'sum_us'), 0) / 1000000.0))
+        lines.append('dnsmanager_operation_seconds_count{operation="%s"} %d' % (
+            operation, counters.get(metric_key(operation, 'count'), 0)))
+
+    lines.extend([
+        '# HELP dnsmanager_cache_lookups_total Validation and delegation cache lookups by result.',
+        '# TYPE dnsmanager_cache_lookups_total counter',
+    ])
+    for name in sorted(CACHE_OPERATIONS.values()):
+        for result in ('hit', 'miss'):
+            lines.append('dnsmanager_cache_lookups_total{cache="%s",result="%s"} %d' % (
+                name, result, counters.get(metric_key('cache', name, result), 0)))
+
+    lines.extend([
+        '# HELP dnsmanager_cache_hit_ratio Fraction of validation and delegation cache lookups that were hits.',
+        '# TYPE dnsmanager_cache_hit_ratio gauge',
+    ])
+    for name in sorted(CACHE_OPERATIONS.values()):
+        hits = counters.get(metric_key('cache', name, 'hit'), 0)
+        total = hits + counters.get(metric_key('cache', name, 'miss'), 0)
+        lines.append('dnsmanager_cache_hit_ratio{cache="%s"} %f' % (name, float(hits) / total if total else 0.0))
+
+    stats = zone_cache.stats()
+    lines.extend([
+        '# HELP dnsmanager_zone_cache_lookups_total Lookups in the zone cache of this process by result.',
+        '# TYPE dnsmanager_zone_cache_lookups_total counter',
+        'dnsmanager_zone_cache_lookups_total{result="hit"} %d' % stats['hits'],
+        'dnsmanager_zone_cache_lookups_total{result="miss"} %d' % stats['misses'],
+        '# HELP dnsmanager_zone_cache_evictions_total '
+        'Zones evicted from the zone cache of this process to stay in size.',
+        '# TYPE dnsmanager_zone_cache_evictions_total counter',
+        'dnsmanager_zone_cache_evictions_total %d' % stats['evictions'],
+        '# HELP dnsmanager_zone_cache_records Records held in the zone cache of this process.',
+        '# TYPE dnsmanager_zone_cache_records gauge',
+        'dnsmanager_zone_cache_records %d' % stats['records'],
+    ])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0004_mx_origin_support'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='addressrecord',
+            name='ip',
+            field=models.GenericIPAddressField(help_text=b'IP Address', db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='addressrecord',
+            name='zone',
+            field=models.ForeignKey(related_name='addressrecords', to='dnsmanager.Zone'),
+        ),
+        migrations.AlterField(
+            model_name='canonicalnamerecord',
+            name='zone',
+            field=models.ForeignKey(related_name='canonicalnamerecords', to='dnsmanager.Zone'),
+        ),
+        migrations.AlterField(
+            model_name='mailexchangerecord',
+            name='zone',
+            field=models.ForeignKey(related_name='mailexchangerecords', to='dnsmanager.Zone'),
+        ),
+        migrations.AlterField(
+            model_name='nameserverrecord',
+            name='zone',
+            field=models.ForeignKey(related_name='nameserverrecords', to='dnsmanager.Zone'),
+        ),
+        migrations.AlterField(
+            model_name='servicerecord',
+            name='zone',
+            field=models.ForeignKey(related_name='servicerecords', to='dnsmanager.Zone'),
+        ),
+        migrations.AlterField(
+            model_name='textrecord',
+            name='zone',
+            field=models.ForeignKey(related_name='textrecords', to='dnsmanager.Zone'),
+        ),
+        migrations.AlterIndexTogether(
+            name='mailexchangerecord',
+            index_together=set([('zone', 'priority', 'data')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='servicerecord',
+            index_together=set([('zone', 'data', 'priority', 'target')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='textrecord',
+            index_together=set([('zone', 'data', 'text')]),
+        ),
+    ]
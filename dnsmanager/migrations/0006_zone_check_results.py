@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0005_record_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='zone',
+            name='delegated',
+            field=models.NullBooleanField(db_index=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='valid',
+            field=models.NullBooleanField(db_index=True, editable=False),
+        ),
+    ]
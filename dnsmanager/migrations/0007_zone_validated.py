@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0006_zone_check_results'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='zone',
+            name='validated',
+            field=models.DateTimeField(null=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0007_zone_validated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoneWarning',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('record', models.CharField(help_text=b'Record', max_length=255)),
+                ('message', models.CharField(help_text=b'Warning', max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name=b'Date Created')),
+            ],
+            options={
+                'ordering': ['record'],
+                'db_table': 'dns_zonewarning',
+            },
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='verified',
+            field=models.DateTimeField(null=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='zonewarning',
+            name='zone',
+            field=models.ForeignKey(related_name='warnings', to='dnsmanager.Zone'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Model and (owner, rdata text) of each record type, a copy of dnsmanager.builder.RECORD_ROWS at this migration
+TYPED_MODELS = (
+    ('A', 'AddressRecord', lambda r: (r.data, r.ip)),
+    ('CNAME', 'CanonicalNameRecord', lambda r: (r.data, r.target)),
+    ('MX', 'MailExchangeRecord', lambda r: (r.origin, '%s %s' % (r.priority, r.data))),
+    ('NS', 'NameServerRecord', lambda r: (r.origin, r.data)),
+    ('TXT', 'TextRecord', lambda r: (r.data, r.text)),
+    ('SRV', 'ServiceRecord', lambda r: (r.data, '%s %s %s %s' % (r.priority, r.weight, r.port, r.target))),
+)
+
+
+def copy_records(apps, schema_editor):
+    # The copies are only kept up to date with DNS_MANAGER_UNIFIED_RECORDS, manage.py syncrecords fills the table
+    # when it is enabled later
+    if not getattr(settings, 'DNS_MANAGER_UNIFIED_RECORDS', False):
+        return
+    ResourceRecord = apps.get_model('dnsmanager', 'ResourceRecord')
+    for rtype, name, row in TYPED_MODELS:
+        rows = []
+        for record in apps.get_model('dnsmanager', name).objects.order_by().iterator():
+            owner, rdata = row(record)
+            rows.append(ResourceRecord(zone_id=record.zone_id, rtype=rtype, source_id=record.pk, owner=owner,
+                                       ttl=record.ttl, rdata=rdata))
+        ResourceRecord.objects.bulk_create(rows, batch_size=500)
+
+
+def remove_records(apps, schema_editor):
+    apps.get_model('dnsmanager', 'ResourceRecord').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0008_zone_warnings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceRecord',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('rtype', models.CharField(help_text=b'Record Type', max_length=10)),
+                ('source_id', models.PositiveIntegerField(help_text=b'Typed Record ID')),
+                ('owner', models.CharField(help_text=b'Owner', max_length=255)),
+                ('ttl', models.PositiveIntegerField(null=True, blank=True)),
+                ('rdata', models.CharField(help_text=b'Record Data', max_length=512)),
+                ('zone', models.ForeignKey(related_name='resourcerecords', to='dnsmanager.Zone')),
+            ],
+            options={
+                'db_table': 'dns_resourcerecord',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='resourcerecord',
+            unique_together=set([('rtype', 'source_id')]),
+        ),
+        migrations.RunPython(copy_records, remove_records),
+    ]
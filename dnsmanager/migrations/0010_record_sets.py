@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0009_resource_records'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordSet',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name=b'Date Created')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name=b'Date Updated')),
+                ('version', models.IntegerField(default=0, editable=False)),
+                ('name', models.CharField(help_text=b'Name', unique=True, max_length=64)),
+            ],
+            options={
+                'ordering': ['name'],
+                'db_table': 'dns_recordset',
+            },
+        ),
+        migrations.CreateModel(
+            name='SharedRecord',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('owner', models.CharField(default=b'@', help_text=b'Owner, relative to each zone', max_length=255)),
+                ('ttl', models.PositiveIntegerField(null=True, blank=True)),
+                ('rtype', models.CharField(help_text=b'Record Type', max_length=10, choices=[(b'A', b'A'), (b'CNAME', b'CNAME'), (b'MX', b'MX'), (b'NS', b'NS'), (b'TXT', b'TXT'), (b'SRV', b'SRV')])),
+                ('rdata', models.CharField(help_text=b'Record Data, eg: 10 mx.example.com.', max_length=512)),
+                ('record_set', models.ForeignKey(related_name='records', to='dnsmanager.RecordSet')),
+            ],
+            options={
+                'ordering': ['record_set', 'rtype', 'owner', 'rdata'],
+                'db_table': 'dns_sharedrecord',
+            },
+        ),
+        migrations.AddField(
+            model_name='zone',
+            name='record_sets',
+            field=models.ManyToManyField(help_text=b'Shared records included in the zone', related_name='zones', to='dnsmanager.RecordSet', blank=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='sharedrecord',
+            unique_together=set([('record_set', 'owner', 'rtype', 'rdata')]),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0010_record_sets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoneRevision',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('serial', models.PositiveIntegerField()),
+                ('checkpoint', models.BooleanField(default=False)),
+                ('data', models.TextField()),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name=b'Date Created')),
+                ('zone', models.ForeignKey(related_name='revisions', to='dnsmanager.Zone')),
+            ],
+            options={
+                'ordering': ['zone', 'id'],
+                'db_table': 'dns_zonerevision',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='zonerevision',
+            index_together=set([('zone', 'serial')]),
+        ),
+    ]
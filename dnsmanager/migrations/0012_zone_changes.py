@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0011_zone_revisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoneChange',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('zone_id', models.IntegerField(db_index=True)),
+                ('domain', models.CharField(max_length=253)),
+                ('serial', models.PositiveIntegerField()),
+                ('action', models.CharField(max_length=8, choices=[(b'created', b'Created'), (b'updated', b'Updated'), (b'deleted', b'Deleted')])),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name=b'Date Created')),
+            ],
+            options={
+                'ordering': ['id'],
+                'db_table': 'dns_zonechange',
+            },
+        ),
+    ]
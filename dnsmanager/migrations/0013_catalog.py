@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0012_zone_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Catalog',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('name', models.CharField(unique=True, max_length=253)),
+                ('serial', models.PositiveIntegerField(default=0)),
+                ('digest', models.CharField(max_length=40, blank=True)),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name=b'Date Updated')),
+            ],
+            options={
+                'ordering': ['name'],
+                'db_table': 'dns_catalog',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0013_catalog'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='zone',
+            index_together=set([('updated',)]),
+        ),
+    ]
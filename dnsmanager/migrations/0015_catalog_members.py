@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def add_members(apps, schema_editor):
+    """ List the zones not known to be invalid, and bump existing catalogs as members now include unvalidated zones """
+    Zone = apps.get_model('dnsmanager', 'Zone')
+    CatalogMember = apps.get_model('dnsmanager', 'CatalogMember')
+    Catalog = apps.get_model('dnsmanager', 'Catalog')
+    CatalogMember.objects.bulk_create([CatalogMember(zone_id=pk, domain=domain.lower())
+                                       for pk, domain in Zone.objects.exclude(valid=False)
+                                       .values_list('pk', 'domain__name')], batch_size=500)
+    serial_now = int(time.strftime('%Y%m%d00'))
+    Catalog.objects.filter(serial__gte=serial_now).update(serial=F('serial') + 1)
+    Catalog.objects.filter(serial__lt=serial_now).update(serial=serial_now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0014_zone_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogMember',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('domain', models.CharField(max_length=253)),
+                ('zone', models.OneToOneField(related_name='catalog_member', to='dnsmanager.Zone')),
+            ],
+            options={
+                'ordering': ['domain'],
+                'db_table': 'dns_catalogmember',
+            },
+        ),
+        migrations.RemoveField(
+            model_name='catalog',
+            name='digest',
+        ),
+        migrations.RunPython(add_members, migrations.RunPython.noop),
+    ]
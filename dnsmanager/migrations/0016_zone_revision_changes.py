@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dnsmanager', '0015_catalog_members'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoneRevisionChange',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('zone_id', models.IntegerField(db_index=True)),
+                ('added', models.BooleanField(default=True)),
+                ('rtype', models.CharField(max_length=10)),
+                ('owner', models.CharField(max_length=255)),
+                ('ttl', models.PositiveIntegerField(null=True, blank=True)),
+                ('rdata', models.CharField(max_length=512)),
+            ],
+            options={
+                'ordering': ['id'],
+                'db_table': 'dns_zonerevisionchange',
+            },
+        ),
+    ]
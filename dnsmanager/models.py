@@ -1,8 +1,12 @@
 import time
 import socket
 import re
+from itertools import chain
 
 import dns.message
+import dns.rdata
+import dns.rdataclass
+import dns.rdatatype
 import dns.query
 import dns.resolver
 import dns.zone
@@ -12,10 +16,21 @@ from django.core.exceptions import ValidationError
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction, DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.template.loader import render_to_string
+from django.utils import timezone
 
-from .settings import ZONE_DEFAULTS, DNS_MANAGER_NAMESERVERS
+from .builder import build_zone, record_row
+from .dispatch import collect_saved_zone
+from .instrumentation import instrumented, record_cache
+from .routers import mark_written, ANY_SERIAL
+from .signals import record_set_saved_signal, zone_fully_saved_signal
+from .settings import ZONE_DEFAULTS, DNS_MANAGER_NAMESERVERS, DNS_MANAGER_CACHE_PREFIX, DNS_MANAGER_CACHE_TIMEOUT, \
+    DNS_MANAGER_DEFER_NETWORK_CHECKS, DNS_MANAGER_UNIFIED_RECORDS, DNS_MANAGER_HISTORY, \
+    DNS_MANAGER_CHANGES, DNS_MANAGER_CATALOG_ZONE
+from .zonecache import zone_cache
 
 
 class IntegerRangeField(models.IntegerField):
@@ -47,6 +62,7 @@ class DateMixin(models.Model):
         super(DateMixin, self).save(*args, **kwargs)
 
 
+@instrumented('dns_lookup', detail=lambda fqdn: fqdn)
 def validate_hostname_exists(fqdn):
     """
     :param hostname: Is hostname valid
@@ -60,37 +76,98 @@ def validate_hostname_exists(fqdn):
         raise ValidationError('Hostname does not exist.')
 
 
+# More complete validation here http://en.wikipedia.org/wiki/Hostname#Restrictions_on_valid_host_names
+HOSTNAME_LABEL_RE = re.compile(r"(?!-)([A-Z\d-]|\_){1,63}(?<!-)$|\*", re.IGNORECASE)
+
+# valid _sip._tls
+# invalid _sip._tls.
+# invalid sip.tls.
+SERVICE_RECORD_DATA_RE = re.compile(r'_[a-z\d-]{1,63}\._[a-z\d-]{1,63}?$', re.IGNORECASE)
+
+# Memoized label checks, zones share most of their labels (www, mail, the domain itself)
+_label_cache = {}
+LABEL_CACHE_SIZE = 10000
+
+
+def _valid_label(label):
+    try:
+        return _label_cache[label]
+    except KeyError:
+        if len(_label_cache) >= LABEL_CACHE_SIZE:
+            _label_cache.clear()
+        valid = _label_cache[label] = HOSTNAME_LABEL_RE.match(label) is not None
+        return valid
+
+
+def hostname_error(hostname):
+    """
+    :return: Error message for an invalid hostname, otherwise None
+    """
+    if hostname == "@":
+        return None
+    if len(hostname) > 255:
+        return 'Hostname is too long.'
+    if hostname[-1:] == ".":
+        hostname = hostname[:-1]  # strip exactly one dot from the right, if present
+    for label in hostname.split("."):
+        if not _valid_label(label):
+            return 'Hostname is not valid.'
+    return None
+
+
 def validate_hostname_string(hostname):
     """
     :param hostname: Is hostname valid
     :return: True, False, or ValidationError
     """
-    # More complete validation here http://en.wikipedia.org/wiki/Hostname#Restrictions_on_valid_host_names
-    if hostname == "@":
-        return True
     if len(hostname) > 255:
         return False
-    if hostname[-1] == ".":
-        hostname = hostname[:-1]  # strip exactly one dot from the right, if present
-    allowed = re.compile("(?!-)([A-Z\d-]|\_){1,63}(?<!-)$|\*", re.IGNORECASE)
-    if not all(allowed.match(x) for x in hostname.split(".")):
-        raise ValidationError('Hostname is not valid.')
+    error = hostname_error(hostname)
+    if error:
+        raise ValidationError(error)
     return True
 
 
+def validate_hostname_strings(hostnames):
+    """
+    :param hostnames: Iterable of hostnames
+    :return: List with an error message or None for each hostname
+    """
+    return [hostname_error(hostname) for hostname in hostnames]
+
+
+def service_record_data_error(data):
+    if SERVICE_RECORD_DATA_RE.match(data) is None:
+        return 'Service record is not valid.'
+    return None
+
+
 def validate_service_record_data(data):
-    # valid _sip._tls
-    # invalid _sip._tls.
-    # invalid sip.tls.
-    # (\.[\w\d\.-]+\.)
-    regex = re.compile(r'_[a-z\d-]{1,63}\._[a-z\d-]{1,63}?$', re.IGNORECASE)
-    m = regex.match(data)
-    if m is not None:
-        return True
-    else:
-        raise ValidationError('Service record is not valid.')
+    error = service_record_data_error(data)
+    if error:
+        raise ValidationError(error)
+    return True
+
+
+def text_record_error(text):
+    # Single pass over the text rather than startswith / endswith / count
+    if text[:1] != '"' or text[-1:] != '"':
+        return 'Record must begin and end with double quotes.'
+    if len(text) < 2 or '"' in text[1:-1]:
+        return 'Record must not contain more than 2 quotes.'
+    return None
+
 
+def validate_records(records):
+    """
+    Syntax check many records at once, without network lookups.
+    :param records: Iterable of zone record instances, of any type
+    :return: List of error message lists, one per record
+    """
+    return [record.syntax_errors() for record in records]
 
+
+@instrumented('dns_lookup', detail=lambda domainname: domainname)
 def validate_hostname_digs(domainname):
     # Check if any records exist for the given domainname
     os_resolvers = dns.resolver.Resolver()
@@ -115,10 +192,19 @@ class Zone(DateMixin):
     expire = models.PositiveIntegerField(default=ZONE_DEFAULTS['expire'])
     minimum = models.PositiveIntegerField(default=ZONE_DEFAULTS['minimum'], help_text="nxdomain ttl, bind9+")
     ttl = models.PositiveIntegerField(default=ZONE_DEFAULTS['ttl'], help_text='Default record TTL')
+    record_sets = models.ManyToManyField('RecordSet', blank=True, related_name='zones',
+                                         help_text='Shared records included in the zone')
+
+    # Last known validation / delegation results, None until checked
+    valid = models.NullBooleanField(editable=False, db_index=True)
+    delegated = models.NullBooleanField(editable=False, db_index=True)
+    validated = models.DateTimeField(null=True, editable=False)
+    verified = models.DateTimeField(null=True, editable=False)
 
     class Meta:
         db_table = 'dns_zone'
         ordering = ['domain']
+        index_together = [('updated', )]
         permissions = (
             ("view_zones", "Can view zones"),
         )
@@ -126,14 +212,38 @@ class Zone(DateMixin):
     def __unicode__(self):
         return "%s [%s]" % (self.domain, self.serial)
 
+    @property
+    def cache_generation_key(self):
+        return '%s:%s:generation' % (DNS_MANAGER_CACHE_PREFIX, self.domain_id)
+
+    @property
+    def cache_generation(self):
+        """
+        :return: Current cache generation of the zone, embedded in every zone cache key
+        """
+        key = self.cache_generation_key
+        generation = cache.get(key)
+        if generation is None:
+            # Seed from the clock so an evicted generation is never handed out again
+            generation = int(time.time() * 1000000)
+            if not cache.add(key, generation, None):
+                generation = cache.get(key, generation)
+        return generation
+
+    def cache_key(self, name):
+        return '%s:%s:%s:%s' % (DNS_MANAGER_CACHE_PREFIX, self.domain_id, self.cache_generation, name)
+
     def clear_cache(self):
+        """ Invalidate all cached zone data by moving the zone to a new cache generation """
         try:
-            return cache.delete_pattern("%s_*" % self.domain_name)
-        except AttributeError:
+            return cache.incr(self.cache_generation_key)
+        except ValueError:
+            # No generation yet, so nothing has been cached for this zone
             return False
 
     def delete(self, *args, **kwargs):
         self.clear_cache()
+        zone_cache.evict(self.pk)
         super(Zone, self).delete(*args, **kwargs)
 
     def save(self, *args, **kwargs):
@@ -143,8 +253,11 @@ class Zone(DateMixin):
             self.serial = serial_now
         else:
             self.serial += 1
+        self.valid = None  # must be revalidated
         self.clear_cache()
         super(Zone, self).save(*args, **kwargs)
+        mark_written({self.pk: self.serial})
+        record_zone_revisions([self])
 
     @property
     def description(self):
@@ -162,12 +275,60 @@ class Zone(DateMixin):
     def domain_name(self):
         return str(self.domain)
 
+    def shared_records(self):
+        """
+        :return: List of SharedRecord in the record sets of the zone, with ttlx set as for zone records
+        """
+        if self.pk is None:
+            return []
+        if 'record_sets' in getattr(self, '_prefetched_objects_cache', {}):
+            # Loaded with prefetch_related('record_sets__records'), eg by dnsmanager.export
+            records = [r for record_set in self.record_sets.all() for r in record_set.records.all()]
+        else:
+            records = list(SharedRecord.objects.filter(record_set__zones=self))
+        for r in records:
+            r.ttlx = r.ttl if r.ttl is not None else self.ttl
+        return records
+
+    @property
+    def soa_mname(self):
+        """ :return: Name server named by the SOA record, the first NS record as in build_zone """
+        for r in self.nameserverrecords.all():
+            return r.data
+        return next((r.rdata for r in self.shared_records() if r.rtype == 'NS'), '')
+
     def get_absolute_url(self):
         return reverse('zone_detail', kwargs={'pk': self.pk, })
 
+    @instrumented('get_zone')
     def get_zone(self):
+        """
+        :return: dns.zone.Zone built directly from the records, shared through the zone cache so read only
+        """
+        return zone_cache.get_or_build(self, build_zone_records)
+
+    def shared_rows(self):
+        """ :return: (owner, ttl, rdtype, rdata text) tuples of the shared records of the zone """
+        return [(r.owner, r.ttlx, r.rtype, r.rdata) for r in self.shared_records()]
+
+    def resource_rows(self):
+        """
+        :return: (owner, ttl, rdtype, rdata text) tuples of the zone loaded from ResourceRecord with one query,
+                 name servers first in the same order as nameserverrecords
+        """
+        rows = self.resourcerecords.values_list('owner', 'ttl', 'rtype', 'rdata')
+        rows = [(owner, ttl if ttl is not None else self.ttl, rtype, rdata) for owner, ttl, rtype, rdata in rows]
+        # The SOA names the first name server
+        return sorted((row for row in rows if row[2] == 'NS'), key=lambda row: row[3]) + \
+            [row for row in rows if row[2] != 'NS'] + self.shared_rows()
+
+    def get_zone_from_text(self):
+        """
+        :return: dns.zone.Zone parsed from the rendered zone, equal to get_zone()
+        """
         return dns.zone.from_text(str(self.render()), origin=str(self.domain), check_origin=True, relativize=True)
 
+    @instrumented('validate')
     def validate(self):
         try:
             # Can't run this on clean due to relation not being saved.. need a custom method.
@@ -188,9 +349,24 @@ class Zone(DateMixin):
         except Exception as e:
             raise ValidationError('Failed to parse zone file with: %s' % str(e))
 
+    def store_result(self, **results):
+        """ Persist validation / delegation results without touching the serial """
+        for field, value in results.items():
+            setattr(self, field, value)
+        if self.pk is not None:
+            Zone.objects.filter(pk=self.pk).update(**results)
+            if 'valid' in results:
+                update_catalog_members([(self.pk, self.domain_name, self.valid)])
+
+    @instrumented('is_valid')
     def is_valid(self):
-        key = '%s_validation' % (self.domain_name)
+        key = self.cache_key('validation')
         data = cache.get(key, None)
+        if data is None and self.valid is not None:
+            # Result persisted by validatezones since the last save
+            data = self.valid
+            cache.set(key, data, DNS_MANAGER_CACHE_TIMEOUT)
+        record_cache(data is not None)
         if data is None:
             try:
                 self.validate()
@@ -198,10 +374,12 @@ class Zone(DateMixin):
                 data = False
             else:
                 data = True
-        cache.set(key, data, None)
+            cache.set(key, data, DNS_MANAGER_CACHE_TIMEOUT)
+            self.store_result(valid=data, validated=timezone.now())
         return data
     is_valid.boolean = True  # Attribute for django admin (makes for pretty icons)
 
+    @instrumented('check_delegation')
     def check_delegation(self):
         try:
             answers = dns.resolver.query(self.domain_name, 'NS')
@@ -213,9 +391,11 @@ class Zone(DateMixin):
         except Exception as e:
             raise ValidationError('Exception during delegation check: %s' % str(e))
 
+    @instrumented('is_delegated')
     def is_delegated(self):
-        key = '%s_delegation' % (self.domain_name)
+        key = self.cache_key('delegation')
         data = cache.get(key, None)
+        record_cache(data is not None)
         if data is None:
             try:
                 self.check_delegation()
@@ -223,16 +403,19 @@ class Zone(DateMixin):
                 data = False
             else:
                 data = True
-        cache.set(key, data, None)
+            cache.set(key, data, DNS_MANAGER_CACHE_TIMEOUT)
+            self.store_result(delegated=data)
         return data
     is_delegated.boolean = True  # Attribute for django admin (makes for pretty icons)
 
+    @instrumented('render')
     def render(self):
         """
         :return: Render the zone to a Bind zone string
         """
         return render_to_string('dnsmanager/zone_detail.txt', {'object': self})
 
+    @instrumented('update_from_text')
     def update_from_text(self, text, partial=False):
         text = str(text.replace('\r\n', '\n'))  # DOS 2 Unix
         try:
@@ -240,6 +423,16 @@ class Zone(DateMixin):
         except (AttributeError, dns.exception.SyntaxError) as e:
             return False, 'Zone Update Failed: %s' % str(e)
 
+        # Check all owner names and target hostnames in one batch
+        hostnames = set(str(name) for name in bind_zone.nodes)
+        for rdtype, attr in (('NS', 'target'), ('MX', 'exchange'), ('CNAME', 'target'), ('SRV', 'target')):
+            for (name, ttl, rdata) in bind_zone.iterate_rdatas(rdtype):
+                hostnames.add(str(getattr(rdata, attr)))
+        hostnames = sorted(hostnames)
+        errors = ['%s: %s' % (h, e) for h, e in zip(hostnames, validate_hostname_strings(hostnames)) if e]
+        if errors:
+            return False, 'Zone Update Failed: %s' % ', '.join(errors)
+
         for (name, ttl, rdata) in bind_zone.iterate_rdatas('SOA'):  # should only be one
             self.expire = rdata.expire
             self.minimum = rdata.minimum
@@ -292,11 +485,15 @@ class Zone(DateMixin):
             r.ttl = int(ttl)
             r.save()
 
+        # The records written after save() go into the revision of its serial
+        record_zone_revisions([self])
         return True, 'Zone Update Successful'
 
 
 class BaseZoneRecord(DateMixin):
 
+    rtype = None  # DNS record type, set by each record model
+
     zone = models.ForeignKey(Zone, related_name="%(class)ss")
     data = models.CharField(max_length=255, help_text="Data")
 
@@ -309,6 +506,23 @@ class BaseZoneRecord(DateMixin):
     def __unicode__(self):
         return "%s [%s]" % (self.zone, self.data)
 
+    def syntax_errors(self):
+        """
+        :return: List of syntax error messages, checked without network lookups
+        """
+        return []
+
+    def clean_syntax(self):
+        errors = self.syntax_errors()
+        if errors:
+            raise ValidationError(errors)
+
+    def network_checks(self):
+        """
+        :return: List of (check, hostname) network lookups for this record, check is 'exists' or 'digs'
+        """
+        return []
+
     # Override TTL with default
     @property
     def ttlx(self):
@@ -327,7 +541,9 @@ class BaseZoneRecord(DateMixin):
 
 class AddressRecord(BaseZoneRecord):
 
-    ip = models.GenericIPAddressField(help_text="IP Address")
+    rtype = 'A'
+
+    ip = models.GenericIPAddressField(help_text="IP Address", db_index=True)
 
     class Meta:
         db_table = 'dns_addressrecord'
@@ -337,12 +553,17 @@ class AddressRecord(BaseZoneRecord):
     def __unicode__(self):
         return "%s.%s -> %s" % (self.data, self.zone, self.ip)
 
+    def syntax_errors(self):
+        return [e for e in validate_hostname_strings([self.data]) if e]
+
     def clean(self):
-        validate_hostname_string(self.data)
+        self.clean_syntax()
 
 
 class CanonicalNameRecord(BaseZoneRecord):
 
+    rtype = 'CNAME'
+
     target = models.CharField(max_length=128, help_text="Target")
 
     class Meta:
@@ -360,32 +581,50 @@ class CanonicalNameRecord(BaseZoneRecord):
         else:
             return '%s.%s.' % (self.target, self.zone.domain)
 
+    def syntax_errors(self):
+        return [e for e in validate_hostname_strings([self.data, self.target]) if e]
+
+    def network_checks(self):
+        return [('digs', self.fq_target)]
+
     def clean(self):
-        validate_hostname_string(self.data)
-        validate_hostname_string(self.target)
-        validate_hostname_digs(self.fq_target)
+        self.clean_syntax()
+        if not DNS_MANAGER_DEFER_NETWORK_CHECKS:
+            validate_hostname_digs(self.fq_target)
 
 
 class MailExchangeRecord(BaseZoneRecord):
 
+    rtype = 'MX'
+
     priority = IntegerRangeField(min_value=0, max_value=65535, help_text="Priority")
     origin = models.CharField(max_length=255, help_text="MX Origin", default='@')
 
     class Meta:
         db_table = 'dns_mailexchangerecord'
         unique_together = [('zone', 'data', 'origin')]
+        index_together = [('zone', 'priority', 'data')]
         ordering = ['priority', 'data']
 
     def __unicode__(self):
         return "%s [%s: %s]" % (self.zone, self.priority, self.data)
 
+    def syntax_errors(self):
+        return [e for e in validate_hostname_strings([self.data]) if e]
+
+    def network_checks(self):
+        return [('exists', self.fq_data)]
+
     def clean(self):
-        validate_hostname_string(self.data)
-        validate_hostname_exists(self.fq_data)
+        self.clean_syntax()
+        if not DNS_MANAGER_DEFER_NETWORK_CHECKS:
+            validate_hostname_exists(self.fq_data)
 
 
 class NameServerRecord(BaseZoneRecord):
 
+    rtype = 'NS'
+
     origin = models.CharField(max_length=255, help_text="NS Origin", default='@')
 
     class Meta:
@@ -396,30 +635,40 @@ class NameServerRecord(BaseZoneRecord):
     def __unicode__(self):
         return "%s %s" % (self.zone, self.data)
 
+    def network_checks(self):
+        return [('exists', self.fq_data)]
+
     def clean(self):
-        validate_hostname_exists(self.fq_data)
+        if not DNS_MANAGER_DEFER_NETWORK_CHECKS:
+            validate_hostname_exists(self.fq_data)
 
 
 class TextRecord(BaseZoneRecord):
 
+    rtype = 'TXT'
+
     text = models.CharField(max_length=255, help_text="Text")
 
     class Meta:
         db_table = 'dns_textrecord'
         ordering = ['data', 'text']
+        index_together = [('zone', 'data', 'text')]
 
     def __unicode__(self):
         return "%s [%s]" % (self.zone, self.text)
 
+    def syntax_errors(self):
+        error = text_record_error(self.text)
+        return [error] if error else []
+
     def clean(self):
-        if not (self.text.startswith('"') and self.text.endswith('"')):
-            raise ValidationError('Record must begin and end with double quotes.')
-        if not self.text.count('"') == 2:
-            raise ValidationError('Record must not contain more than 2 quotes.')
+        self.clean_syntax()
 
 
 class ServiceRecord(BaseZoneRecord):
 
+    rtype = 'SRV'
+
     priority = IntegerRangeField(min_value=0, max_value=65535, help_text="Priority")
     weight = IntegerRangeField(min_value=0, max_value=65535, help_text="Weight")
     port = IntegerRangeField(min_value=1, max_value=65535, help_text="TCP / UDP Port")
@@ -429,9 +678,488 @@ class ServiceRecord(BaseZoneRecord):
         db_table = 'dns_servicerecord'
         ordering = ['data', 'priority', 'target']
         unique_together = [('zone', 'data', 'target')]
+        index_together = [('zone', 'data', 'priority', 'target')]
 
     def __unicode__(self):
         return "%s.%s -srv-> %s" % (self.data, self.zone, self.target)
 
+    def syntax_errors(self):
+        error = service_record_data_error(self.data)
+        return [error] if error else []
+
     def clean(self):
-        validate_service_record_data(self.data)
+        self.clean_syntax()
+
+
+def bump_zone_serials(keys):
+    """
+    Increment the serial of many zones as Zone.save() does, with two UPDATE queries, and invalidate their
+    cached data. Used when shared records change under the zones.
+    :param keys: List of (zone pk, domain id) tuples
+    """
+    serial_now = int(time.strftime('%Y%m%d00'))
+    zones = Zone.objects.filter(pk__in=[pk for pk, domain_id in keys])
+    now = timezone.now()
+    with transaction.atomic():
+        # Increment current serials first, so zones moved up to today's serial are not incremented again
+        zones.filter(serial__gte=serial_now).update(serial=F('serial') + 1, valid=None, updated=now)
+        zones.filter(serial__lt=serial_now).update(serial=serial_now, valid=None, updated=now)
+    for pk, domain_id in keys:
+        Zone(pk=pk, domain_id=domain_id).clear_cache()
+    mark_written(dict((pk, ANY_SERIAL) for pk, domain_id in keys))
+    record_zone_changes(zones, 'updated')
+    # Shared records are not noted per zone
+    record_zone_revisions(zones.select_related('domain'), full=True)
+    # Zones known to be invalid are pending again, so only members may need adding
+    update_catalog_members(zones.using(DEFAULT_DB_ALIAS).filter(catalog_member=None)
+                           .values_list('pk', 'domain__name', 'valid'))
+
+
+class RecordSet(DateMixin):
+    """ Named set of records shared by many zones, eg a mail provider's MX and SPF records """
+
+    name = models.CharField(max_length=64, unique=True, help_text="Name")
+
+    class Meta:
+        db_table = 'dns_recordset'
+        ordering = ['name']
+
+    def __unicode__(self):
+        return self.name
+
+    def publish(self):
+        """ Bump the serial of every zone using this set, once """
+        keys = list(self.zones.order_by().values_list('pk', 'domain_id'))
+        bump_zone_serials(keys)
+        record_set_saved_signal.send(sender=RecordSet, instance=self, zone_ids=[pk for pk, domain_id in keys])
+
+
+class SharedRecord(models.Model):
+    """ Record of a RecordSet, written into each zone using the set at render time """
+
+    RTYPE_CHOICES = [(rtype, rtype) for rtype in ('A', 'CNAME', 'MX', 'NS', 'TXT', 'SRV')]
+
+    record_set = models.ForeignKey(RecordSet, related_name='records')
+    owner = models.CharField(max_length=255, default='@', help_text="Owner, relative to each zone")
+    ttl = models.PositiveIntegerField(blank=True, null=True)
+    rtype = models.CharField(max_length=10, choices=RTYPE_CHOICES, help_text="Record Type")
+    rdata = models.CharField(max_length=512, help_text="Record Data, eg: 10 mx.example.com.")
+
+    class Meta:
+        db_table = 'dns_sharedrecord'
+        ordering = ['record_set', 'rtype', 'owner', 'rdata']
+        unique_together = [('record_set', 'owner', 'rtype', 'rdata')]
+
+    def __unicode__(self):
+        return "%s [%s %s %s]" % (self.record_set, self.owner, self.rtype, self.rdata)
+
+    def syntax_errors(self):
+        errors = []
+        error = service_record_data_error(self.owner) if self.rtype == 'SRV' else hostname_error(self.owner)
+        if error:
+            errors.append(error)
+        if self.rtype == 'TXT':
+            error = text_record_error(self.rdata)
+            if error:
+                errors.append(error)
+        try:
+            dns.rdata.from_text(dns.rdataclass.IN, dns.rdatatype.from_text(self.rtype), str(self.rdata))
+        except Exception as e:
+            errors.append('Record data is not valid: %s' % e)
+        return errors
+
+    def clean(self):
+        errors = self.syntax_errors()
+        if errors:
+            raise ValidationError(errors)
+
+    def save(self, *args, **kwargs):
+        super(SharedRecord, self).save(*args, **kwargs)
+        self.record_set.publish()
+
+    def delete(self, *args, **kwargs):
+        super(SharedRecord, self).delete(*args, **kwargs)
+        self.record_set.publish()
+
+
+# Record models by DNS type
+RECORD_MODELS = (
+    ('A', AddressRecord),
+    ('CNAME', CanonicalNameRecord),
+    ('MX', MailExchangeRecord),
+    ('NS', NameServerRecord),
+    ('TXT', TextRecord),
+    ('SRV', ServiceRecord),
+)
+
+
+# Zone pk to domain id, zones keep their domain
+_zone_domains = {}
+ZONE_DOMAIN_CACHE_SIZE = 10000
+
+
+def zone_domain_id(pk):
+    try:
+        return _zone_domains[pk]
+    except KeyError:
+        if len(_zone_domains) >= ZONE_DOMAIN_CACHE_SIZE:
+            _zone_domains.clear()
+        domain_id = _zone_domains[pk] = Zone.objects.filter(pk=pk).values_list('domain_id', flat=True).first()
+        return domain_id
+
+
+def evict_zone_cache(sender, instance, **kwargs):
+    # Record changes without a zone save keep the serial, so move the zone to a new cache generation (which the
+    # zone LRU of every process keys on), drop it from this process's cache and read it from the default
+    # database until replicas catch up
+    domain_id = zone_domain_id(instance.zone_id)
+    if domain_id is not None:
+        Zone(pk=instance.zone_id, domain_id=domain_id).clear_cache()
+    zone_cache.evict(instance.zone_id)
+    mark_written({instance.zone_id: ANY_SERIAL})
+
+for rtype, model in RECORD_MODELS:
+    post_save.connect(evict_zone_cache, sender=model, dispatch_uid='dnsmanager_zone_cache_%s' % rtype)
+    post_delete.connect(evict_zone_cache, sender=model, dispatch_uid='dnsmanager_zone_cache_%s' % rtype)
+
+
+def record_sets_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Linking or unlinking record sets changes the records of the zones, as a shared record save does
+    if reverse and action == 'pre_clear':
+        instance._cleared_zone_keys = list(instance.zones.order_by().values_list('pk', 'domain_id'))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        keys = [(instance.pk, instance.domain_id)]
+    elif action == 'post_clear':
+        keys = instance.__dict__.pop('_cleared_zone_keys', [])
+    else:
+        keys = list(Zone.objects.filter(pk__in=pk_set).order_by().values_list('pk', 'domain_id'))
+    if keys and (pk_set or action == 'post_clear'):
+        bump_zone_serials(keys)
+        for pk, domain_id in keys:
+            zone_cache.evict(pk)
+        if not reverse:
+            # Keep the zone being edited, eg by the admin, at its new serial
+            instance.serial, instance.updated, instance.valid = \
+                Zone.objects.filter(pk=instance.pk).values_list('serial', 'updated', 'valid')[0]
+
+m2m_changed.connect(record_sets_changed, sender=Zone.record_sets.through, dispatch_uid='dnsmanager_record_sets')
+
+
+def forget_zone_domain(sender, instance, **kwargs):
+    _zone_domains.pop(instance.pk, None)
+
+post_delete.connect(forget_zone_domain, sender=Zone, dispatch_uid='dnsmanager_zone_domain')
+
+
+def build_zone_records(zone):
+    """ Build the dns.zone.Zone from ResourceRecord when DNS_MANAGER_UNIFIED_RECORDS is set """
+    return build_zone(zone, zone.resource_rows() if DNS_MANAGER_UNIFIED_RECORDS else None)
+
+
+class ResourceRecord(models.Model):
+    """
+    Copy of a typed record in one table, so a whole zone loads with one indexed query.
+    The typed record models remain the source of truth, see DNS_MANAGER_UNIFIED_RECORDS.
+    """
+
+    zone = models.ForeignKey(Zone, related_name='resourcerecords')
+    rtype = models.CharField(max_length=10, help_text="Record Type")
+    source_id = models.PositiveIntegerField(help_text="Typed Record ID")
+    owner = models.CharField(max_length=255, help_text="Owner")
+    ttl = models.PositiveIntegerField(blank=True, null=True)
+    rdata = models.CharField(max_length=512, help_text="Record Data")
+
+    class Meta:
+        db_table = 'dns_resourcerecord'
+        unique_together = [('rtype', 'source_id')]
+
+    def __unicode__(self):
+        return "%s [%s %s %s]" % (self.zone, self.owner, self.rtype, self.rdata)
+
+    @classmethod
+    def from_record(cls, rtype, record):
+        owner, rdata = record_row(rtype, record)
+        return cls(zone_id=record.zone_id, rtype=rtype, source_id=record.pk, owner=owner, ttl=record.ttl,
+                   rdata=rdata)
+
+
+def sync_resource_records(zones, force=False):
+    """
+    Rewrite the ResourceRecord rows of the given zones from the typed records. Needed after writes that skip
+    model signals (bulk_create, QuerySet.update) and when DNS_MANAGER_UNIFIED_RECORDS is first enabled.
+    """
+    if not (DNS_MANAGER_UNIFIED_RECORDS or force):
+        return
+    pks = [zone.pk for zone in zones]
+    rows = []
+    for rtype, model in RECORD_MODELS:
+        rows.extend(ResourceRecord.from_record(rtype, r) for r in model.objects.filter(zone__in=pks).order_by())
+    ResourceRecord.objects.filter(zone__in=pks).delete()
+    ResourceRecord.objects.bulk_create(rows, batch_size=500)
+
+
+def save_resource_record(sender, instance, **kwargs):
+    if DNS_MANAGER_UNIFIED_RECORDS:
+        row = ResourceRecord.from_record(sender.rtype, instance)
+        ResourceRecord.objects.update_or_create(rtype=row.rtype, source_id=row.source_id, defaults={
+            'zone_id': row.zone_id, 'owner': row.owner, 'ttl': row.ttl, 'rdata': row.rdata})
+
+
+def delete_resource_record(sender, instance, **kwargs):
+    if DNS_MANAGER_UNIFIED_RECORDS:
+        ResourceRecord.objects.filter(rtype=sender.rtype, source_id=instance.pk).delete()
+
+for rtype, model in RECORD_MODELS:
+    post_save.connect(save_resource_record, sender=model, dispatch_uid='dnsmanager_resource_record_%s' % rtype)
+    post_delete.connect(delete_resource_record, sender=model, dispatch_uid='dnsmanager_resource_record_%s' % rtype)
+
+
+class ZoneWarning(models.Model):
+    """ Problem found by the background network verifier, does not block publishing """
+
+    zone = models.ForeignKey(Zone, related_name='warnings')
+    record = models.CharField(max_length=255, help_text="Record")
+    message = models.CharField(max_length=255, help_text="Warning")
+    created = models.DateTimeField("Date Created", auto_now_add=True)
+
+    class Meta:
+        db_table = 'dns_zonewarning'
+        ordering = ['record']
+
+    def __unicode__(self):
+        return "%s [%s: %s]" % (self.zone, self.record, self.message)
+
+
+class ZoneRevision(models.Model):
+    """
+    Record history of a zone at one serial, either a full checkpoint or the changes since the previous revision.
+    See dnsmanager.history.
+    """
+
+    zone = models.ForeignKey(Zone, related_name='revisions')
+    serial = models.PositiveIntegerField()
+    checkpoint = models.BooleanField(default=False)
+    data = models.TextField()
+    created = models.DateTimeField("Date Created", auto_now_add=True)
+
+    class Meta:
+        db_table = 'dns_zonerevision'
+        ordering = ['zone', 'id']
+        index_together = [('zone', 'serial')]
+
+    def __unicode__(self):
+        return "%s [%s%s]" % (self.zone, self.serial, ' checkpoint' if self.checkpoint else '')
+
+
+class ZoneRevisionChange(models.Model):
+    """
+    Record row added to or removed from a zone since its latest ZoneRevision, written along with the record so it
+    is rolled back with it. See dnsmanager.history.
+    """
+
+    zone_id = models.IntegerField(db_index=True)  # not a foreign key, rows are noted while a zone is deleted
+    added = models.BooleanField(default=True)
+    rtype = models.CharField(max_length=10)
+    owner = models.CharField(max_length=255)
+    ttl = models.PositiveIntegerField(blank=True, null=True)
+    rdata = models.CharField(max_length=512)
+
+    class Meta:
+        db_table = 'dns_zonerevisionchange'
+        ordering = ['id']
+
+    def __unicode__(self):
+        return "%s %s [%s %s %s]" % (self.zone_id, '+' if self.added else '-', self.owner, self.rtype, self.rdata)
+
+
+def revision_changes(rtype, records, added):
+    """ :return: Iterator of (zone id, added, record row) tuples of typed records, for record_revision_changes """
+    for record in records:
+        owner, rdata = record_row(rtype, record)
+        yield record.zone_id, added, (rtype, owner, record.ttl, rdata)
+
+
+def record_revision_changes(*changes):
+    """
+    Add a ZoneRevisionChange for each (zone id, added, record row) tuple of the iterables when DNS_MANAGER_HISTORY
+    is set. The record signals call this for saves and deletes, writes skipping them call it themselves.
+    """
+    if DNS_MANAGER_HISTORY:
+        ZoneRevisionChange.objects.bulk_create([ZoneRevisionChange(zone_id=zone_id, added=added, rtype=rtype,
+                                                                   owner=owner, ttl=ttl, rdata=rdata)
+                                                for zone_id, added, (rtype, owner, ttl, rdata) in chain(*changes)],
+                                               batch_size=500)
+
+
+def store_revision_row(sender, instance, raw=False, **kwargs):
+    if DNS_MANAGER_HISTORY and instance.pk is not None and not raw:
+        stored = sender.objects.using(DEFAULT_DB_ALIAS).filter(pk=instance.pk)
+        instance._revision_removed = list(revision_changes(sender.rtype, stored, False))
+
+
+def save_revision_change(sender, instance, raw=False, **kwargs):
+    removed = instance.__dict__.pop('_revision_removed', [])
+    if DNS_MANAGER_HISTORY and not raw:
+        added = list(revision_changes(sender.rtype, [instance], True))
+        if [(zone_id, row) for zone_id, a, row in removed] != [(zone_id, row) for zone_id, a, row in added]:
+            record_revision_changes(removed, added)
+
+
+def delete_revision_change(sender, instance, **kwargs):
+    record_revision_changes(revision_changes(sender.rtype, [instance], False))
+
+for rtype, model in RECORD_MODELS:
+    pre_save.connect(store_revision_row, sender=model, dispatch_uid='dnsmanager_revision_row_%s' % rtype)
+    post_save.connect(save_revision_change, sender=model, dispatch_uid='dnsmanager_revision_change_save_%s' % rtype)
+    post_delete.connect(delete_revision_change, sender=model,
+                        dispatch_uid='dnsmanager_revision_change_delete_%s' % rtype)
+
+
+def forget_revision_changes(sender, instance, **kwargs):
+    # Deleting the zone deletes its records first, whose changes are noted under its id
+    if DNS_MANAGER_HISTORY:
+        ZoneRevisionChange.objects.filter(zone_id=instance.pk).delete()
+
+post_delete.connect(forget_revision_changes, sender=Zone, dispatch_uid='dnsmanager_revision_changes')
+
+
+def record_zone_revisions(zones, full=False):
+    """
+    Store a revision of each zone when DNS_MANAGER_HISTORY is set. Called by Zone.save(), bump_zone_serials and
+    update_from_text, and on zone_fully_saved_signal for records saved after the zone, eg by admin inlines.
+    :param full: Compare every record of the zones, for changes not noted as ZoneRevisionChange rows
+    """
+    if DNS_MANAGER_HISTORY:
+        from .history import record_revision
+        for zone in zones:
+            record_revision(zone, full=full)
+
+
+def record_zone_revision(sender, instance, **kwargs):
+    record_zone_revisions([instance])
+
+zone_fully_saved_signal.connect(record_zone_revision, dispatch_uid='dnsmanager_zone_revision')
+zone_fully_saved_signal.connect(collect_saved_zone, dispatch_uid='dnsmanager_collect_saved_zone')
+
+
+class ZoneChange(models.Model):
+    """ Entry of the zone changes feed, the id is the change sequence. See dnsmanager.changes. """
+
+    ACTIONS = (
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    )
+
+    zone_id = models.IntegerField(db_index=True)  # not a foreign key, deletions stay in the feed
+    domain = models.CharField(max_length=253)
+    serial = models.PositiveIntegerField()
+    action = models.CharField(max_length=8, choices=ACTIONS)
+    created = models.DateTimeField("Date Created", auto_now_add=True)
+
+    class Meta:
+        db_table = 'dns_zonechange'
+        ordering = ['id']
+
+    def __unicode__(self):
+        return "%s %s [%s]" % (self.domain, self.action, self.serial)
+
+
+def record_zone_changes(zones, action):
+    """
+    Add a ZoneChange for each zone of a queryset, used where zones change without Zone.save()
+    """
+    if DNS_MANAGER_CHANGES:
+        ZoneChange.objects.bulk_create([ZoneChange(zone_id=pk, domain=domain, serial=serial, action=action)
+                                        for pk, domain, serial in zones.values_list('pk', 'domain__name', 'serial')])
+
+
+def save_zone_change(sender, instance, created, **kwargs):
+    if DNS_MANAGER_CHANGES:
+        ZoneChange.objects.create(zone_id=instance.pk, domain=instance.domain_name, serial=instance.serial,
+                                  action='created' if created else 'updated')
+
+
+def delete_zone_change(sender, instance, **kwargs):
+    if DNS_MANAGER_CHANGES:
+        ZoneChange.objects.create(zone_id=instance.pk, domain=instance.domain_name, serial=instance.serial,
+                                  action='deleted')
+
+post_save.connect(save_zone_change, sender=Zone, dispatch_uid='dnsmanager_zone_change_save')
+post_delete.connect(delete_zone_change, sender=Zone, dispatch_uid='dnsmanager_zone_change_delete')
+
+
+class Catalog(models.Model):
+    """ Serial of a catalog zone, see dnsmanager.catalog """
+
+    name = models.CharField(max_length=253, unique=True)
+    serial = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField("Date Updated", auto_now=True)
+
+    class Meta:
+        db_table = 'dns_catalog'
+        ordering = ['name']
+
+    def __unicode__(self):
+        return self.name
+
+
+class CatalogMember(models.Model):
+    """ Zone listed in the catalog zones, kept in step as zones are saved, validated and deleted """
+
+    zone = models.OneToOneField(Zone, related_name='catalog_member')
+    domain = models.CharField(max_length=253)
+
+    class Meta:
+        db_table = 'dns_catalogmember'
+        ordering = ['domain']
+
+    def __unicode__(self):
+        return self.domain
+
+
+def bump_catalog_serial():
+    """ Increment the serial of every catalog zone, creating the DNS_MANAGER_CATALOG_ZONE one if missing """
+    serial_now = int(time.strftime('%Y%m%d00'))
+    Catalog.objects.get_or_create(name=DNS_MANAGER_CATALOG_ZONE)
+    now = timezone.now()
+    # As in bump_zone_serials, increment first so serials moved up to today's are not incremented again
+    Catalog.objects.filter(serial__gte=serial_now).update(serial=F('serial') + 1, updated=now)
+    Catalog.objects.filter(serial__lt=serial_now).update(serial=serial_now, updated=now)
+
+
+def update_catalog_members(rows):
+    """
+    Add zones not known to be invalid to the catalog and drop the others, bumping the catalog serial once if
+    the members changed
+    :param rows: Iterable of (zone pk, domain name, valid) tuples
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    # Read from the database written to, a lagging replica would have the member rows added twice
+    existing = set(CatalogMember.objects.using(DEFAULT_DB_ALIAS).filter(zone__in=[pk for pk, domain, valid in rows])
+                   .values_list('zone_id', flat=True))
+    added = [CatalogMember(zone_id=pk, domain=domain.lower())
+             for pk, domain, valid in rows if valid is not False and pk not in existing]
+    removed = [pk for pk, domain, valid in rows if valid is False and pk in existing]
+    CatalogMember.objects.bulk_create(added)
+    if removed:
+        CatalogMember.objects.filter(zone__in=removed).delete()
+    if added or removed:
+        bump_catalog_serial()
+
+
+def save_catalog_member(sender, instance, **kwargs):
+    update_catalog_members([(instance.pk, instance.domain_name, instance.valid)])
+
+
+def delete_catalog_member(sender, instance, **kwargs):
+    # Runs before the member row is deleted along with the zone
+    if CatalogMember.objects.using(DEFAULT_DB_ALIAS).filter(zone=instance.pk).exists():
+        bump_catalog_serial()
+
+post_save.connect(save_catalog_member, sender=Zone, dispatch_uid='dnsmanager_catalog_member_save')
+pre_delete.connect(delete_catalog_member, sender=Zone, dispatch_uid='dnsmanager_catalog_member_delete')
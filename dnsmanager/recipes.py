@@ -1,12 +1,25 @@
+from django.core.exceptions import ValidationError
+
+from .instrumentation import instrumented
 from .models import AddressRecord
 from .models import CanonicalNameRecord
 from .models import MailExchangeRecord
 from .models import NameServerRecord
 from .models import TextRecord
 from .models import ServiceRecord
+from .models import validate_hostname_strings, service_record_data_error, text_record_error
+from .models import sync_resource_records, record_revision_changes, revision_changes
 from .settings import ZONE_DEFAULTS
 
 
+@instrumented('recipe', detail=lambda zone, recipe: recipe.__name__)
+def apply_recipe(zone, recipe):
+    """ Apply the recipe class to the zone and save it """
+    r = recipe(zone)
+    r.save()
+    return r
+
+
 class Recipe(object):
     """ Custom Zone Recipe """
     def __init__(self, zone):
@@ -15,6 +28,14 @@ class Recipe(object):
     def save(self):
         self.zone.save()
 
+    def check(self, hostnames=(), services=(), texts=()):
+        """ Batch syntax check recipe data before it is written """
+        errors = [e for e in validate_hostname_strings(hostnames) if e]
+        errors += [e for e in map(service_record_data_error, services) if e]
+        errors += [e for e in map(text_record_error, texts) if e]
+        if errors:
+            raise ValidationError(errors)
+
 
 class NameServerRecipe(Recipe):
     """ Superclass for Name Server Recipe """
@@ -26,6 +47,7 @@ class NameServerRecipe(Recipe):
 
     def set_ns(self, data):
         if data is not None:
+            self.check(hostnames=data)
             # Remove existing NS
             NameServerRecord.objects.filter(zone=self.zone).delete()
             for d in data:
@@ -43,6 +65,7 @@ class CnameRecipe(Recipe):
 
     def set_cname(self, data):
         if data is not None:
+            self.check(hostnames=[d for d, t, ttl in data] + [t for d, t, ttl in data])
             for d, t, ttl in data:
                 CanonicalNameRecord.objects.get_or_create(zone=self.zone, data=d, target=t, ttl=ttl)
 
@@ -58,6 +81,7 @@ class MxRecipe(Recipe):
 
     def set_mx(self, data):
         if data is not None:
+            self.check(hostnames=[d for p, d, ttl in data])
             # Remove existing MX
             MailExchangeRecord.objects.filter(zone=self.zone).delete()
             for p, d, ttl in data:
@@ -75,6 +99,7 @@ class SPFRecipe(Recipe):
 
     def set_spf(self, data):
         if data is not None:
+            self.check(texts=[spf for spf, ttl in data])
             # Remove existing SPF
             TextRecord.objects.filter(zone=self.zone, text__startswith='"v=spf1').delete()
             for spf, ttl in data:
@@ -92,6 +117,7 @@ class ServiceRecipe(Recipe):
 
     def set_service(self, data):
         if data is not None:
+            self.check(hostnames=[row[1] for row in data], services=[row[0] for row in data])
             for data, target, priority, weight, port,  ttl in data:
                 ServiceRecord.objects.get_or_create(zone=self.zone, priority=priority, weight=weight, port=port, target=target, data=data, ttl=ttl)
 
@@ -155,12 +181,16 @@ class RemovePerRecordTtls(Recipe):
     """ Remove Per Record TTLs """
     def __init__(self, zone):
         super(RemovePerRecordTtls, self).__init__(zone)
-        AddressRecord.objects.filter(zone=self.zone).update(ttl=None)
-        CanonicalNameRecord.objects.filter(zone=self.zone).update(ttl=None)
-        MailExchangeRecord.objects.filter(zone=self.zone).update(ttl=None)
-        NameServerRecord.objects.filter(zone=self.zone).update(ttl=None)
-        TextRecord.objects.filter(zone=self.zone).update(ttl=None)
-        ServiceRecord.objects.filter(zone=self.zone).update(ttl=None)
+        for model in (AddressRecord, CanonicalNameRecord, MailExchangeRecord, NameServerRecord, TextRecord,
+                      ServiceRecord):
+            records = model.objects.filter(zone=self.zone).exclude(ttl=None)
+            # The update skips the record signals, so note the history changes here
+            record_revision_changes(revision_changes(model.rtype, records, False),
+                                    ((zone_id, True, (rtype, owner, None, rdata))
+                                     for zone_id, added, (rtype, owner, ttl, rdata)
+                                     in revision_changes(model.rtype, records, False)))
+            records.update(ttl=None)
+        sync_resource_records([self.zone])
 
 
 class ResetZoneDefaults(Recipe):
@@ -184,6 +214,7 @@ class ReValidate(Recipe):
     """ Force revalidation of the zone """
     def __init__(self, zone):
         super(ReValidate, self).__init__(zone)
+        self.zone.store_result(valid=None)
         self.zone.clear_cache()
 
     def save(self):
@@ -0,0 +1,82 @@
+"""
+Read replica routing for the read-heavy zone paths.
+
+Add "dnsmanager.routers.ReplicaRouter" to DATABASE_ROUTERS and list the replica aliases in
+DNS_MANAGER_READ_REPLICAS. Reads made within replica_reads() (the zone list and detail views, viewzone and
+validatezones) go to a replica picked per block, all other reads and every write stay on the default database.
+
+Zone saves note the new serial in the cache for DNS_MANAGER_REPLICA_PIN_SECONDS. fresh_zones() swaps zones read
+from a replica whose serial is older than the noted one for a copy from the default database, so a zone just
+changed in the admin is rendered from the primary until the replicas have caught up. Related records of such a
+copy are read from the default database too, as they follow the database of the zone instance.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .settings import DNS_MANAGER_READ_REPLICAS, DNS_MANAGER_REPLICA_PIN_SECONDS, DNS_MANAGER_CACHE_PREFIX
+
+# Noted instead of a serial when records change without a zone save, pins the zone regardless of its serial
+ANY_SERIAL = 'any'
+
+_local = threading.local()
+
+
+class ReplicaRouter(object):
+
+    def db_for_read(self, model, **hints):
+        if hints.get('instance') is not None:
+            return None  # follow the database the instance was read from
+        return getattr(_local, 'alias', None)
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model=None, **hints):
+        return None
+
+
+@contextmanager
+def replica_reads():
+    """ Route the reads of the block to one of DNS_MANAGER_READ_REPLICAS, if any are configured """
+    previous = getattr(_local, 'alias', None)
+    if DNS_MANAGER_READ_REPLICAS and previous is None:
+        _local.alias = random.choice(DNS_MANAGER_READ_REPLICAS)
+    try:
+        yield
+    finally:
+        _local.alias = previous
+
+
+def written_key(pk):
+    return '%s:written:%s' % (DNS_MANAGER_CACHE_PREFIX, pk)
+
+
+def mark_written(serials):
+    """ :param serials: dict of zone id to the serial just written, or ANY_SERIAL """
+    if DNS_MANAGER_READ_REPLICAS and serials:
+        cache.set_many(dict((written_key(pk), serial) for pk, serial in serials.items()),
+                       DNS_MANAGER_REPLICA_PIN_SECONDS)
+
+
+def fresh_zones(zones):
+    """
+    :param zones: List of Zone, eg read from a replica
+    :return: The list with zones older than their last noted write replaced by a copy from the default database
+    """
+    if not DNS_MANAGER_READ_REPLICAS or not zones:
+        return zones
+    written = cache.get_many([written_key(zone.pk) for zone in zones])
+    stale = [zone.pk for zone in zones if written_key(zone.pk) in written and
+             (written[written_key(zone.pk)] == ANY_SERIAL or written[written_key(zone.pk)] > zone.serial)]
+    if not stale:
+        return zones
+    model = type(zones[0])
+    primary = model.objects.using(DEFAULT_DB_ALIAS).select_related('domain').in_bulk(stale)
+    return [primary.get(zone.pk, zone) for zone in zones]
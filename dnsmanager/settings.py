@@ -1,6 +1,15 @@
 from django.conf import settings
 
-from defaults import ZONE_DEFAULTS_DEFAULT, DNS_MANAGER_RECIPES_DEFAULT, DNS_MANAGER_NAMESERVERS_DEFAULT
+from defaults import ZONE_DEFAULTS_DEFAULT, DNS_MANAGER_RECIPES_DEFAULT, DNS_MANAGER_NAMESERVERS_DEFAULT, \
+    DNS_MANAGER_CACHE_PREFIX_DEFAULT, DNS_MANAGER_CACHE_TIMEOUT_DEFAULT, DNS_MANAGER_INSTRUMENTATION_SINKS_DEFAULT, \
+    DNS_MANAGER_METRICS_TIMEOUT_DEFAULT, DNS_MANAGER_DEFER_NETWORK_CHECKS_DEFAULT, DNS_MANAGER_VERIFIER_THREADS_DEFAULT, \
+    DNS_MANAGER_ZONE_CACHE_RECORDS_DEFAULT, DNS_MANAGER_ZONE_CACHE_BYTES_DEFAULT, DNS_MANAGER_UNIFIED_RECORDS_DEFAULT, \
+    DNS_MANAGER_HISTORY_DEFAULT, DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL_DEFAULT, DNS_MANAGER_REVERSION_DEFAULT, \
+    DNS_MANAGER_CHANGES_DEFAULT, DNS_MANAGER_CHANGES_MAX_WAIT_DEFAULT, DNS_MANAGER_CHANGES_POLL_INTERVAL_DEFAULT, \
+    DNS_MANAGER_CHANGES_COMMIT_GRACE_DEFAULT, \
+    DNS_MANAGER_CATALOG_ZONE_DEFAULT, DNS_MANAGER_DYNUPDATE_KEYS_DEFAULT, DNS_MANAGER_DYNUPDATE_WINDOW_DEFAULT, \
+    DNS_MANAGER_ZONES_SAVED_THREADS_DEFAULT, DNS_MANAGER_READ_REPLICAS_DEFAULT, DNS_MANAGER_REPLICA_PIN_SECONDS_DEFAULT, \
+    DNS_MANAGER_DOMAIN_FACTORY_DEFAULT
 
 ZONE_DEFAULTS = getattr(settings, 'ZONE_DEFAULTS', ZONE_DEFAULTS_DEFAULT)
 
@@ -9,4 +18,61 @@ DNS_MANAGER_ZONE_ADMIN_FILTER = getattr(settings, 'DNS_MANAGER_ZONE_ADMIN_FILTER
 DNS_MANAGER_RECIPES = getattr(settings, 'DNS_MANAGER_RECIPES', DNS_MANAGER_RECIPES_DEFAULT)
 
 # These are the nameservers that we expect our zones to be delegated to
-DNS_MANAGER_NAMESERVERS = getattr(settings, 'DNS_MANAGER_NAMESERVERS', DNS_MANAGER_NAMESERVERS_DEFAULT)
\ No newline at end of file
+DNS_MANAGER_NAMESERVERS = getattr(settings, 'DNS_MANAGER_NAMESERVERS', DNS_MANAGER_NAMESERVERS_DEFAULT)
+# All cache keys are namespaced by this prefix and a per zone generation counter
+DNS_MANAGER_CACHE_PREFIX = getattr(settings, 'DNS_MANAGER_CACHE_PREFIX', DNS_MANAGER_CACHE_PREFIX_DEFAULT)
+DNS_MANAGER_CACHE_TIMEOUT = getattr(settings, 'DNS_MANAGER_CACHE_TIMEOUT', DNS_MANAGER_CACHE_TIMEOUT_DEFAULT)
+
+# Callables receiving a dnsmanager.instrumentation.Measurement for each instrumented operation
+DNS_MANAGER_INSTRUMENTATION_SINKS = getattr(settings, 'DNS_MANAGER_INSTRUMENTATION_SINKS',
+                                            DNS_MANAGER_INSTRUMENTATION_SINKS_DEFAULT)
+
+# Callable creating a domain for a name, used by dnsmanager.synthetic when there is no domain to copy yet
+DNS_MANAGER_DOMAIN_FACTORY = getattr(settings, 'DNS_MANAGER_DOMAIN_FACTORY', DNS_MANAGER_DOMAIN_FACTORY_DEFAULT)
+
+DNS_MANAGER_METRICS_TIMEOUT = getattr(settings, 'DNS_MANAGER_METRICS_TIMEOUT', DNS_MANAGER_METRICS_TIMEOUT_DEFAULT)
+
+# Skip hostname existence checks in record clean() and leave them to the background verifier
+DNS_MANAGER_DEFER_NETWORK_CHECKS = getattr(settings, 'DNS_MANAGER_DEFER_NETWORK_CHECKS',
+                                           DNS_MANAGER_DEFER_NETWORK_CHECKS_DEFAULT)
+DNS_MANAGER_VERIFIER_THREADS = getattr(settings, 'DNS_MANAGER_VERIFIER_THREADS', DNS_MANAGER_VERIFIER_THREADS_DEFAULT)
+
+# Size limits of the per process cache of built zones, in records and approximate bytes (None for no limit)
+DNS_MANAGER_ZONE_CACHE_RECORDS = getattr(settings, 'DNS_MANAGER_ZONE_CACHE_RECORDS',
+                                         DNS_MANAGER_ZONE_CACHE_RECORDS_DEFAULT)
+DNS_MANAGER_ZONE_CACHE_BYTES = getattr(settings, 'DNS_MANAGER_ZONE_CACHE_BYTES', DNS_MANAGER_ZONE_CACHE_BYTES_DEFAULT)
+
+# Keep a copy of every record in the ResourceRecord table and build zones from it with one query
+DNS_MANAGER_UNIFIED_RECORDS = getattr(settings, 'DNS_MANAGER_UNIFIED_RECORDS', DNS_MANAGER_UNIFIED_RECORDS_DEFAULT)
+
+# Record a ZoneRevision of record changes on every zone save, see dnsmanager.history
+DNS_MANAGER_HISTORY = getattr(settings, 'DNS_MANAGER_HISTORY', DNS_MANAGER_HISTORY_DEFAULT)
+DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL = getattr(settings, 'DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL',
+                                                  DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL_DEFAULT)
+# Keep django-reversion full snapshots in the zone admin, can be turned off once DNS_MANAGER_HISTORY is used
+DNS_MANAGER_REVERSION = getattr(settings, 'DNS_MANAGER_REVERSION', DNS_MANAGER_REVERSION_DEFAULT)
+
+# Record every zone serial change in the ZoneChange feed, see dnsmanager.changes
+DNS_MANAGER_CHANGES = getattr(settings, 'DNS_MANAGER_CHANGES', DNS_MANAGER_CHANGES_DEFAULT)
+DNS_MANAGER_CHANGES_MAX_WAIT = getattr(settings, 'DNS_MANAGER_CHANGES_MAX_WAIT', DNS_MANAGER_CHANGES_MAX_WAIT_DEFAULT)
+DNS_MANAGER_CHANGES_POLL_INTERVAL = getattr(settings, 'DNS_MANAGER_CHANGES_POLL_INTERVAL',
+                                            DNS_MANAGER_CHANGES_POLL_INTERVAL_DEFAULT)
+DNS_MANAGER_CHANGES_COMMIT_GRACE = getattr(settings, 'DNS_MANAGER_CHANGES_COMMIT_GRACE',
+                                           DNS_MANAGER_CHANGES_COMMIT_GRACE_DEFAULT)
+
+# Name of the RFC 9432 catalog zone listing the valid zones, see dnsmanager.catalog
+DNS_MANAGER_CATALOG_ZONE = getattr(settings, 'DNS_MANAGER_CATALOG_ZONE', DNS_MANAGER_CATALOG_ZONE_DEFAULT)
+
+# TSIG keys accepted by the dnsupdated listener, updates must be signed by one of them when any are set
+DNS_MANAGER_DYNUPDATE_KEYS = getattr(settings, 'DNS_MANAGER_DYNUPDATE_KEYS', DNS_MANAGER_DYNUPDATE_KEYS_DEFAULT)
+DNS_MANAGER_DYNUPDATE_WINDOW = getattr(settings, 'DNS_MANAGER_DYNUPDATE_WINDOW', DNS_MANAGER_DYNUPDATE_WINDOW_DEFAULT)
+
+# Threads sending zones_saved_signal in the background, 0 sends it from the saving thread, see dnsmanager.dispatch
+DNS_MANAGER_ZONES_SAVED_THREADS = getattr(settings, 'DNS_MANAGER_ZONES_SAVED_THREADS',
+                                          DNS_MANAGER_ZONES_SAVED_THREADS_DEFAULT)
+
+# Database aliases the zone read paths use with dnsmanager.routers.ReplicaRouter, and for how long after a save
+# a zone is still read from the default database
+DNS_MANAGER_READ_REPLICAS = getattr(settings, 'DNS_MANAGER_READ_REPLICAS', DNS_MANAGER_READ_REPLICAS_DEFAULT)
+DNS_MANAGER_REPLICA_PIN_SECONDS = getattr(settings, 'DNS_MANAGER_REPLICA_PIN_SECONDS',
+                                          DNS_MANAGER_REPLICA_PIN_SECONDS_DEFAULT)
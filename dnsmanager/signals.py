@@ -1,4 +1,13 @@
 import django.dispatch
 
 # signal
-zone_fully_saved_signal = django.dispatch.Signal(providing_args=["instance", "created"])
\ No newline at end of file
+zone_fully_saved_signal = django.dispatch.Signal(providing_args=["instance", "created"])
+
+# sent with a dict of zone id to Zone and the set of created zone ids, once per batch, see dnsmanager.dispatch
+zones_saved_signal = django.dispatch.Signal(providing_args=["zones", "created"])
+
+# sent when the records of a shared record set change, after the serials of the zones using it are bumped
+record_set_saved_signal = django.dispatch.Signal(providing_args=["instance", "zone_ids"])
+
+# sent for each instrumented operation when dnsmanager.instrumentation.signal_sink is configured
+operation_measured_signal = django.dispatch.Signal(providing_args=["measurement"])
\ No newline at end of file
@@ -0,0 +1,264 @@
+"""
+Compact snapshots of all zones, records and shared record sets.
+
+A snapshot is a gzipped stream of JSON lines. Strings are dictionary encoded: the first use of a string is
+preceded by a ["S", text] line and every row refers to strings by their index, so repeated owners, targets and
+TXT values are stored once. Zones are numbered in the order written and records refer to that number:
+
+    ["dnsmanager-snapshot", 1]
+    ["S", "example.com"]
+    ["S", "hostmaster"]
+    ["Z", 0, 0, 1, 2016010100, 28800, 7200, 2419200, 600, 3600]     number, domain, SOA email, serial, timers
+    ["S", "www"]
+    ["S", "192.0.2.1"]
+    ["A", 0, 2, null, 3]                                            zone number, record fields
+    ["RS", 4]                                                       record set name
+    ["SR", 0, 5, null, 6, 7]                                        record set number, record fields
+    ["ZS", 0, 0]                                                    zone number, record set number
+
+Validation results, warnings and ResourceRecord rows are derived data and not included.
+"""
+import gzip
+import json
+
+from django.db import connection, transaction
+
+from .models import Zone, RecordSet, SharedRecord, RECORD_MODELS, sync_resource_records, record_zone_changes, \
+    update_catalog_members
+from .synthetic import get_domain_model
+from .zonecache import zone_cache
+
+FORMAT = ['dnsmanager-snapshot', 1]
+ZONE_FIELDS = ('soa_email', 'serial', 'refresh', 'retry', 'expire', 'minimum', 'ttl')
+SHARED_FIELDS = ('owner', 'ttl', 'rtype', 'rdata')
+BATCH_SIZE = 500
+
+
+def record_fields(model):
+    """ :return: Names of the record fields stored in snapshots, in order """
+    return [f.attname for f in model._meta.concrete_fields
+            if f.name not in ('id', 'zone', 'created', 'updated', 'version')]
+
+
+class SnapshotWriter(object):
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.strings = {}
+        self.write(FORMAT)
+
+    def write(self, row):
+        self.stream.write(json.dumps(row, separators=(',', ':')) + '\n')
+
+    def encode(self, value):
+        """ :return: Index of the string value in the string table, other values unchanged """
+        if not isinstance(value, basestring):
+            return value
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+            self.write(['S', value])
+        return index
+
+    def row(self, kind, *values):
+        self.write([kind] + [self.encode(value) for value in values])
+
+
+class SnapshotReader(object):
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.strings = []
+
+    def __iter__(self):
+        """ Yield (kind, values) rows, collecting string table lines on the way """
+        lines = iter(self.stream)
+        if json.loads(next(lines, 'null')) != FORMAT:
+            raise ValueError('Not a dnsmanager snapshot')
+        strings = self.strings
+        for line in lines:
+            row = json.loads(line)
+            if row[0] == 'S':
+                strings.append(row[1])
+            else:
+                yield row[0], row[1:]
+
+    def decode(self, values, fields):
+        """ :return: dict of field name to value, decoding string table references of string fields """
+        return dict((name, self.strings[value] if string and value is not None else value)
+                    for (name, string), value in zip(fields, values))
+
+
+def string_fields(model, names):
+    return [(name, model._meta.get_field(name).get_internal_type() in ('CharField', 'GenericIPAddressField',
+                                                                         'TextField'))
+            for name in names]
+
+
+def dump(stream):
+    """
+    Write a snapshot of the whole zone database, reading zones and records in batches within one transaction.
+    PostgreSQL runs it at repeatable read, the MySQL default, so every batch sees the same state of the database.
+    :return: dict of row counts by kind
+    """
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if outermost and connection.vendor == 'postgresql':
+            connection.cursor().execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        return dump_rows(SnapshotWriter(stream))
+
+
+def dump_rows(writer):
+    """ Write the snapshot rows, skipping rows that refer to zones or record sets not written """
+    counts = {}
+    numbers = {}
+    pks = list(Zone.objects.order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(pks), BATCH_SIZE):
+        batch = pks[i:i + BATCH_SIZE]
+        for zone in Zone.objects.filter(pk__in=batch).order_by('pk').values('pk', 'domain__name', *ZONE_FIELDS):
+            numbers[zone['pk']] = len(numbers)
+            writer.row('Z', numbers[zone['pk']], zone['domain__name'], *[zone[f] for f in ZONE_FIELDS])
+        for rtype, model in RECORD_MODELS:
+            fields = record_fields(model)
+            for row in model.objects.filter(zone__in=batch).order_by('pk').values_list('zone_id', *fields):
+                if row[0] not in numbers:
+                    continue
+                writer.row(rtype, numbers[row[0]], *row[1:])
+                counts[rtype] = counts.get(rtype, 0) + 1
+
+    set_numbers = {}
+    for pk, name in RecordSet.objects.order_by('pk').values_list('pk', 'name'):
+        set_numbers[pk] = len(set_numbers)
+        writer.row('RS', name)
+    for row in SharedRecord.objects.order_by('pk').values_list('record_set_id', *SHARED_FIELDS):
+        if row[0] in set_numbers:
+            writer.row('SR', set_numbers[row[0]], *row[1:])
+    for zone_id, set_id in Zone.record_sets.through.objects.order_by('pk').values_list('zone_id', 'recordset_id'):
+        if zone_id in numbers and set_id in set_numbers:
+            writer.row('ZS', numbers[zone_id], set_numbers[set_id])
+
+    counts['zones'] = len(numbers)
+    counts['record sets'] = len(set_numbers)
+    return counts
+
+
+class Loader(object):
+    """ Buffers snapshot rows and writes them with bulk inserts """
+
+    def __init__(self, reader, replace=False):
+        self.reader = reader
+        self.replace = replace
+        self.domains = get_domain_model()
+        self.pending_zones = []  # (number, domain name, zone fields)
+        self.zones = {}  # number to pk, None for skipped zones
+        self.records = dict((model, []) for rtype, model in RECORD_MODELS)
+        self.sets = []  # (RecordSet, whether to load its records)
+        self.shared = []
+        self.zone_sets = []
+        self.skipped = []
+        self.counts = {}
+
+    def add_zone(self, values, fields):
+        number, name = values[0], self.reader.strings[values[1]]
+        self.pending_zones.append((number, name, self.reader.decode(values[2:], fields)))
+        if len(self.pending_zones) >= BATCH_SIZE:
+            self.flush_zones()
+
+    def flush_zones(self):
+        if not self.pending_zones:
+            return
+        names = [name for number, name, fields in self.pending_zones]
+        domains = dict((d.name, d) for d in self.domains.objects.filter(name__in=names))
+        if self.replace:
+            replaced = Zone.objects.filter(domain__name__in=names)
+            for pk, domain_id in replaced.values_list('pk', 'domain_id'):
+                # A queryset delete skips Zone.delete, so move cached renders and validation results out of reach
+                Zone(pk=pk, domain_id=domain_id).clear_cache()
+                zone_cache.evict(pk)
+            replaced.delete()
+        zones = []
+        for number, name, fields in self.pending_zones:
+            if name in domains:
+                zones.append(Zone(domain=domains[name], **fields))
+            else:
+                self.zones[number] = None
+                self.skipped.append(name)
+        Zone.objects.bulk_create(zones, batch_size=BATCH_SIZE)
+        created = dict(Zone.objects.filter(domain__name__in=names).values_list('domain__name', 'pk'))
+        for number, name, fields in self.pending_zones:
+            if name in domains:
+                self.zones[number] = created[name]
+        self.counts['zones'] = self.counts.get('zones', 0) + len(zones)
+        self.pending_zones = []
+
+    def add_record(self, model, fields, values):
+        if values[0] not in self.zones:
+            self.flush_zones()
+        zone_id = self.zones[values[0]]
+        if zone_id is not None:
+            self.records[model].append(model(zone_id=zone_id, **self.reader.decode(values[1:], fields)))
+            if len(self.records[model]) >= BATCH_SIZE:
+                self.flush_records(model)
+
+    def flush_records(self, model):
+        model.objects.bulk_create(self.records[model], batch_size=BATCH_SIZE)
+        self.counts[model.rtype] = self.counts.get(model.rtype, 0) + len(self.records[model])
+        self.records[model] = []
+
+    def load(self):
+        models = dict(RECORD_MODELS)
+        fields = dict((rtype, string_fields(model, record_fields(model))) for rtype, model in RECORD_MODELS)
+        zone_fields = string_fields(Zone, ZONE_FIELDS)
+        shared_fields = string_fields(SharedRecord, SHARED_FIELDS)
+        for kind, values in self.reader:
+            if kind == 'Z':
+                self.add_zone(values, zone_fields)
+            elif kind in models:
+                self.add_record(models[kind], fields[kind], values)
+            elif kind == 'RS':
+                self.flush_zones()
+                record_set, created = RecordSet.objects.get_or_create(name=self.reader.strings[values[0]])
+                if not created and self.replace:
+                    record_set.records.all().delete()
+                self.sets.append((record_set, created or self.replace))
+            elif kind == 'SR':
+                record_set, load = self.sets[values[0]]
+                if load:
+                    self.shared.append(SharedRecord(record_set=record_set,
+                                                    **self.reader.decode(values[1:], shared_fields)))
+            elif kind == 'ZS':
+                zone_id = self.zones[values[0]]
+                if zone_id is not None:
+                    self.zone_sets.append(Zone.record_sets.through(zone_id=zone_id,
+                                                                   recordset_id=self.sets[values[1]][0].pk))
+            else:
+                raise ValueError('Unknown snapshot row %r' % kind)
+        self.flush_zones()
+        for model in self.records:
+            self.flush_records(model)
+        # bulk_create skips SharedRecord.save(), the loaded zones already carry their snapshot serials
+        SharedRecord.objects.bulk_create(self.shared, batch_size=BATCH_SIZE)
+        Zone.record_sets.through.objects.bulk_create(self.zone_sets, batch_size=BATCH_SIZE)
+        pks = [pk for pk in self.zones.values() if pk is not None]
+        for i in range(0, len(pks), BATCH_SIZE):
+            zones = Zone.objects.filter(pk__in=pks[i:i + BATCH_SIZE])
+            sync_resource_records(zones)
+            record_zone_changes(zones, 'created')
+            update_catalog_members(zones.values_list('pk', 'domain__name', 'valid'))
+        return self.counts
+
+
+def load(stream, replace=False):
+    """
+    Restore a snapshot in one transaction. Zones are matched to existing domains by name, zones of unknown
+    domains are skipped. Existing zones of the same domains are deleted first when replace is set.
+    :return: (dict of row counts by kind, list of skipped domain names)
+    """
+    loader = Loader(SnapshotReader(stream), replace=replace)
+    with transaction.atomic():
+        counts = loader.load()
+    return counts, loader.skipped
+
+
+def open_snapshot(path, mode='rb'):
+    return gzip.open(path, mode)
@@ -0,0 +1,111 @@
+"""
+Generators for synthetic zones, used by benchmarks and load tests.
+
+Everything is inserted with bulk_create, so zone serials are set directly rather than through Zone.save().
+"""
+import time
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .models import Zone, AddressRecord, CanonicalNameRecord, MailExchangeRecord, \
+    NameServerRecord, TextRecord, ServiceRecord, sync_resource_records, update_catalog_members
+from .settings import DNS_MANAGER_DOMAIN_FACTORY
+
+# Record type mix for generated zones, cycled by record index
+RECORD_MIX = ('A', 'A', 'CNAME', 'TXT', 'MX', 'SRV', 'A', 'A', 'CNAME', 'TXT')
+
+
+def get_domain_model():
+    app_label, model_name = settings.DNS_MANAGER_DOMAIN_MODEL.rsplit('.', 1)
+    return apps.get_model(app_label, model_name)
+
+
+def template_domain(domain_model, name):
+    """
+    :return: Domain to copy field values from: the first existing domain, otherwise one created for name by
+    DNS_MANAGER_DOMAIN_FACTORY
+    :raises ImproperlyConfigured: if there is no domain and no factory
+    """
+    existing = domain_model.objects.order_by('pk').first()
+    if existing is not None:
+        return existing
+    if not DNS_MANAGER_DOMAIN_FACTORY:
+        raise ImproperlyConfigured('Synthetic domains copy an existing %s, create one first or set '
+                                   'DNS_MANAGER_DOMAIN_FACTORY' % domain_model._meta.object_name)
+    return import_string(DNS_MANAGER_DOMAIN_FACTORY)(name)
+
+
+def make_domains(names):
+    """
+    Bulk create domain objects for the given names, copying other field values (such as the owner) from an
+    existing domain, see template_domain.
+    :return: list of domain objects in the order of names
+    """
+    names = list(names)
+    if not names:
+        return []
+    domain_model = get_domain_model()
+    template = template_domain(domain_model, names[0])
+    values = dict((f.attname, getattr(template, f.attname))
+                  for f in domain_model._meta.concrete_fields if not f.primary_key)
+    copies = []
+    for name in names:
+        if template.pk is not None and name == template.name:
+            continue
+        values['name'] = name
+        copies.append(domain_model(**values))
+    domain_model.objects.bulk_create(copies, batch_size=500)
+    by_name = dict((d.name, d) for d in domain_model.objects.filter(name__in=names))
+    return [by_name[name] for name in names]
+
+
+def make_zones(count, records=0, prefix='bench'):
+    """
+    Bulk create count zones, each populated with the given number of records.
+    :return: list of Zone objects
+    """
+    run = uuid.uuid4().hex[:8]
+    names = ['%s-%s-%d.example' % (prefix, run, i) for i in range(count)]
+    serial = int(time.strftime('%Y%m%d00'))
+    domains = []
+    # Chunk the domain names so large runs do not hit database IN() limits
+    for i in range(0, len(names), 500):
+        domains.extend(make_domains(names[i:i + 500]))
+    Zone.objects.bulk_create([Zone(domain=domain, serial=serial) for domain in domains], batch_size=500)
+    zones = list(Zone.objects.filter(domain__in=[d.pk for d in domains]).select_related('domain'))
+    update_catalog_members((zone.pk, zone.domain_name, zone.valid) for zone in zones)
+    if records:
+        populate_zones(zones, records)
+    return zones
+
+
+def populate_zones(zones, records):
+    """ Bulk create records in each zone: two name servers plus a mix of other types """
+    rows = dict((model, []) for model in (AddressRecord, CanonicalNameRecord, MailExchangeRecord,
+                                          NameServerRecord, TextRecord, ServiceRecord))
+    for zone in zones:
+        rows[NameServerRecord].append(NameServerRecord(zone=zone, data='ns1.example.com.'))
+        rows[NameServerRecord].append(NameServerRecord(zone=zone, data='ns2.example.com.'))
+        rows[AddressRecord].append(AddressRecord(zone=zone, data='@', ip='192.0.2.1'))
+        for i in range(max(records - 3, 0)):
+            kind = RECORD_MIX[i % len(RECORD_MIX)]
+            if kind == 'A':
+                rows[AddressRecord].append(AddressRecord(zone=zone, data='h%d' % i,
+                                                         ip='10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255)))
+            elif kind == 'CNAME':
+                rows[CanonicalNameRecord].append(CanonicalNameRecord(zone=zone, data='c%d' % i, target='@'))
+            elif kind == 'TXT':
+                rows[TextRecord].append(TextRecord(zone=zone, data='t%d' % i, text='"synthetic %d"' % i))
+            elif kind == 'MX':
+                rows[MailExchangeRecord].append(MailExchangeRecord(zone=zone, data='mx%d.example.com.' % i,
+                                                                   priority=i % 100))
+            elif kind == 'SRV':
+                rows[ServiceRecord].append(ServiceRecord(zone=zone, data='_s%d._tcp' % i, target='@',
+                                                         priority=10, weight=1, port=1 + i % 65535))
+    for model, objs in rows.items():
+        model.objects.bulk_create(objs, batch_size=500)
+    sync_resource_records(zones)
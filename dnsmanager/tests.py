@@ -1,16 +1,58 @@
+import json
+from datetime import timedelta
+import os
+import tarfile
+import tempfile
+import threading
+import time
+from StringIO import StringIO
+import dns.message
+import dns.query
+import dns.rcode
+import dns.tsigkeyring
+import dns.update
+import dns.zone
+
 from django.conf import settings
-from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management import call_command, CommandError
+from django.db import connection, transaction, IntegrityError
 from django.core.urlresolvers import reverse_lazy
-from django.contrib.auth.models import Permission
+from django.http import HttpResponse
+from django.contrib.auth.models import Permission, User
 from django.test import TestCase
-from django.test import RequestFactory
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
 
 from model_mommy import mommy
 
-from .models import Zone, AddressRecord, CanonicalNameRecord, MailExchangeRecord, NameServerRecord, TextRecord, \
-    validate_hostname_string, validate_hostname_digs
+from .models import Zone, ResourceRecord, RecordSet, SharedRecord, AddressRecord, CanonicalNameRecord, MailExchangeRecord, NameServerRecord, TextRecord, \
+    ServiceRecord, validate_hostname_string, validate_hostname_strings, validate_hostname_digs, validate_records, ZoneChange
 
-from .views import ZoneListView, ZoneDetailView
+from .api import apply_operations, match_created, prepare, update_records, write, BulkError
+from .builder import build_zone
+from .catalog import member_label, members, render_catalog
+from .changes import changes_since, prune, wait_for_changes
+from .cloning import clone_zone, substitute
+from .diff import diff, zone_from_text
+from .dispatch import batched, BatchedZonesSavedMiddleware
+from .dynupdate import UpdateProcessor
+from .export import rendered_zones, tar_stream
+from .history import compact, current_state, record_revision, state_at, zone_at
+from .instrumentation import add_sink, remove_sink
+from .loadtest import LoadServer, percentile, run_load, summarize
+from .metrics import aggregates, collect
+from .recipes import apply_recipe, ReSave, RemovePerRecordTtls
+from .routers import ReplicaRouter, fresh_zones, replica_reads
+from .settings import DNS_MANAGER_CACHE_PREFIX
+from .signals import zone_fully_saved_signal, zones_saved_signal
+from .snapshot import dump, load
+from .synthetic import make_zones, make_domains
+from .verifier import verify_zones
+from .zonecache import ZoneCache, zone_cache
+from .views import ZoneListView, ZoneDetailView, ZoneDiffView, ZoneExportView, ZoneChangesView, CatalogView, MetricsView, RecordBulkView
 
 
 # Creation Tests
@@ -206,6 +248,1429 @@ class ZoneTest(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class ZoneCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        domain = mommy.make_recipe(settings.DNS_MANAGER_DOMAIN_MODEL.rsplit('.', 1)[0] + '.domain', name='example.org')
+        self.zone = mommy.make_recipe('dnsmanager.zone', domain=domain)
+
+    def test_cache_key_namespaced(self):
+        key = self.zone.cache_key('validation')
+        self.assertTrue(key.startswith('%s:%s:' % (DNS_MANAGER_CACHE_PREFIX, self.zone.domain_id)))
+
+    def test_clear_cache_moves_generation(self):
+        generation = self.zone.cache_generation
+        self.zone.is_valid()
+        self.assertIsNotNone(cache.get(self.zone.cache_key('validation')))
+        self.zone.clear_cache()
+        self.assertEqual(self.zone.cache_generation, generation + 1)
+        self.assertIsNone(cache.get(self.zone.cache_key('validation')))
+
+    def test_save_clears_cache(self):
+        self.zone.is_valid()
+        self.zone.save()
+        self.assertIsNone(cache.get(self.zone.cache_key('validation')))
+
+    def test_foreign_keys_untouched(self):
+        cache.set('%s_foo' % self.zone.domain_name, 'bar')
+        self.zone.save()
+        self.assertEqual(cache.get('%s_foo' % self.zone.domain_name), 'bar')
+
+
+class QueryPlanTest(TestCase):
+
+    def setUp(self):
+        self.zone = mommy.make_recipe('dnsmanager.zone')
+        mommy.make_recipe('dnsmanager.address_record', zone=self.zone, data='@', ip='192.0.2.1')
+        mommy.make_recipe('dnsmanager.cname_record', zone=self.zone, data='www', target='@')
+        mommy.make_recipe('dnsmanager.mx_record', zone=self.zone, data='mail', priority=10)
+        mommy.make_recipe('dnsmanager.ns_record', zone=self.zone, data='ns1.example.com.')
+        mommy.make_recipe('dnsmanager.ns_record', zone=self.zone, data='ns2.example.com.')
+        mommy.make_recipe('dnsmanager.text_record', zone=self.zone, data='@', text='"v=spf1 a -all"')
+        mommy.make_recipe('dnsmanager.service_record', zone=self.zone, data='_sip._tls', target='sip.example.com.')
+        self.zone = Zone.objects.select_related('domain').get(pk=self.zone.pk)
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        cursor = connection.cursor()
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        elif connection.vendor == 'postgresql':
+            # Test tables are tiny, stop the planner preferring a sequential scan
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql, params)
+        else:
+            self.skipTest('EXPLAIN not supported on %s' % connection.vendor)
+        return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def assertIndexed(self, queryset, ordered=True):
+        plan = self.explain(queryset)
+        if connection.vendor == 'sqlite':
+            self.assertIn('USING', plan)
+            if ordered:
+                self.assertNotIn('TEMP B-TREE', plan)
+        else:
+            self.assertIn('Index', plan)
+            if ordered:
+                self.assertNotIn('Sort', plan)
+
+    def test_render_query_count(self):
+        with self.assertNumQueries(8):
+            self.zone.render()
+
+    def test_render_queries_indexed(self):
+        self.assertIndexed(self.zone.nameserverrecords.all())
+        self.assertIndexed(self.zone.addressrecords.all())
+        self.assertIndexed(self.zone.canonicalnamerecords.all())
+        self.assertIndexed(self.zone.mailexchangerecords.all())
+        self.assertIndexed(self.zone.textrecords.all())
+        self.assertIndexed(self.zone.servicerecords.all())
+
+    def test_lookups_indexed(self):
+        self.assertIndexed(TextRecord.objects.filter(zone=self.zone, data='@', text='"v=spf1 a -all"'))
+        self.assertIndexed(TextRecord.objects.filter(zone=self.zone, text__startswith='"v=spf1'))
+        self.assertIndexed(AddressRecord.objects.filter(ip='192.0.2.1'), ordered=False)
+        self.assertIndexed(Zone.objects.filter(domain__name=self.zone.domain_name))
+
+
+class BuilderTest(TestCase):
+
+    def setUp(self):
+        self.zone = mommy.make_recipe('dnsmanager.zone', domain__name='example.org')
+        mommy.make_recipe('dnsmanager.ns_record', zone=self.zone, data='ns2.example.com.')
+        mommy.make_recipe('dnsmanager.ns_record', zone=self.zone, data='ns1', ttl=600)
+        mommy.make_recipe('dnsmanager.ns_record', zone=self.zone, origin='sub', data='ns.sub')
+
+    def assertParity(self, zone):
+        zone = Zone.objects.select_related('domain').get(pk=zone.pk)
+        built, parsed = build_zone(zone), zone.get_zone_from_text()
+        self.assertEqual(built, parsed)
+        self.assertEqual(built.to_text(sorted=True), parsed.to_text(sorted=True))
+
+    def test_records(self):
+        mommy.make_recipe('dnsmanager.address_record', zone=self.zone, data='@', ip='192.0.2.1')
+        mommy.make_recipe('dnsmanager.address_record', zone=self.zone, data='*', ip='192.0.2.2', ttl=60)
+        mommy.make_recipe('dnsmanager.address_record', zone=self.zone, data='www.example.org.', ip='192.0.2.3')
+        mommy.make_recipe('dnsmanager.address_record', zone=self.zone, data='www.example.com.', ip='192.0.2.4')
+        mommy.make_recipe('dnsmanager.cname_record', zone=self.zone, data='ftp', target='www')
+        mommy.make_recipe('dnsmanager.cname_record', zone=self.zone, data='cdn', target='cdn.example.net.')
+        mommy.make_recipe('dnsmanager.mx_record', zone=self.zone, data='mail', priority=10)
+        mommy.make_recipe('dnsmanager.mx_record', zone=self.zone, origin='sub', data='mx.example.net.', priority=20)
+        mommy.make_recipe('dnsmanager.text_record', zone=self.zone, data='@', text='"v=spf1 a -all"')
+        mommy.make_recipe('dnsmanager.text_record', zone=self.zone, data='long', text='"part one" "part two"')
+        mommy.make_recipe('dnsmanager.service_record', zone=self.zone, data='_sip._tls', target='sip.example.com.',
+                          priority=10, weight=5, port=5061)
+        self.assertParity(self.zone)
+
+    def test_synthetic_zone(self):
+        self.assertParity(make_zones(1, 200)[0])
+
+    def test_query_count(self):
+        zone = Zone.objects.select_related('domain').get(pk=self.zone.pk)
+        with self.assertNumQueries(7):
+            zone.get_zone()
+
+    def test_no_name_servers(self):
+        self.zone.nameserverrecords.all().delete()
+        self.assertRaises(dns.zone.NoNS, build_zone, self.zone)
+
+
+class ResourceRecordTest(TestCase):
+
+    def setUp(self):
+        from . import models
+        models.DNS_MANAGER_UNIFIED_RECORDS = True
+        zone_cache.clear()
+        self.zone = Zone.objects.select_related('domain').get(pk=make_zones(1, 20)[0].pk)
+
+    def tearDown(self):
+        from . import models
+        models.DNS_MANAGER_UNIFIED_RECORDS = False
+
+    def assertSynced(self):
+        self.assertEqual(build_zone(self.zone, self.zone.resource_rows()), build_zone(self.zone))
+
+    def test_one_query(self):
+        self.assertEqual(ResourceRecord.objects.filter(zone=self.zone).count(), 20)
+        with self.assertNumQueries(2):  # records and shared records
+            built = self.zone.get_zone()
+        self.assertEqual(built, self.zone.get_zone_from_text())
+
+    def test_record_signals(self):
+        record = mommy.make_recipe('dnsmanager.ns_record', zone=self.zone, data='ns0.example.com.', ttl=60)
+        self.assertSynced()
+        self.assertEqual(self.zone.resource_rows()[0][3], 'ns0.example.com.')
+        record.ttl = None
+        record.save()
+        self.assertSynced()
+        record.delete()
+        self.assertSynced()
+
+    def test_bulk_paths(self):
+        mommy.make_recipe('dnsmanager.address_record', zone=self.zone, data='ttl', ip='192.0.2.8', ttl=60)
+        apply_recipe(self.zone, RemovePerRecordTtls)
+        self.assertSynced()
+        apply_operations([{'op': 'create', 'zone': self.zone.pk, 'type': 'A', 'data': 'bulk', 'ip': '192.0.2.7'}])
+        self.assertSynced()
+
+    def test_syncrecords(self):
+        ResourceRecord.objects.all().delete()
+        call_command('syncrecords', stdout=StringIO())
+        self.assertSynced()
+
+
+class RecordSetTest(TestCase):
+
+    def setUp(self):
+        zone_cache.clear()
+        self.zones = make_zones(3, 5)
+        self.record_set = RecordSet.objects.create(name='mail')
+        SharedRecord.objects.create(record_set=self.record_set, rtype='MX', rdata='10 mx.example.net.')
+        SharedRecord.objects.create(record_set=self.record_set, rtype='TXT', rdata='"v=spf1 mx -all"')
+        for zone in self.zones[:2]:
+            zone.record_sets.add(self.record_set)
+
+    def test_render(self):
+        zone = self.zones[0]
+        self.assertIn('IN    MX    10 mx.example.net.', zone.render())
+        self.assertEqual(build_zone(zone), zone.get_zone_from_text())
+        self.assertEqual(zone.get_zone().find_rdataset('@', 'TXT')[0].strings, ['v=spf1 mx -all'])
+        self.assertNotIn('mx.example.net.', self.zones[2].render())
+
+    def test_update_bumps_serials(self):
+        serials = dict(Zone.objects.values_list('pk', 'serial'))
+        built = Zone.objects.get(pk=self.zones[0].pk).get_zone()
+        record = self.record_set.records.get(rtype='MX')
+        record.rdata = '20 mx.example.net.'
+        with self.assertNumQueries(7):  # save, zone keys, two serial updates in a savepoint, catalog members
+            record.save()
+        for zone in Zone.objects.all():
+            self.assertEqual(zone.serial, serials[zone.pk] + (zone in self.zones[:2]))
+        zone = Zone.objects.get(pk=self.zones[0].pk)
+        self.assertIsNone(zone.valid)
+        self.assertIsNot(zone.get_zone(), built)
+        self.assertEqual(zone.get_zone().find_rdataset('@', 'MX')[0].preference, 20)
+
+    def test_link_bumps_serials(self):
+        zone = Zone.objects.get(pk=self.zones[2].pk)
+        built = zone.get_zone()
+        serial = zone.serial
+        zone.record_sets.add(self.record_set)
+        self.assertEqual(zone.serial, serial + 1)
+        self.assertEqual(Zone.objects.get(pk=zone.pk).serial, serial + 1)
+        self.assertIsNot(zone.get_zone(), built)
+        self.assertEqual(zone.get_zone().find_rdataset('@', 'MX')[0].preference, 10)
+
+        serials = dict(Zone.objects.values_list('pk', 'serial'))
+        self.record_set.zones.remove(self.zones[0])
+        self.record_set.zones.clear()
+        for zone in Zone.objects.all():
+            self.assertEqual(zone.serial, serials[zone.pk] + 1)
+            self.assertIsNone(zone.get_zone().get_rdataset('@', 'MX'))
+
+    def test_shared_name_servers_in_soa(self):
+        zone = self.zones[2]
+        zone.nameserverrecords.all().delete()
+        name_servers = RecordSet.objects.create(name='name servers')
+        SharedRecord.objects.create(record_set=name_servers, rtype='NS', rdata='ns1.example.net.')
+        zone.record_sets.add(name_servers)
+        zone = Zone.objects.get(pk=zone.pk)
+        self.assertIn('IN SOA ns1.example.net. ', zone.render())
+        self.assertEqual(build_zone(zone), zone.get_zone_from_text())
+
+    def test_syntax(self):
+        record = SharedRecord(record_set=self.record_set, rtype='MX', rdata='mx.example.net.')
+        self.assertRaises(ValidationError, record.clean)
+        record = SharedRecord(record_set=self.record_set, owner='_sip._tcp', rtype='SRV', rdata='10 5 5060 sip')
+        record.clean()
+
+
+class CloneZoneTest(TestCase):
+
+    def setUp(self):
+        self.source = mommy.make_recipe('dnsmanager.zone', domain__name='template.example', ttl=600)
+        mommy.make_recipe('dnsmanager.ns_record', zone=self.source, data='ns1.example.com.')
+        mommy.make_recipe('dnsmanager.ns_record', zone=self.source, data='ns2.example.com.')
+        mommy.make_recipe('dnsmanager.address_record', zone=self.source, data='@', ip='192.0.2.1')
+        mommy.make_recipe('dnsmanager.mx_record', zone=self.source, data='mail.template.example.', priority=10)
+        mommy.make_recipe('dnsmanager.text_record', zone=self.source, data='@', text='"v=spf1 a -all"')
+        self.source.record_sets.add(RecordSet.objects.create(name='shared'))
+        self.names = ['clone%d.example' % i for i in range(20)]
+        make_domains(self.names)
+
+    def test_clone(self):
+        with self.assertNumQueries(25):  # independent of the number of zones
+            zones = clone_zone(self.source, self.names, {'clone3.example': {'192.0.2.1': '198.51.100.3'}})
+        self.assertEqual(len(zones), 20)
+        zone = Zone.objects.get(domain__name='clone3.example')
+        self.assertEqual(zone.ttl, 600)
+        self.assertEqual(zone.serial, int(time.strftime('%Y%m%d00')))
+        self.assertEqual(zone.addressrecords.get().ip, '198.51.100.3')
+        self.assertEqual(zone.mailexchangerecords.get().data, 'mail.clone3.example.')
+        self.assertEqual(list(zone.record_sets.values_list('name', flat=True)), ['shared'])
+        zone.validate()
+        self.assertEqual(Zone.objects.get(domain__name='clone4.example').addressrecords.get().ip, '192.0.2.1')
+
+    def test_errors_write_nothing(self):
+        self.assertRaises(ValidationError, clone_zone, self.source, self.names + ['missing.example'])
+        self.assertRaises(ValidationError, clone_zone, self.source, self.names[:1],
+                          {'clone0.example': {'v=spf1': 'v=spf1"'}})
+        self.assertRaises(ValidationError, clone_zone, self.source, ['template.example'])
+        self.assertRaises(ValidationError, clone_zone, self.source, ['clone0.example', 'clone0.example'])
+        self.assertRaises(ValidationError, clone_zone, self.source, self.names[:1],
+                          {'clone0.example': {'192.0.2.1': 'not-an-ip'}})
+        self.assertEqual(Zone.objects.count(), 1)
+
+    def test_substitute_whole_names(self):
+        replacements = [('ample.com', 'new.org'), ('example.com', 'example.net'), ('192.0.2.1', '198.51.100.1')]
+        self.assertEqual(substitute('ns1.example.com.', replacements[:1]), 'ns1.example.com.')
+        self.assertEqual(substitute('shop.sample.com.', replacements[:1]), 'shop.sample.com.')
+        self.assertEqual(substitute('ample.com.', replacements[:1]), 'new.org.')
+        self.assertEqual(substitute('mail.example.com.', replacements), 'mail.example.net.')
+        self.assertEqual(substitute('www.example.com.au.', replacements), 'www.example.com.au.')
+        self.assertEqual(substitute('192.0.2.10', replacements), '192.0.2.10')
+        self.assertEqual(substitute('"v=spf1 ip4:192.0.2.1 -all"', replacements), '"v=spf1 ip4:198.51.100.1 -all"')
+
+    def test_command(self):
+        out = StringIO()
+        call_command('clonezone', 'template.example', *self.names[:5], stdout=out)
+        self.assertIn('Created 5 zones', out.getvalue())
+
+
+class SnapshotTest(TestCase):
+
+    def setUp(self):
+        self.zones = make_zones(3, 30)
+        record_set = RecordSet.objects.create(name='mail')
+        SharedRecord.objects.create(record_set=record_set, rtype='MX', rdata='10 mx.example.net.')
+        self.zones[0].record_sets.add(record_set)
+        self.expected = dict((z.domain_name, z.get_zone_from_text().to_text(sorted=True))
+                             for z in Zone.objects.select_related('domain'))
+
+    def snapshot(self):
+        out = StringIO()
+        counts = dump(out)
+        self.assertEqual(counts['zones'], 3)
+        self.assertEqual(sum(counts[rtype] for rtype in ('A', 'CNAME', 'MX', 'NS', 'TXT', 'SRV')), 90)
+        return out.getvalue()
+
+    def assertRestored(self):
+        restored = dict((z.domain_name, z.get_zone_from_text().to_text(sorted=True))
+                        for z in Zone.objects.select_related('domain'))
+        self.assertEqual(restored, self.expected)
+
+    def test_round_trip(self):
+        data = self.snapshot()
+        self.assertEqual(data.count('"@"'), 1)  # repeated strings are stored once
+        Zone.objects.all().delete()
+        RecordSet.objects.all().delete()
+        counts, skipped = load(StringIO(data))
+        self.assertEqual((counts['zones'], skipped), (3, []))
+        self.assertRestored()
+
+    def test_unknown_references_skipped(self):
+        # As if the rows were written between the reads of a dump without a consistent snapshot
+        Zone.record_sets.through.objects.bulk_create([Zone.record_sets.through(zone_id=self.zones[1].pk,
+                                                                                recordset_id=999999)])
+        data = self.snapshot()
+        self.assertEqual(sum(1 for line in data.splitlines() if line.startswith('["ZS"')), 1)
+
+    def test_replace(self):
+        data = self.snapshot()
+        self.zones[1].addressrecords.all().delete()
+        zone = Zone.objects.get(pk=self.zones[0].pk)
+        cache.set(zone.cache_key('validation'), False)
+        self.assertRaises(IntegrityError, load, StringIO(data))
+        self.zones[2].domain.delete()
+        del self.expected[self.zones[2].domain_name]
+        counts, skipped = load(StringIO(data), replace=True)
+        self.assertEqual(skipped, [self.zones[2].domain_name])
+        self.assertRestored()
+        self.assertIsNone(cache.get(Zone.objects.get(domain=zone.domain).cache_key('validation')))
+
+    def test_commands(self):
+        fd, path = tempfile.mkstemp(suffix='.jsonl.gz')
+        os.close(fd)
+        try:
+            call_command('dumpzones', path, stdout=StringIO())
+            Zone.objects.all().delete()
+            out = StringIO()
+            call_command('loadzones', path, stdout=out)
+            self.assertIn('Loaded 3 zones, 90 records', out.getvalue())
+        finally:
+            os.remove(path)
+        self.assertRestored()
+
+
+class HistoryTest(TestCase):
+
+    def setUp(self):
+        from . import history, models
+        models.DNS_MANAGER_HISTORY = True
+        history.DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL = 3
+        self.zone = make_zones(1, 10)[0]
+        self.zone.save()
+        record_revision(self.zone)
+        self.expected = {self.zone.serial: self.zone.get_zone_from_text()}
+        operations = [
+            {'op': 'create', 'type': 'A', 'data': 'new', 'ip': '192.0.2.50'},
+            {'op': 'create', 'type': 'TXT', 'data': 'new', 'text': '"hello"', 'ttl': 60},
+            {'op': 'create', 'type': 'MX', 'data': 'mx.example.net.', 'priority': 5},
+            {'op': 'create', 'type': 'NS', 'data': 'ns0.example.net.'},
+        ]
+        for op in operations:
+            op['zone'] = self.zone.pk
+            apply_operations([op])
+            zone = Zone.objects.select_related('domain').get(pk=self.zone.pk)
+            self.expected[zone.serial] = zone.get_zone_from_text()
+        apply_operations([{'op': 'delete', 'type': 'A', 'id': zone.addressrecords.get(data='new').pk}])
+        self.zone = Zone.objects.select_related('domain').get(pk=self.zone.pk)
+        self.expected[self.zone.serial] = self.zone.get_zone_from_text()
+
+    def tearDown(self):
+        from . import history, models
+        models.DNS_MANAGER_HISTORY = False
+        history.DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL = 20
+
+    def test_reconstruct(self):
+        self.assertEqual(self.zone.revisions.count(), 6)
+        self.assertEqual(list(self.zone.revisions.values_list('checkpoint', flat=True)),
+                         [True, False, False, True, False, False])
+        for serial, expected in self.expected.items():
+            self.assertEqual(zone_at(self.zone, serial), expected)
+        self.assertIsNone(zone_at(self.zone, min(self.expected) - 1))
+
+    def test_compact(self):
+        self.assertEqual(compact(self.zone, keep=2), 4)
+        serials = sorted(self.expected)
+        self.assertIsNone(zone_at(self.zone, serials[-3]))
+        self.assertTrue(self.zone.revisions.get(serial=serials[-2]).checkpoint)
+        for serial in serials[-2:]:
+            self.assertEqual(zone_at(self.zone, serial), self.expected[serial])
+
+    def test_diff_serials(self):
+        first, last = min(self.expected), max(self.expected)
+        changes = diff(zone_at(self.zone, first), zone_at(self.zone, last))
+        self.assertEqual([(c['name'], c['type'], c['action']) for c in changes],
+                         [('@', 'MX', 'changed'), ('@', 'NS', 'changed'), ('@', 'SOA', 'changed'),
+                          ('new', 'TXT', 'added')])
+        request = RequestFactory().get('/', {'from': first})
+        response = ZoneDiffView.as_view()(request, pk=self.zone.pk)
+        self.assertEqual(json.loads(response.content)['changes'], changes)
+
+    def test_recorded_paths(self):
+        count = self.zone.revisions.count()
+        # A plain save
+        self.zone.save()
+        self.assertEqual(self.zone.revisions.count(), count + 1)
+        # Text updates store the zone with its new records
+        text = self.zone.render().replace('192.0.2.1', '192.0.2.99')
+        self.assertTrue(self.zone.update_from_text(text)[0])
+        zone = Zone.objects.select_related('domain').get(pk=self.zone.pk)
+        self.assertEqual(zone_at(zone, zone.serial), zone.get_zone_from_text())
+        # Shared record changes bump the serial of each linked zone
+        record_set = RecordSet.objects.create(name='mail')
+        zone.record_sets.add(record_set)
+        SharedRecord.objects.create(record_set=record_set, rtype='MX', rdata='10 mx.example.net.')
+        zone = Zone.objects.select_related('domain').get(pk=self.zone.pk)
+        self.assertIn('10 mx.example.net.', zone_at(zone, zone.serial).find_rdataset('@', 'MX').to_text())
+        # Record changes without a zone save are only recorded with the next save
+        count = zone.revisions.count()
+        zone.addressrecords.create(data='later', ip='192.0.2.60')
+        self.assertEqual(zone.revisions.count(), count)
+
+    def test_changed_records_only(self):
+        from . import history
+        history.DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL = 20
+        record = self.zone.addressrecords.get(data='h1')
+        record.ip = '192.0.2.98'
+        record.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.zone.save()
+        self.assertFalse([q['sql'] for q in queries if 'dns_addressrecord' in q['sql']])
+        data = json.loads(self.zone.revisions.last().data)
+        self.assertEqual(data['added'], [['A', 'h1', None, '192.0.2.98']])
+        self.assertEqual(len(data['removed']), 1)
+        self.assertEqual(zone_at(self.zone, self.zone.serial), self.zone.get_zone_from_text())
+
+    def test_one_revision_per_serial(self):
+        from . import history
+        history.DNS_MANAGER_HISTORY_CHECKPOINT_INTERVAL = 20
+        count = self.zone.revisions.count()
+        text = self.zone.render().replace('192.0.2.1', '192.0.2.99')
+        self.assertTrue(self.zone.update_from_text(text)[0])
+        zone = Zone.objects.select_related('domain').get(pk=self.zone.pk)
+        self.assertEqual(zone.revisions.count(), count + 1)
+        self.assertEqual(zone_at(zone, zone.serial), zone.get_zone_from_text())
+
+    def test_untracked_writes(self):
+        # Rolled back writes leave no changes behind
+        try:
+            with transaction.atomic():
+                self.zone.addressrecords.create(data='gone', ip='192.0.2.61')
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        record = self.zone.addressrecords.get(data='h1')
+        record.ttl = 60
+        record.save()
+        self.zone.save()
+        apply_recipe(self.zone, RemovePerRecordTtls)
+        zone = Zone.objects.get(pk=self.zone.pk)
+        # Compare rows, zones compare equal whatever their TTLs
+        self.assertEqual(state_at(zone.revisions.last())[1], current_state(zone)[1])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('compacthistory', days=0, keep=1, stdout=out)
+        self.assertIn('Deleted 5 zone revisions', out.getvalue())
+        self.assertEqual(zone_at(self.zone, self.zone.serial), self.expected[self.zone.serial])
+
+
+class DiffTest(TestCase):
+
+    def setUp(self):
+        self.zone = Zone.objects.select_related('domain').get(pk=make_zones(1, 1000)[0].pk)
+        self.text = self.zone.render()
+
+    def test_identical(self):
+        self.assertEqual(diff(self.zone.get_zone(), zone_from_text(self.zone, self.text)), [])
+
+    def test_changes(self):
+        text = self.text.replace('h0    3600    IN    A', 'h0    60    IN    A')
+        text = text.replace('t3    3600    IN    TXT    "synthetic 3"\n', '')
+        text += 'added 300 IN A 192.0.2.99\n'
+        changes = diff(self.zone.get_zone(), zone_from_text(self.zone, text))
+        self.assertEqual([(c['name'], c['type'], c['action']) for c in changes],
+                         [('added', 'A', 'added'), ('h0', 'A', 'changed'), ('t3', 'TXT', 'removed')])
+        self.assertEqual(changes[1]['old']['ttl'], 3600)
+        self.assertEqual(changes[1]['new'], {'ttl': 60, 'records': ['10.0.0.0']})
+
+    def test_view(self):
+        request = RequestFactory().post('/', self.text + 'added 300 IN A 192.0.2.99\n', content_type='text/plain')
+        response = ZoneDiffView.as_view()(request, pk=self.zone.pk)
+        self.assertEqual(len(json.loads(response.content)['changes']), 1)
+        request = RequestFactory().post('/', 'not a zone', content_type='text/plain')
+        self.assertEqual(ZoneDiffView.as_view()(request, pk=self.zone.pk).status_code, 400)
+        request = RequestFactory().get('/', {'from': 1})
+        self.assertEqual(ZoneDiffView.as_view()(request, pk=self.zone.pk).status_code, 400)
+
+    def test_broken_zone(self):
+        self.zone.nameserverrecords.all().delete()
+        request = RequestFactory().post('/', self.text, content_type='text/plain')
+        response = ZoneDiffView.as_view()(request, pk=self.zone.pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('no name servers', json.loads(response.content)['error'])
+        response = ZoneDiffView.as_view()(RequestFactory().get('/'), pk=self.zone.pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertRaises(CommandError, call_command, 'diffzone', self.zone.domain_name, stdout=StringIO())
+
+    def test_command(self):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.text.replace('192.0.2.1', '192.0.2.2'))
+        out = StringIO()
+        try:
+            call_command('diffzone', self.zone.domain_name, file=path, stdout=out)
+        finally:
+            os.remove(path)
+        self.assertEqual(out.getvalue().splitlines(), ['-@ 3600 IN A 192.0.2.1', '+@ 3600 IN A 192.0.2.2'])
+
+
+class ZoneObjectCacheTest(TestCase):
+
+    def setUp(self):
+        zone_cache.clear()
+        self.zone = Zone.objects.select_related('domain').get(pk=make_zones(1, 10)[0].pk)
+
+    def test_repeated_reads(self):
+        built = self.zone.get_zone()
+        with self.assertNumQueries(0):
+            self.assertIs(self.zone.get_zone(), built)
+        stats = zone_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['zones']), (1, 1, 1))
+        self.assertEqual(stats['records'], 11)  # 10 records and the SOA
+
+    def test_zone_save(self):
+        built = self.zone.get_zone()
+        self.zone.save()
+        self.assertIsNot(self.zone.get_zone(), built)
+
+    def test_record_save(self):
+        built = self.zone.get_zone()
+        mommy.make_recipe('dnsmanager.address_record', zone=self.zone, data='new', ip='192.0.2.9')
+        rebuilt = self.zone.get_zone()
+        self.assertIsNot(rebuilt, built)
+        self.assertIsNotNone(rebuilt.get_node('new'))
+        self.zone.addressrecords.get(data='new').delete()
+        self.assertIsNone(self.zone.get_zone().get_node('new'))
+
+    def test_record_save_in_other_process(self):
+        other = ZoneCache()  # the LRU of another process, which record saves here don't evict
+        built = other.get_or_build(self.zone, build_zone)
+        mommy.make_recipe('dnsmanager.address_record', zone=self.zone, data='new', ip='192.0.2.9')
+        rebuilt = other.get_or_build(self.zone, build_zone)
+        self.assertIsNot(rebuilt, built)
+        self.assertIsNotNone(rebuilt.get_node('new'))
+
+    def test_size_limit(self):
+        lru = ZoneCache(max_records=15)
+        zones = [Zone.objects.select_related('domain').get(pk=z.pk) for z in make_zones(2, 10, prefix='lru')]
+        lru.get_or_build(self.zone, build_zone)
+        lru.get_or_build(zones[0], build_zone)
+        self.assertEqual(lru.stats()['zones'], 1)
+        self.assertEqual(lru.stats()['evictions'], 1)
+        lru.get_or_build(zones[0], build_zone)
+        self.assertEqual(lru.stats()['hits'], 1)
+
+        lru = ZoneCache(max_bytes=1000)
+        lru.get_or_build(self.zone, build_zone)
+        self.assertLessEqual(lru.stats()['bytes'], 1000)
+        self.assertEqual(lru.stats()['zones'], 1 if lru.stats()['bytes'] else 0)
+
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        self.zones = make_zones(5, 10)
+        record_set = RecordSet.objects.create(name='mail')
+        SharedRecord.objects.create(record_set=record_set, rtype='MX', rdata='10 mx.example.net.')
+        self.zones[0].record_sets.add(record_set)
+
+    def export(self, **params):
+        response = ZoneExportView.as_view()(RequestFactory().get('/', params))
+        return response, ''.join(response.streaming_content)
+
+    def test_tar(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-tar')
+        archive = tarfile.open(fileobj=StringIO(content))
+        self.assertEqual(archive.getnames(), ['%s.zone' % zone.domain_name for zone in self.zones])
+        for zone in self.zones:
+            self.assertEqual(archive.extractfile('%s.zone' % zone.domain_name).read(),
+                             Zone.objects.get(pk=zone.pk).render())
+
+    def test_tar_long_name(self):
+        zone = Zone.objects.select_related('domain').get(pk=self.zones[0].pk)
+        zone.domain.name = '.'.join(['a' * 63] * 3) + '.example'
+        content = ''.join(tar_stream([(zone, 'text')]))
+        self.assertEqual(tarfile.open(fileobj=StringIO(content)).getnames(), ['%s.zone' % zone.domain.name])
+
+    def test_stream(self):
+        serial = Zone.objects.get(pk=self.zones[0].pk).serial  # moved up by linking the record set
+        zone = Zone.objects.get(pk=self.zones[3].pk)
+        zone.save()
+        zone.save()
+        response, content = self.export(format='stream', serial=serial)
+        header, text = content.split('\n', 1)
+        self.assertEqual(header, '%s %d %d' % (zone.domain_name, zone.serial, len(text)))
+        self.assertEqual(text, zone.render())
+        response, content = self.export(format='stream', ids='%d,%d' % (self.zones[0].pk, self.zones[1].pk))
+        self.assertEqual(content.count(' IN SOA '), 2)
+        response, content = self.export(format='stream', since=zone.updated.isoformat())
+        self.assertEqual(content, '')
+
+    def test_bad_params(self):
+        for params in ({'format': 'zip'}, {'ids': 'a'}, {'since': 'yesterday'}, {'serial': 'x'}):
+            self.assertEqual(ZoneExportView.as_view()(RequestFactory().get('/', params)).status_code, 400)
+
+    def test_batch_queries(self):
+        # One id query, then the zones, six record types, record sets and any shared records per batch
+        with self.assertNumQueries(1 + 9 + 8):
+            texts = [text for zone, text in rendered_zones(Zone.objects.all(), batch_size=3)]
+        self.assertIn('IN    MX    10 mx.example.net.', texts[0])
+
+
+class ChangesTest(TestCase):
+
+    def setUp(self):
+        from . import changes, models
+        models.DNS_MANAGER_CHANGES = True
+        changes.DNS_MANAGER_CHANGES_POLL_INTERVAL = 0.01
+        self.zones = make_zones(2, 5)
+
+    def tearDown(self):
+        from . import changes, models
+        models.DNS_MANAGER_CHANGES = False
+        changes.DNS_MANAGER_CHANGES_POLL_INTERVAL = 1
+
+    def test_feed(self):
+        self.assertEqual(changes_since(), [])  # synthetic zones are inserted without a change
+        self.zones[0].save()
+        record_set = RecordSet.objects.create(name='mail')
+        for zone in self.zones:
+            zone.record_sets.add(record_set)
+        SharedRecord.objects.create(record_set=record_set, rtype='MX', rdata='10 mx.example.net.')
+        make_domains(['clone.example'])
+        clone = clone_zone(self.zones[0], ['clone.example'])[0]
+        clone.delete()
+        changes = changes_since()
+        self.assertEqual([(c['domain'], c['action']) for c in changes], [
+            (self.zones[0].domain_name, 'updated'),
+            (self.zones[0].domain_name, 'updated'),  # linked to the record set
+            (self.zones[1].domain_name, 'updated'),
+            (self.zones[0].domain_name, 'updated'),  # shared record added
+            (self.zones[1].domain_name, 'updated'),
+            (clone.domain_name, 'created'),
+            (clone.domain_name, 'deleted'),
+        ])
+        self.assertEqual(changes[3]['serial'], Zone.objects.get(pk=self.zones[0].pk).serial)
+        self.assertEqual(changes_since(changes[4]['seq']), changes[5:])
+
+    def test_view(self):
+        self.zones[1].save()
+        response = json.loads(ZoneChangesView.as_view()(RequestFactory().get('/')).content)
+        self.assertEqual(len(response['changes']), 1)
+        self.assertFalse(response['resync'])
+        start = time.time()
+        response = json.loads(ZoneChangesView.as_view()(RequestFactory().get('/', {'since': response['next'],
+                                                                                   'wait': 0.1})).content)
+        self.assertGreaterEqual(time.time() - start, 0.1)
+        self.assertEqual(response['changes'], [])
+        for params in ({'since': 'x'}, {'wait': 'nan'}, {'wait': 'inf'}, {'limit': -1}):
+            self.assertEqual(ZoneChangesView.as_view()(RequestFactory().get('/', params)).status_code, 400)
+
+    def test_gap_held_back(self):
+        self.zones[0].save()
+        first = changes_since()[-1]['seq']
+        # A later change committed while the one before it is still in an open transaction
+        later = ZoneChange.objects.create(id=first + 2, zone_id=self.zones[1].pk, domain='later.example',
+                                          serial=1, action='updated')
+        self.assertEqual(changes_since(first), [])
+        self.assertEqual(changes_since(first - 1)[-1]['seq'], first)
+        # Still a gap after the grace period, so it was rolled back
+        ZoneChange.objects.filter(pk=later.pk).update(created=timezone.now() - timedelta(minutes=5))
+        self.assertEqual([c['seq'] for c in changes_since(first)], [later.pk])
+
+    def test_wait_returns_early(self):
+        self.zones[0].save()
+        start = time.time()
+        self.assertEqual(len(wait_for_changes(0, wait=10)), 1)
+        self.assertLess(time.time() - start, 1)
+
+    def test_prune(self):
+        for zone in self.zones:
+            zone.save()
+        self.assertEqual(prune(timezone.now() + timedelta(days=1)), 1)  # the latest change is kept
+        response = json.loads(ZoneChangesView.as_view()(RequestFactory().get('/')).content)
+        self.assertTrue(response['resync'])
+
+
+class CatalogTest(TestCase):
+
+    def setUp(self):
+        self.zones = make_zones(3, 5)
+        self.zones[2].store_result(valid=False)
+
+    def catalog(self):
+        return dns.zone.from_text(str(render_catalog()), origin='catalog.invalid', relativize=False)
+
+    def test_members(self):
+        catalog = self.catalog()
+        self.assertEqual(catalog.find_rdataset('version.catalog.invalid.', 'TXT')[0].strings, ['2'])
+        ptrs = [(name.to_text(), rdataset[0].target.to_text())
+                for name, rdataset in catalog.iterate_rdatasets('PTR')]
+        self.assertEqual(sorted(ptrs), sorted(('%s.zones.catalog.invalid.' % member_label(zone.domain_name),
+                                               '%s.' % zone.domain_name) for zone in self.zones[:2]))
+
+    def test_serial(self):
+        serial = self.catalog().get_rdataset('catalog.invalid.', 'SOA')[0].serial
+        self.zones[0].save()  # no membership change
+        self.assertEqual(self.catalog().get_rdataset('catalog.invalid.', 'SOA')[0].serial, serial)
+        self.zones[0].delete()
+        self.assertEqual(self.catalog().get_rdataset('catalog.invalid.', 'SOA')[0].serial, serial + 1)
+        self.zones[1].store_result(valid=False)
+        self.assertEqual(self.catalog().get_rdataset('catalog.invalid.', 'SOA')[0].serial, serial + 2)
+        self.assertEqual(members(), [])
+
+    def test_render_reads(self):
+        self.zones[1].store_result(valid=None)
+        # The catalog and its members, without validating the unvalidated zones or writing
+        with self.assertNumQueries(2):
+            render_catalog()
+        self.assertEqual(len(members()), 2)
+
+    def test_view(self):
+        response = CatalogView.as_view()(RequestFactory().get('/'))
+        self.assertEqual(response.content.count('IN    PTR'), 2)
+
+
+class DynamicUpdateTest(TestCase):
+
+    keys = {'test-key.': 'c2VjcmV0c2VjcmV0c2VjcmV0'}
+
+    def setUp(self):
+        self.zone = make_zones(1, 10)[0]
+        self.processor = UpdateProcessor(keys=self.keys, window=0)
+
+    def update(self, keyring=dns.tsigkeyring.from_text(keys)):
+        return dns.update.Update(self.zone.domain_name, keyring=keyring)
+
+    def process(self, *updates):
+        wires = [update.to_wire() for update in updates]
+        return [dns.message.from_wire(wire, keyring=update.keyring, request_mac=update.mac).rcode()
+                for update, wire in zip(updates, self.processor.process(wires))]
+
+    def test_add_and_delete(self):
+        serial = Zone.objects.get(pk=self.zone.pk).serial
+        update = self.update()
+        update.add('_acme-challenge', 60, 'TXT', '"token"')
+        update.add('new', 300, 'A', '192.0.2.5')
+        update.delete('h0', 'A')
+        update.delete('h1', 'A', '10.0.0.1')
+        update.delete('h6', 'A', '10.0.0.99')  # not there, ignored
+        update.delete('@', 'NS')  # apex name servers are kept
+        self.assertEqual(self.process(update), [dns.rcode.NOERROR])
+        zone = Zone.objects.get(pk=self.zone.pk)
+        self.assertEqual(zone.serial, serial + 1)
+        self.assertEqual(zone.textrecords.get(data='_acme-challenge').text, '"token"')
+        self.assertEqual(zone.addressrecords.get(data='new').ttl, 300)
+        self.assertEqual(sorted(zone.addressrecords.values_list('data', flat=True)), ['@', 'h6', 'new'])
+        self.assertEqual(zone.nameserverrecords.count(), 2)
+
+    def test_replace(self):
+        cname = self.update()
+        cname.replace('c2', 300, 'CNAME', 'h0')
+        readd = self.update()
+        readd.delete('h0', 'A')
+        readd.add('h0', 600, 'A', '10.0.0.0')
+        mx = self.update()
+        mx.delete('@', 'MX', '4 mx4.example.com.')
+        mx.add('@', 300, 'MX', '20 mx4.example.com.')
+        self.assertEqual(self.process(cname, readd, mx), [dns.rcode.NOERROR] * 3)
+        self.assertEqual(self.zone.canonicalnamerecords.get(data='c2').target, 'h0.%s.' % self.zone.domain_name)
+        self.assertEqual(self.zone.addressrecords.get(data='h0').ttl, 600)
+        self.assertEqual(self.zone.mailexchangerecords.get(data='mx4.example.com.').priority, 20)
+
+    def test_server_failure(self):
+        TextRecord.objects.filter(zone=self.zone, data='t3').update(text='"unterminated')
+        broken = self.update()
+        broken.add('x', 60, 'A', '192.0.2.1')
+        other = make_zones(1, 5)[0]
+        fine = dns.update.Update(other.domain_name, keyring=dns.tsigkeyring.from_text(self.keys))
+        fine.add('x', 60, 'A', '192.0.2.2')
+        self.assertEqual(self.process(broken, fine), [dns.rcode.SERVFAIL, dns.rcode.NOERROR])
+        self.assertFalse(self.zone.addressrecords.filter(data='x').exists())
+        self.assertTrue(other.addressrecords.filter(data='x').exists())
+
+    def test_prerequisites(self):
+        failing = self.update()
+        failing.present('h0', 'A', '10.0.0.99')
+        failing.add('a', 300, 'A', '192.0.2.5')
+        passing = self.update()
+        passing.present('h0')
+        passing.absent('nothing')
+        passing.present('h0', 'A', '10.0.0.0')
+        passing.add('b', 300, 'A', '192.0.2.6')
+        absent = self.update()
+        absent.absent('t3', 'TXT')
+        self.assertEqual(self.process(failing, passing, absent),
+                         [dns.rcode.NXRRSET, dns.rcode.NOERROR, dns.rcode.YXRRSET])
+        self.assertEqual(list(self.zone.addressrecords.filter(data__in=['a', 'b']).values_list('data', flat=True)),
+                         ['b'])
+
+    def test_coalesced_serial(self):
+        serial = Zone.objects.get(pk=self.zone.pk).serial
+        updates = []
+        for i in range(3):
+            updates.append(self.update())
+            updates[-1].add('burst%d' % i, 60, 'TXT', '"%d"' % i)
+        self.assertEqual(self.process(*updates), [dns.rcode.NOERROR] * 3)
+        self.assertEqual(Zone.objects.get(pk=self.zone.pk).serial, serial + 1)
+
+    def test_refused(self):
+        unsupported = self.update()
+        unsupported.add('x', 60, 'AAAA', '2001:db8::1')
+        self.assertEqual(self.process(unsupported), [dns.rcode.REFUSED])
+        other = dns.update.Update('elsewhere.example', keyring=dns.tsigkeyring.from_text(self.keys))
+        self.assertEqual(self.process(other), [dns.rcode.NOTAUTH])
+        unsigned = self.update(keyring=None)
+        unsigned.add('x', 60, 'A', '192.0.2.1')
+        self.assertEqual(dns.message.from_wire(self.processor.process([unsigned.to_wire()])[0]).rcode(),
+                         dns.rcode.REFUSED)
+        forged = self.update(keyring=dns.tsigkeyring.from_text({'test-key.': 'b3RoZXJvdGhlcm90aGVy'}))
+        self.assertEqual(dns.message.from_wire(self.processor.process([forged.to_wire()])[0]).rcode(),
+                         dns.rcode.NOTAUTH)
+        self.assertFalse(self.zone.addressrecords.filter(data='x').exists())
+
+    def test_listener(self):
+        from .management.commands.dnsupdated import UDPServer, UDPHandler
+        server = UDPServer(('127.0.0.1', 0), UDPHandler)
+        server.processor = self.processor
+        update = self.update()
+        update.replace('@', 300, 'A', '192.0.2.77')
+        responses = []
+
+        def query():
+            responses.append(dns.query.udp(update, '127.0.0.1', port=server.server_address[1], timeout=5))
+        threads = [threading.Thread(target=target) for target in (server.serve_forever, query)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        try:
+            self.processor.run_batch()  # in this thread, which holds the test database
+            threads[1].join(5)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(responses[0].rcode(), dns.rcode.NOERROR)
+        self.assertEqual(list(self.zone.addressrecords.filter(data='@').values_list('ip', flat=True)),
+                         ['192.0.2.77'])
+
+
+class ZonesSavedTest(TestCase):
+
+    def setUp(self):
+        self.zones = make_zones(3, 5)
+        self.events = []
+        self.received = threading.Event()
+        zones_saved_signal.connect(self.receiver, dispatch_uid='test_zones_saved')
+
+    def tearDown(self):
+        from . import dispatch
+        zones_saved_signal.disconnect(dispatch_uid='test_zones_saved')
+        dispatch.DNS_MANAGER_ZONES_SAVED_THREADS = 0
+
+    def receiver(self, sender, zones, created, **kwargs):
+        self.events.append((sorted(zones), sorted(created)))
+        self.received.set()
+
+    def saved(self, zone, created=False):
+        zone_fully_saved_signal.send(sender=Zone, instance=zone, created=created)
+
+    def test_unbatched(self):
+        for zone in self.zones:
+            self.saved(zone)
+        self.assertEqual(self.events, [([zone.pk], []) for zone in self.zones])
+
+    def test_batched(self):
+        with batched():
+            self.saved(self.zones[0], created=True)
+            with batched():
+                self.saved(self.zones[1])
+            self.saved(self.zones[0])
+            self.assertEqual(self.events, [])
+        self.assertEqual(self.events, [([self.zones[0].pk, self.zones[1].pk], [self.zones[0].pk])])
+
+    def test_batch_raised(self):
+        with self.assertRaises(ValueError):
+            with batched():
+                self.saved(self.zones[0])
+                raise ValueError
+        with batched():
+            self.saved(self.zones[0])
+            try:
+                with batched():
+                    raise ValueError
+            except ValueError:
+                pass  # handled, but the enclosing transaction is not trusted either
+        self.assertEqual(self.events, [])
+        self.saved(self.zones[1])
+        self.assertEqual(self.events, [([self.zones[1].pk], [])])
+
+    def test_bulk_api(self):
+        apply_operations([{'op': 'create', 'zone': zone.pk, 'type': 'A', 'data': 'new', 'ip': '192.0.2.7'}
+                          for zone in self.zones])
+        self.assertEqual(self.events, [(sorted(zone.pk for zone in self.zones), [])])
+
+    def test_admin_action(self):
+        from django.contrib.admin.sites import site
+        from . import settings as dnsmanager_settings
+        from .admin import ZoneAdmin
+        model_admin = ZoneAdmin(Zone, site)
+        reversion = dnsmanager_settings.DNS_MANAGER_REVERSION
+        dnsmanager_settings.DNS_MANAGER_REVERSION = False  # reversion is not installed in the test app
+        try:
+            model_admin.run_recipe(ResetZoneDefaults)(model_admin, None, Zone.objects.all())
+        finally:
+            dnsmanager_settings.DNS_MANAGER_REVERSION = reversion
+        self.assertEqual(self.events, [(sorted(zone.pk for zone in self.zones), [])])
+
+    def test_middleware(self):
+        request = RequestFactory().get('/')
+        middleware = BatchedZonesSavedMiddleware()
+        middleware.process_request(request)
+        for zone in self.zones:
+            self.saved(zone)
+        self.assertEqual(self.events, [])
+        middleware.process_response(request, HttpResponse())
+        middleware.process_response(request, HttpResponse())  # a second call does not close an outer batch
+        self.assertEqual(len(self.events), 1)
+
+    def test_middleware_failure(self):
+        middleware = BatchedZonesSavedMiddleware()
+        for failed in (lambda request: middleware.process_response(request, HttpResponse(status=500)),
+                       lambda request: middleware.process_exception(request, ValueError())):
+            request = RequestFactory().get('/')
+            middleware.process_request(request)
+            self.saved(self.zones[0])
+            failed(request)
+            middleware.process_response(request, HttpResponse(status=500))  # after process_exception
+        self.assertEqual(self.events, [])
+        self.saved(self.zones[0])
+        self.assertEqual(len(self.events), 1)
+
+    def test_background(self):
+        from . import dispatch
+        dispatch.DNS_MANAGER_ZONES_SAVED_THREADS = 2
+        self.saved(self.zones[0])
+        self.assertTrue(self.received.wait(5))
+        self.assertEqual(self.events, [([self.zones[0].pk], [])])
+
+
+class ReplicaRouterTest(TestCase):
+
+    def setUp(self):
+        from . import routers
+        routers.DNS_MANAGER_READ_REPLICAS = ('replica', )
+        cache.clear()
+        self.zones = make_zones(2, 5)
+        self.router = ReplicaRouter()
+
+    def tearDown(self):
+        from . import routers
+        routers.DNS_MANAGER_READ_REPLICAS = ()
+
+    def test_routing(self):
+        self.assertIsNone(self.router.db_for_read(Zone))
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Zone), 'replica')
+            with replica_reads():
+                self.assertEqual(self.router.db_for_read(AddressRecord), 'replica')
+            self.assertIsNone(self.router.db_for_read(AddressRecord, instance=self.zones[0]))
+            self.assertIsNone(self.router.db_for_write(Zone))
+        self.assertIsNone(self.router.db_for_read(Zone))
+
+    def test_pinning(self):
+        copies = list(Zone.objects.order_by('pk'))
+        self.assertEqual(fresh_zones(copies), copies)
+        zone = Zone.objects.get(pk=self.zones[0].pk)
+        zone.save()
+        fresh = fresh_zones(copies)
+        self.assertEqual(fresh[0].serial, zone.serial)
+        self.assertIsNot(fresh[0], copies[0])
+        self.assertIs(fresh[1], copies[1])
+        self.assertIs(fresh_zones([fresh[0]])[0], fresh[0])  # up to date copies stay
+
+        mommy.make_recipe('dnsmanager.address_record', zone=copies[1], data='new', ip='192.0.2.9')
+        self.assertIsNot(fresh_zones(copies)[1], copies[1])  # record changes pin regardless of serial
+
+    @override_settings(DATABASE_ROUTERS=['dnsmanager.routers.ReplicaRouter'])
+    def test_writes_read_primary(self):
+        # The replica database is never written to, so it has none of the catalog members yet
+        with replica_reads():
+            self.zones[0].store_result(valid=None)
+            self.zones[1].store_result(valid=False)
+        self.assertEqual(members(), [self.zones[0].domain_name])
+
+
+class ZoneListFilterTest(TestCase):
+
+    def setUp(self):
+        from . import views
+        views.DNS_MANAGER_ZONE_ADMIN_FILTER = ('domain__user', )
+        cache.clear()  # validation results are cached by domain id
+        self.zones = sorted(make_zones(6, 2), key=lambda zone: zone.pk)
+        Zone.objects.update(valid=True)
+
+    def tearDown(self):
+        from . import views
+        views.DNS_MANAGER_ZONE_ADMIN_FILTER = None
+
+    def listed(self, **params):
+        response = ZoneListView.as_view()(RequestFactory().get('/', params))
+        if response.status_code != 200:
+            return response, None
+        return response, [line.split('"')[1] for line in response.content.splitlines() if line]
+
+    def test_filters(self):
+        Zone.objects.filter(pk=self.zones[0].pk).update(valid=False)
+        self.assertEqual(self.listed(valid='true')[1], [zone.domain_name for zone in self.zones[1:]])
+        self.assertEqual(self.listed(valid='false')[1], [])  # invalid zones are never listed
+
+        since = Zone.objects.latest('updated').updated.isoformat()
+        zone = Zone.objects.get(pk=self.zones[1].pk)
+        zone.save()
+        self.assertEqual(self.listed(since=since)[1], [zone.domain_name])
+
+        domain = self.zones[2].domain
+        domain.user = mommy.make(User)
+        domain.save()
+        self.assertEqual(self.listed(owner=domain.user.pk)[1], [domain.name])
+
+    def test_keyset_pages(self):
+        names, params = [], {'limit': 4}
+        with self.assertNumQueries(1):
+            response, page = self.listed(**params)
+        while True:
+            names.extend(page)
+            if not response.has_header('X-Next-After'):
+                break
+            params['after'] = response['X-Next-After']
+            response, page = self.listed(**params)
+        self.assertEqual(names, [zone.domain_name for zone in self.zones])
+
+    def test_bad_params(self):
+        for params in ({'valid': 'maybe'}, {'since': 'x'}, {'after': 'x'}, {'limit': 'x'}, {'after': -1},
+                       {'limit': -1}, {'owner': 'abc'}):
+            self.assertEqual(self.listed(**params)[0].status_code, 400)
+        from . import views
+        views.DNS_MANAGER_ZONE_ADMIN_FILTER = None
+        self.assertEqual(self.listed(owner=1)[0].status_code, 400)
+
+
+class BenchmarkTest(TestCase):
+
+    def test_make_zones(self):
+        zones = make_zones(3, 20)
+        self.assertEqual(len(zones), 3)
+        for zone in zones:
+            zone.validate()
+            self.assertEqual(zone.nameserverrecords.count(), 2)
+
+    def test_make_domains_copies_relations(self):
+        user = make_domains(['first.example'])[0].user  # made by the test app's DNS_MANAGER_DOMAIN_FACTORY
+        User.objects.create_user('other')
+        domains = make_domains(['a.example', 'b.example'])
+        self.assertEqual([d.name for d in domains], ['a.example', 'b.example'])
+        self.assertEqual(set(d.user for d in domains), set([user]))
+
+    def test_make_domains_needs_template(self):
+        from . import synthetic
+        synthetic.DNS_MANAGER_DOMAIN_FACTORY = None
+        try:
+            self.assertRaises(ImproperlyConfigured, make_domains, ['first.example'])
+        finally:
+            synthetic.DNS_MANAGER_DOMAIN_FACTORY = settings.DNS_MANAGER_DOMAIN_FACTORY
+
+    def test_dnsbench(self):
+        out = StringIO()
+        call_command('dnsbench', records='10', zones='2', cache_fill='10', repeat=1, stdout=out)
+        results = json.loads(out.getvalue())
+        names = set(r['name'] for r in results)
+        self.assertTrue(set(['render', 'get_zone', 'validate', 'update_from_text', 'recipe',
+                             'zone_list', 'save']).issubset(names))
+        for result in results:
+            self.assertIn('ops_per_second', result)
+            self.assertIn('queries', result)
+        # Benchmark data is rolled back
+        self.assertEqual(Zone.objects.count(), 0)
+
+    def test_load_server(self):
+        def app(environ, start_response):
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.execute('SELECT 2')
+            status = '200 OK' if environ['PATH_INFO'] == '/ok' else '404 Not Found'
+            start_response(status, [('Content-Type', 'text/plain')])
+            return ['body']
+
+        server = LoadServer(app)
+        try:
+            latencies, errors, elapsed = run_load(server.port, ['/ok'] * 9 + ['/missing'], 3)
+            queries = server.counter.reset()
+        finally:
+            server.shutdown()
+        self.assertEqual(len(latencies), 10)
+        self.assertEqual(errors, 1)
+        self.assertEqual(queries, 20)
+        result = summarize('app', latencies, errors, elapsed, queries, zones=1)
+        self.assertEqual(result['queries_per_request'], 2)
+        self.assertEqual(result['zones'], 1)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3], 95), 3)
+        self.assertIsNone(percentile([], 50))
+
+
+class InstrumentationTest(TestCase):
+
+    def setUp(self):
+        self.measurements = []
+        add_sink(self.measurements.append)
+        self.zone = make_zones(1, 10)[0]
+
+    def tearDown(self):
+        remove_sink(self.measurements.append)
+
+    def test_nested_operations(self):
+        self.zone.validate()
+        operations = [m.operation for m in self.measurements]
+        self.assertEqual(operations, ['get_zone', 'validate'])
+        validate = self.measurements[-1]
+        self.assertEqual(validate.zone, self.zone.domain_name)
+        self.assertGreater(validate.query_count, self.measurements[0].query_count)
+        self.assertGreater(validate.wall_time, 0)
+
+    def test_query_log_kept(self):
+        with CaptureQueriesContext(connection) as captured:
+            Zone.objects.count()
+            self.zone.get_zone()
+        get_zone = self.measurements[-1]
+        self.assertGreater(get_zone.query_count, 0)
+        self.assertEqual(len(captured), 1 + get_zone.query_count)
+
+    def test_cache_hits(self):
+        self.zone.is_valid()
+        self.zone.is_valid()
+        validations = [m for m in self.measurements if m.operation == 'validate']
+        self.assertEqual(len(validations), 1)
+        lookups = [(m.cache_hits, m.cache_misses) for m in self.measurements if m.operation == 'is_valid']
+        self.assertEqual(lookups, [(0, 1), (1, 0)])
+
+    def test_recipe(self):
+        apply_recipe(self.zone, ReSave)
+        self.assertEqual(self.measurements[-1].operation, 'recipe')
+        self.assertEqual(self.measurements[-1].detail, 'ReSave')
+
+    def test_disabled(self):
+        remove_sink(self.measurements.append)
+        self.zone.validate()
+        self.assertEqual(self.measurements, [])
+
+
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        add_sink(collect)
+        self.zone = make_zones(1, 10)[0]
+
+    def tearDown(self):
+        remove_sink(collect)
+
+    def test_metrics_view(self):
+        self.zone.render()
+        self.zone.is_valid()
+        self.zone.is_valid()
+        request = RequestFactory().get(reverse_lazy('metrics'))
+        response = MetricsView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('dnsmanager_zones 1\n', response.content)
+        self.assertIn('dnsmanager_records{type="NS"} 2\n', response.content)
+        self.assertIn('dnsmanager_zones_invalid 0\n', response.content)
+        # Validation builds the zone from its records without rendering it
+        self.assertIn('dnsmanager_operation_seconds_count{operation="render"} 1\n', response.content)
+        self.assertIn('dnsmanager_operation_seconds_bucket{operation="render",le="+Inf"} 1\n', response.content)
+        self.assertIn('dnsmanager_operation_seconds_count{operation="validate"} 1\n', response.content)
+        self.assertIn('dnsmanager_cache_hit_ratio{cache="validation"} 0.500000\n', response.content)
+
+    def test_aggregates_cached(self):
+        aggregates()
+        with self.assertNumQueries(0):
+            aggregates()
+
+    def test_validation_result_stored(self):
+        self.assertIsNone(Zone.objects.get(pk=self.zone.pk).valid)
+        self.zone.is_valid()
+        self.assertTrue(Zone.objects.get(pk=self.zone.pk).valid)
+        self.zone.save()
+        self.assertIsNone(Zone.objects.get(pk=self.zone.pk).valid)
+
+
+class ValidateZonesTest(TestCase):
+
+    def setUp(self):
+        self.zones = make_zones(3, 10)
+        NameServerRecord.objects.filter(zone=self.zones[0]).delete()
+
+    def test_validate_all(self):
+        out = StringIO()
+        call_command('validatezones', processes=1, chunk_size=2, stdout=out)
+        self.assertIn('Validated 3 zones (1 invalid)', out.getvalue())
+        self.assertFalse(Zone.objects.get(pk=self.zones[0].pk).valid)
+        self.assertTrue(Zone.objects.get(pk=self.zones[1].pk).valid)
+        # Requests use the stored result
+        zone = Zone.objects.get(pk=self.zones[1].pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(zone.is_valid())
+
+    def test_validate_changed(self):
+        call_command('validatezones', processes=1, stdout=StringIO())
+        self.zones[2].save()
+        out = StringIO()
+        call_command('validatezones', processes=1, changed=True, stdout=out)
+        self.assertIn('Validated 1 zones', out.getvalue())
+
+
+class VerifierTest(TestCase):
+
+    def setUp(self):
+        self.zones = make_zones(2, 10)
+        for zone in self.zones:
+            mommy.make_recipe('dnsmanager.mx_record', zone=zone, data='mx.missing.example.', priority=10)
+        self.checked = []
+
+    def check(self, item):
+        self.checked.append(item)
+        if item[1] == 'mx.missing.example.':
+            return 'Hostname does not exist.'
+        return None
+
+    def test_verify_zones(self):
+        warnings = verify_zones(self.zones, check=self.check)
+        self.assertEqual(len(warnings), 2)
+        # Hostnames shared between zones are only looked up once
+        self.assertEqual(len(self.checked), len(set(self.checked)))
+        self.assertIn(('exists', 'mx.missing.example.'), self.checked)
+        self.assertEqual(self.zones[0].warnings.get().record, 'MX mx.missing.example.')
+        self.assertIsNotNone(Zone.objects.get(pk=self.zones[0].pk).verified)
+
+    def test_warnings_replaced(self):
+        verify_zones(self.zones, check=self.check)
+        self.zones[0].mailexchangerecords.filter(data='mx.missing.example.').delete()
+        verify_zones(self.zones, check=self.check)
+        self.assertEqual(self.zones[0].warnings.count(), 0)
+        self.assertEqual(self.zones[1].warnings.count(), 1)
+
+    def test_saved_during_checks(self):
+        verify_zones(self.zones[1:], check=self.check)
+        verified = Zone.objects.get(pk=self.zones[1].pk).verified
+        # As if the zone was saved while its hostnames were looked up
+        Zone.objects.filter(pk=self.zones[1].pk).update(updated=timezone.now() + timedelta(minutes=1))
+        warnings = verify_zones(self.zones, check=self.check)
+        self.assertEqual([w.zone_id for w in warnings], [self.zones[0].pk])
+        self.assertIsNotNone(Zone.objects.get(pk=self.zones[0].pk).verified)
+        self.assertEqual(Zone.objects.get(pk=self.zones[1].pk).verified, verified)
+        self.assertEqual(self.zones[1].warnings.count(), 1)
+
+    def test_deferred_clean(self):
+        from . import models
+        record = MailExchangeRecord(zone=self.zones[0], data='mx.missing.example.', priority=10)
+        models.DNS_MANAGER_DEFER_NETWORK_CHECKS = True
+        try:
+            record.clean()  # no lookup, so no ValidationError
+        finally:
+            models.DNS_MANAGER_DEFER_NETWORK_CHECKS = False
+
+
+class BulkApiTest(TestCase):
+
+    def setUp(self):
+        self.zones = make_zones(2, 10)
+        self.a_record = self.zones[0].addressrecords.get(data='@')
+        self.txt_record = self.zones[1].textrecords.all()[0]
+
+    def test_apply_operations(self):
+        serials = [zone.serial for zone in self.zones]
+        results = apply_operations([
+            {'op': 'create', 'zone': self.zones[0].pk, 'type': 'A', 'data': 'new', 'ip': '192.0.2.7'},
+            {'op': 'create', 'zone': self.zones[1].domain_name, 'type': 'TXT', 'data': '@', 'text': '"hello"'},
+            {'op': 'create', 'zone': self.zones[1].domain_name, 'type': 'TXT', 'data': '@', 'text': '"world"'},
+            {'op': 'update', 'type': 'A', 'id': self.a_record.pk, 'ttl': 60},
+            {'op': 'delete', 'type': 'TXT', 'id': self.txt_record.pk},
+        ])
+        self.assertEqual([r['status'] for r in results], ['created', 'created', 'created', 'updated', 'deleted'])
+        self.assertEqual(AddressRecord.objects.get(pk=results[0]['id']).data, 'new')
+        self.assertEqual(TextRecord.objects.get(pk=results[2]['id']).text, '"world"')
+        self.assertEqual(AddressRecord.objects.get(pk=self.a_record.pk).ttl, 60)
+        self.assertFalse(TextRecord.objects.filter(pk=self.txt_record.pk).exists())
+        # One serial bump per zone
+        for zone, serial in zip(self.zones, serials):
+            self.assertEqual(Zone.objects.get(pk=zone.pk).serial, serial + 1)
+
+    def test_failure_writes_nothing(self):
+        with self.assertRaises(BulkError) as cm:
+            apply_operations([
+                {'op': 'create', 'zone': self.zones[0].pk, 'type': 'A', 'data': 'ok', 'ip': '192.0.2.8'},
+                {'op': 'create', 'zone': self.zones[0].pk, 'type': 'A', 'data': '-bad', 'ip': '192.0.2.9'},
+                {'op': 'update', 'type': 'MX', 'id': 0, 'priority': 1},
+            ])
+        errors = [r['errors'] for r in cm.exception.results]
+        self.assertEqual(errors[0], [])
+        self.assertEqual(errors[1], ['Hostname is not valid.'])
+        self.assertEqual(errors[2], ['record not found'])
+        self.assertFalse(AddressRecord.objects.filter(data='ok').exists())
+
+    def test_integrity_error_rolls_back(self):
+        with self.assertRaises(BulkError):
+            apply_operations([
+                {'op': 'create', 'zone': self.zones[0].pk, 'type': 'CNAME', 'data': 'dup', 'target': '@'},
+                {'op': 'create', 'zone': self.zones[0].pk, 'type': 'CNAME', 'data': 'dup', 'target': 'www'},
+            ])
+        self.assertFalse(CanonicalNameRecord.objects.filter(data='dup').exists())
+
+    def test_non_dict_operation(self):
+        with self.assertRaises(BulkError) as cm:
+            apply_operations(['create', {'op': 'delete', 'type': 'A', 'id': self.a_record.pk}])
+        self.assertEqual(cm.exception.results[0]['errors'], ['op must be one of create, update, delete'])
+        self.assertEqual(cm.exception.results[1]['errors'], [])
+
+    def test_saves_current_zones(self):
+        operations = [{'op': 'create', 'zone': self.zones[0].pk, 'type': 'A', 'data': 'new', 'ip': '192.0.2.7'}]
+        results, creates, updates, deletes = prepare(operations)
+        Zone.objects.filter(pk=self.zones[0].pk).update(ttl=1234)  # eg an admin edit after the zone was loaded
+        with transaction.atomic():
+            for zone in write(creates, updates, deletes).values():
+                zone.save()
+        self.assertEqual(Zone.objects.get(pk=self.zones[0].pk).ttl, 1234)
+
+    def test_bad_references(self):
+        with self.assertRaises(BulkError) as cm:
+            apply_operations([
+                {'op': 'delete', 'type': 'A', 'id': 'abc'},
+                {'op': 'delete', 'type': 'A', 'id': [1]},
+                {'op': 'create', 'zone': [1], 'type': 'A', 'data': 'x', 'ip': '192.0.2.1'},
+                {'op': 'create', 'zone': True, 'type': 'A', 'data': 'x', 'ip': '192.0.2.1'},
+                {'op': 'delete', 'type': 'A', 'id': str(self.a_record.pk)},
+            ])
+        self.assertEqual([r['errors'] for r in cm.exception.results], [
+            ['id must be an integer'],
+            ['id must be an integer'],
+            ['zone must be an id or a domain name'],
+            ['zone must be an id or a domain name'],
+            [],
+        ])
+
+    def test_update_records(self):
+        records = list(AddressRecord.objects.filter(zone__in=self.zones).order_by('pk'))
+        for i, record in enumerate(records):
+            record.ttl = 100 + i
+        versions = [record.version for record in records]
+        with self.assertNumQueries(1):
+            update_records(AddressRecord, records)
+        for i, record in enumerate(AddressRecord.objects.filter(zone__in=self.zones).order_by('pk')):
+            self.assertEqual(record.ttl, 100 + i)
+            self.assertEqual(record.version, versions[i] + 1)
+
+    def test_match_created_rejects_other_rows(self):
+        last_pk = AddressRecord.objects.latest('pk').pk
+        ours = AddressRecord(zone=self.zones[0], data='ours', ip='192.0.2.10')
+        AddressRecord.objects.bulk_create([ours])
+        AddressRecord.objects.create(zone=self.zones[0], data='theirs', ip='192.0.2.11')
+        with self.assertRaises(IntegrityError):
+            match_created(AddressRecord, [ours], last_pk)
+
+    def test_view(self):
+        body = json.dumps({'operations': [{'op': 'delete', 'type': 'A', 'id': self.a_record.pk}]})
+        request = RequestFactory().post(reverse_lazy('record_bulk'), body, content_type='application/json')
+        response = RecordBulkView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['results'][0]['status'], 'deleted')
+        request = RequestFactory().post(reverse_lazy('record_bulk'), '{', content_type='application/json')
+        self.assertEqual(RecordBulkView.as_view()(request).status_code, 400)
+
+    def test_csrf(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        client = Client(enforce_csrf_checks=True)
+        client.login(username='admin', password='secret')
+        body = json.dumps({'operations': [{'op': 'delete', 'type': 'A', 'id': self.a_record.pk}]})
+        # A cross site form can post JSON as text/plain with the session cookie, but not the CSRF token
+        response = client.post(reverse_lazy('record_bulk'), body, content_type='text/plain')
+        self.assertEqual(response.status_code, 403)
+        response = client.post(reverse_lazy('zone_diff', kwargs={'pk': self.zones[0].pk}), '',
+                               content_type='text/plain')
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(AddressRecord.objects.filter(pk=self.a_record.pk).exists())
+
+
 class DomainValidationTest(TestCase):
 
     def test_leading_underscore(self):
@@ -226,6 +1691,44 @@ class DomainValidationTest(TestCase):
         with self.assertRaises(ValidationError):
             validate_hostname_string(domain)
 
+    def test_batch_hostnames(self):
+        errors = validate_hostname_strings(['www', '-bad.example.com.', '@', '_sip._tls', 'a..b'])
+        self.assertEqual(errors, [None, 'Hostname is not valid.', None, None, 'Hostname is not valid.'])
+
+    def test_batch_long_hostname(self):
+        hostname = '.'.join(['a' * 63] * 4) + '.'
+        self.assertEqual(validate_hostname_strings([hostname]), ['Hostname is too long.'])
+        self.assertFalse(validate_hostname_string(hostname))
+
+    def test_batch_records(self):
+        zone = mommy.make_recipe('dnsmanager.zone')
+        records = [
+            AddressRecord(zone=zone, data='www', ip='192.0.2.1'),
+            AddressRecord(zone=zone, data='-www', ip='192.0.2.1'),
+            TextRecord(zone=zone, data='@', text='"v=spf1 -all"'),
+            TextRecord(zone=zone, data='@', text='"a" "b"'),
+            TextRecord(zone=zone, data='@', text='no quotes'),
+            ServiceRecord(zone=zone, data='_sip._tls', target='sip.example.com.'),
+            ServiceRecord(zone=zone, data='sip.tls', target='sip.example.com.'),
+        ]
+        self.assertEqual(validate_records(records), [
+            [],
+            ['Hostname is not valid.'],
+            [],
+            ['Record must not contain more than 2 quotes.'],
+            ['Record must begin and end with double quotes.'],
+            [],
+            ['Service record is not valid.'],
+        ])
+
+    def test_import_rejects_invalid_hostnames(self):
+        zone = make_zones(1, 10)[0]
+        text = zone.render().replace('ns1.example.com.', '-ns1.example.com.')
+        ok, message = zone.update_from_text(text)
+        self.assertFalse(ok)
+        self.assertIn('-ns1.example.com.', message)
+        self.assertEqual(zone.nameserverrecords.filter(data='ns1.example.com.').count(), 1)
+
     def test_foo(self):
         self.assertEquals(validate_hostname_digs('example.com'), True)
         self.assertEquals(validate_hostname_digs('foo.example.com'), False)
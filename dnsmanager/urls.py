@@ -1,13 +1,31 @@
 from django.contrib.auth.decorators import permission_required
 from django.conf.urls import patterns, url
 
-from .views import ZoneListView, ZoneDetailView
+from .views import ZoneListView, ZoneDetailView, ZoneDiffView, ZoneExportView, ZoneChangesView, CatalogView, MetricsView, RecordBulkView
 
 urlpatterns = patterns('',
     url(r'^zone/$',
         permission_required('zone.view_zones')(ZoneListView.as_view()),
         name='zone_list'),
+    url(r'^zone/export$',
+        permission_required('zone.view_zones')(ZoneExportView.as_view()),
+        name='zone_export'),
     url(r'^zone/(?P<pk>[\-\d\w]+)$',
         permission_required('zone.view_zones')(ZoneDetailView.as_view()),
         name='zone_detail'),
+    url(r'^zone/(?P<pk>\d+)/diff$',
+        permission_required('zone.view_zones')(ZoneDiffView.as_view()),
+        name='zone_diff'),
+    url(r'^changes$',
+        permission_required('zone.view_zones')(ZoneChangesView.as_view()),
+        name='zone_changes'),
+    url(r'^catalog$',
+        permission_required('zone.view_zones')(CatalogView.as_view()),
+        name='catalog'),
+    url(r'^metrics$',
+        permission_required('zone.view_zones')(MetricsView.as_view()),
+        name='metrics'),
+    url(r'^records/bulk$',
+        permission_required('dnsmanager.change_zone')(RecordBulkView.as_view()),
+        name='record_bulk'),
 )
\ No newline at end of file
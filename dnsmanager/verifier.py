@@ -0,0 +1,73 @@
+"""
+Background verification of record hostnames.
+
+With DNS_MANAGER_DEFER_NETWORK_CHECKS record clean() only runs syntax checks. The verifier collects the
+network checks of many zones, looks up each distinct hostname once across a thread pool and stores failures
+as ZoneWarning rows, which do not block publishing.
+"""
+from multiprocessing.pool import ThreadPool
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Zone, ZoneWarning, CanonicalNameRecord, MailExchangeRecord, NameServerRecord, \
+    validate_hostname_exists, validate_hostname_digs
+from .settings import DNS_MANAGER_VERIFIER_THREADS
+
+# Record models with network checks
+VERIFIED_MODELS = (CanonicalNameRecord, MailExchangeRecord, NameServerRecord)
+
+
+def run_check(item):
+    """
+    :param item: (check, hostname) tuple
+    :return: Warning message, or None if the hostname checks out
+    """
+    check, hostname = item
+    try:
+        if check == 'exists':
+            validate_hostname_exists(hostname)
+        elif not validate_hostname_digs(hostname):
+            return 'Hostname has no records.'
+    except ValidationError as e:
+        return '; '.join(e.messages)
+    except Exception as e:
+        return 'Lookup failed: %s' % e
+    return None
+
+
+def verify_zones(zones, threads=DNS_MANAGER_VERIFIER_THREADS, check=run_check):
+    """
+    Run the network checks of all records in the given zones, replacing their warnings. Zones saved after the
+    checks started keep their warnings and stay unverified, as their records may have changed.
+    :return: list of new ZoneWarning objects
+    """
+    started = timezone.now()
+    zones = list(zones)
+    pending = []
+    for model in VERIFIED_MODELS:
+        for record in model.objects.filter(zone__in=zones).select_related('zone__domain'):
+            for kind, hostname in record.network_checks():
+                pending.append((record.zone_id, '%s %s' % (record.rtype, record.data), (kind, hostname.lower())))
+
+    # Each distinct hostname is looked up once, however many zones refer to it
+    targets = sorted(set(target for zone_id, label, target in pending))
+    results = {}
+    if targets:
+        pool = ThreadPool(max(min(threads, len(targets)), 1))
+        try:
+            results = dict(zip(targets, pool.map(check, targets)))
+        finally:
+            pool.close()
+            pool.join()
+
+    with transaction.atomic():
+        current = Zone.objects.select_for_update().filter(pk__in=[zone.pk for zone in zones], updated__lte=started)
+        pks = set(current.values_list('pk', flat=True))
+        warnings = [ZoneWarning(zone_id=zone_id, record=label, message=results[target])
+                    for zone_id, label, target in pending if results[target] and zone_id in pks]
+        ZoneWarning.objects.filter(zone__in=pks).delete()
+        ZoneWarning.objects.bulk_create(warnings)
+        Zone.objects.filter(pk__in=pks).update(verified=timezone.now())
+    return warnings
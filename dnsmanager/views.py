@@ -1,20 +1,218 @@
+import json
+import math
+
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
 from django.views.generic import ListView
 from django.views.generic import DetailView
+from django.views.generic import View
 
+from .api import apply_operations, BulkError
+from .catalog import render_catalog
+from .changes import wait_for_changes, oldest_sequence, LIMIT
+from .diff import diff, stored_zone, zone_at_serial, zone_from_text, DiffError
+from .export import select_zones, rendered_zones, tar_stream, length_prefixed_stream, FORMATS
+from .metrics import exposition
 from .models import Zone
+from .routers import replica_reads, fresh_zones
+from .settings import DNS_MANAGER_ZONE_ADMIN_FILTER
+
+
+class ReplicaReadMixin(object):
+    """ Read from a replica when dnsmanager.routers.ReplicaRouter is configured """
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads():
+            response = super(ReplicaReadMixin, self).dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()  # template responses render lazily, after this block
+            return response
 
 
-class ZoneListView(ListView):
+class ZoneListView(ReplicaReadMixin, ListView):
+    """
+    Zone list, optionally filtered by owner (the first DNS_MANAGER_ZONE_ADMIN_FILTER lookup, eg a user id for
+    domain__user), since (ISO datetime, zones saved after) and valid (true, false or unknown). With after (a zone
+    id) and / or limit the zones are ordered by id, and when a page is full the X-Next-After header holds the
+    after value of the next page.
+    """
     model = Zone
     template_name = 'dnsmanager/zone_list.txt'
+    valid_values = {'true': True, 'false': False, 'unknown': None}
+
+    def get(self, request, *args, **kwargs):
+        try:
+            self.filters, self.after, self.limit = self.parse(request.GET)
+            # Lookups check their values as the queryset is built, eg a non numeric owner id
+            self.queryset = self.filtered_queryset()
+        except (ValueError, TypeError, ValidationError) as e:
+            return HttpResponseBadRequest('%s\n' % e, content_type='text/plain')
+        return super(ZoneListView, self).get(request, *args, **kwargs)
+
+    def parse(self, params):
+        """ :return: (filter kwargs, after, limit) from the query parameters, :raises ValueError: on bad values """
+        filters = {}
+        if 'owner' in params:
+            if not DNS_MANAGER_ZONE_ADMIN_FILTER:
+                raise ValueError('owner needs DNS_MANAGER_ZONE_ADMIN_FILTER')
+            filters[DNS_MANAGER_ZONE_ADMIN_FILTER[0]] = params['owner']
+        if 'since' in params:
+            filters['updated__gt'] = parse_datetime(params['since'])
+            if filters['updated__gt'] is None:
+                raise ValueError('Invalid since datetime')
+        if 'valid' in params:
+            if params['valid'] not in self.valid_values:
+                raise ValueError('valid must be one of %s' % ', '.join(sorted(self.valid_values)))
+            filters['valid'] = self.valid_values[params['valid']]
+        after = int(params['after']) if 'after' in params else None
+        limit = int(params['limit']) if 'limit' in params else None
+        if after is not None and after < 0 or limit is not None and limit < 0:
+            raise ValueError('after and limit must not be negative')
+        return filters, after, limit
+
+    def filtered_queryset(self):
+        queryset = Zone.objects.filter(**self.filters).select_related('domain')
+        if self.after is not None or self.limit is not None:
+            queryset = queryset.order_by('pk')
+            if self.after is not None:
+                queryset = queryset.filter(pk__gt=self.after)
+            if self.limit is not None:
+                queryset = queryset[:self.limit]
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super(ZoneListView, self).get_context_data(**kwargs)
+        context['object_list'] = context['zone_list'] = fresh_zones(list(context['object_list']))
+        return context
 
     def render_to_response(self, context, **response_kwargs):
-        return super(ZoneListView, self).render_to_response(context, content_type='text/plain', **response_kwargs)
+        response = super(ZoneListView, self).render_to_response(context, content_type='text/plain',
+                                                                **response_kwargs)
+        zones = context['object_list']
+        if self.limit and len(zones) == self.limit:
+            response['X-Next-After'] = zones[-1].pk
+        return response
 
 
-class ZoneDetailView(DetailView):
+class ZoneDetailView(ReplicaReadMixin, DetailView):
     queryset = Zone.objects.all()
     template_name = 'dnsmanager/zone_detail.txt'
 
+    def get_object(self, queryset=None):
+        return fresh_zones([super(ZoneDetailView, self).get_object(queryset)])[0]
+
     def render_to_response(self, context, **response_kwargs):
-        return super(ZoneDetailView, self).render_to_response(context, content_type='text/plain', **response_kwargs)
\ No newline at end of file
+        return super(ZoneDetailView, self).render_to_response(context, content_type='text/plain', **response_kwargs)
+
+
+class ZoneExportView(View):
+    """
+    Stream many zones in one response, see dnsmanager.export. All zones by default, or those selected by
+    ids (comma separated), since (ISO datetime of the last save) and serial (only higher serials).
+    format is tar (default) or stream.
+    """
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format', 'tar')
+        if fmt not in FORMATS:
+            return HttpResponseBadRequest('Unknown format %s\n' % fmt, content_type='text/plain')
+        try:
+            ids = request.GET.get('ids')
+            ids = [int(i) for i in ids.split(',') if i] if ids is not None else None
+            since = request.GET.get('since')
+            if since is not None:
+                since = parse_datetime(since)
+                if since is None:
+                    raise ValueError('Invalid since datetime')
+            serial = request.GET.get('serial')
+            serial = int(serial) if serial is not None else None
+        except ValueError as e:
+            return HttpResponseBadRequest('%s\n' % e, content_type='text/plain')
+        zones = rendered_zones(select_zones(ids=ids, since=since, serial=serial))
+        if fmt == 'tar':
+            response = StreamingHttpResponse(tar_stream(zones), content_type='application/x-tar')
+            response['Content-Disposition'] = 'attachment; filename="zones.tar"'
+        else:
+            response = StreamingHttpResponse(length_prefixed_stream(zones), content_type='application/octet-stream')
+        return response
+
+
+class ZoneChangesView(View):
+    """
+    Zone changes feed, see dnsmanager.changes. Returns the changes after the sequence number since (default 0),
+    at most limit of them, and the next since to ask with. wait holds the request up to that many seconds until
+    a change arrives. resync is set when changes after since may have been pruned.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = int(request.GET.get('since', 0))
+            limit = min(int(request.GET.get('limit', LIMIT)), LIMIT)
+            wait = float(request.GET.get('wait', 0))
+            if limit < 1:
+                raise ValueError('limit must be positive')
+            if math.isnan(wait) or math.isinf(wait):
+                raise ValueError('wait must be a number of seconds')
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        changes = wait_for_changes(since, wait, limit)
+        return JsonResponse({
+            'changes': changes,
+            'next': changes[-1]['seq'] if changes else since,
+            'resync': since + 1 < oldest_sequence(),
+        })
+
+
+class CatalogView(View):
+    """ Bind zone text of the catalog zone, see dnsmanager.catalog """
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(render_catalog(), content_type='text/plain')
+
+
+class MetricsView(View):
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(exposition(), content_type='text/plain; version=0.0.4')
+
+
+class RecordBulkView(View):
+    """ Apply a JSON list of record operations in one transaction, see dnsmanager.api """
+
+    def post(self, request, *args, **kwargs):
+        try:
+            operations = json.loads(request.body)['operations']
+            if not isinstance(operations, list):
+                raise ValueError('operations must be a list')
+        except (ValueError, KeyError, TypeError) as e:
+            return JsonResponse({'error': 'Invalid request: %s' % e}, status=400)
+        try:
+            results = apply_operations(operations)
+        except BulkError as e:
+            return JsonResponse({'results': e.results}, status=400)
+        return JsonResponse({'results': results})
+
+
+class ZoneDiffView(View):
+    """
+    RRset changes of a zone, see dnsmanager.diff. GET compares the serials given as from / to (default the
+    current serial), POST compares the stored zone with the Bind zone text in the request body.
+    """
+
+    def get(self, request, pk, *args, **kwargs):
+        zone = get_object_or_404(Zone.objects.select_related('domain'), pk=pk)
+        try:
+            changes = diff(zone_at_serial(zone, request.GET.get('from')), zone_at_serial(zone, request.GET.get('to')))
+        except (DiffError, ValueError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'changes': changes})
+
+    def post(self, request, pk, *args, **kwargs):
+        zone = get_object_or_404(Zone.objects.select_related('domain'), pk=pk)
+        try:
+            changes = diff(stored_zone(zone), zone_from_text(zone, request.body))
+        except DiffError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'changes': changes})
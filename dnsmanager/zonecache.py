@@ -0,0 +1,117 @@
+"""
+Per process LRU of built dns.zone.Zone objects.
+
+Zones are keyed by (pk, serial, updated, cache generation), so saving a zone moves it to a new key and the old
+entry simply ages out. The generation is the shared per zone counter of Zone.cache_generation, which record saves
+and deletes move on, so every process sees record changes made without a zone save. Record changes in this
+process also evict the zone straight away.
+
+The cache is bounded by the number of records held and optionally by an estimate of their size in bytes, set
+with DNS_MANAGER_ZONE_CACHE_RECORDS and DNS_MANAGER_ZONE_CACHE_BYTES.
+
+Cached zones are shared between callers and must be treated as read only.
+"""
+import threading
+from collections import OrderedDict
+
+from .settings import DNS_MANAGER_ZONE_CACHE_RECORDS, DNS_MANAGER_ZONE_CACHE_BYTES
+
+
+def zone_size(zone, count_bytes=False):
+    """
+    :return: (records, bytes) held by a dns.zone.Zone, bytes is the length of the record text and only
+             counted when count_bytes is set
+    """
+    records = size = 0
+    for name, node in zone.nodes.items():
+        for rdataset in node.rdatasets:
+            records += len(rdataset)
+            if count_bytes:
+                size += sum(len(name) + len(rd.to_text()) for rd in rdataset)
+    return records, size
+
+
+class ZoneCache(object):
+
+    def __init__(self, max_records=DNS_MANAGER_ZONE_CACHE_RECORDS, max_bytes=DNS_MANAGER_ZONE_CACHE_BYTES):
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.entries = OrderedDict()
+            self.records = self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    @staticmethod
+    def key(zone):
+        """ :return: Cache key of a Zone model instance, None for unsaved zones """
+        if zone.pk is None:
+            return None
+        return zone.pk, zone.serial, zone.updated, zone.cache_generation
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries[key] = entry  # most recently used last
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, zone):
+        records, size = zone_size(zone, count_bytes=self.max_bytes is not None)
+        if not self.max_records or records > self.max_records or \
+                (self.max_bytes is not None and size > self.max_bytes):
+            return
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (zone, records, size)
+            self.records += records
+            self.bytes += size
+            while self.records > self.max_records or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.records -= entry[1]
+            self.bytes -= entry[2]
+
+    def evict(self, pk):
+        """ Drop every cached version of the zone with the given pk """
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == pk]:
+                self._remove(key)
+
+    def get_or_build(self, zone, build):
+        """
+        :param zone: Zone model instance
+        :param build: Callable returning the dns.zone.Zone for zone on a miss
+        """
+        key = self.key(zone)
+        if key is None or not self.max_records:
+            return build(zone)
+        result = self.get(key)
+        if result is None:
+            result = build(zone)
+            self.put(key, result)
+        return result
+
+    def stats(self):
+        with self.lock:
+            return {
+                'zones': len(self.entries),
+                'records': self.records,
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+zone_cache = ZoneCache()
@@ -0,0 +1,6 @@
+from model_mommy import mommy
+
+
+def make_domain(name):
+    """ DNS_MANAGER_DOMAIN_FACTORY of the test app, a domain with a new owner """
+    return mommy.make_recipe('test_app.domain', name=name)
@@ -5,6 +5,11 @@ DATABASES = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
     },
+    # Never written to, stands in for a read replica that has not caught up
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
 }
 
 INSTALLED_APPS = (
@@ -31,6 +36,7 @@ MIDDLEWARE_CLASSES = (
 )
 
 DNS_MANAGER_DOMAIN_MODEL = 'test_app.Domain'
+DNS_MANAGER_DOMAIN_FACTORY = 'test_app.factories.make_domain'
 
 from model_mommy.generators import gen_integer
 